@@ -1,15 +1,20 @@
 import streamlit as st
 import pandas as pd
-import requests
 import os
-from io import BytesIO
-import PyPDF2
-import tempfile
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import zipfile
-import base64
+import hashlib
+import time
+from functools import partial
+from io import BytesIO
+from cobranca.armazem import CANCELADA, COM_ERRO, CONCLUIDA, ArmazemExecucoes
+from cobranca.downloads import CachePDF, DownloadsEmAndamento
+from cobranca.consulta import FILTROS_PDF, LIMITE_BUSCA, IndiceResultados
+from cobranca.dashboard import agregados_dashboard, figuras_dashboard
+from cobranca.leitura import ler_planilha
+from cobranca.exportacao import FORMATOS_EXPORTACAO, obter_exportacao, variaveis_disparo
+from cobranca.metricas import ARQUIVO_JSON, ARQUIVO_PROMETHEUS, Histograma, Metricas, carregar_metricas
+from cobranca.pipeline import obter_arquivo_zip, obter_planilha_excel
+from cobranca.tarefas import GerenciadorTarefas
 
 # Configuração da página
 st.set_page_config(
@@ -61,9 +66,77 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Limites do cache de PDFs: valem para o processo inteiro, pois o cache é
+# compartilhado entre as sessões; são lidos do ambiente ao iniciar o aplicativo
+TAMANHO_CACHE_PDF_MB = int(os.environ.get('COBRANCA_CACHE_MB', 1024))
+VALIDADE_CACHE_PDF_MIN = int(os.environ.get('COBRANCA_VALIDADE_CACHE_MIN', 15))
+
 # Título do aplicativo
 st.markdown('<h1 class="main-header">💰 Sistema de Cobrança - Unificação de Contas</h1>', unsafe_allow_html=True)
 
+# Execução atual: a sessão guarda apenas o id; os resultados ficam em disco
+@st.cache_resource
+def obter_armazem():
+    """Armazém de execuções em disco, compartilhado entre as sessões"""
+    return ArmazemExecucoes()
+
+@st.cache_resource
+def obter_gerenciador_tarefas():
+    """Processamentos em segundo plano, compartilhados entre as sessões"""
+    return GerenciadorTarefas(obter_armazem())
+
+def concluir_tarefa_da_sessao():
+    """Quando a tarefa da sessão (ou do link ``?tarefa=``) termina, passa a exibir a execução dela"""
+    id_tarefa = st.session_state.get('id_tarefa') or st.query_params.get('tarefa')
+    if not id_tarefa:
+        return
+    tarefa = obter_gerenciador_tarefas().obter(id_tarefa)
+    situacao = obter_armazem().situacao(id_tarefa)
+    if situacao is None:
+        # Execução removida (descartada ou expirada)
+        st.session_state.pop('id_tarefa', None)
+        st.query_params.pop('tarefa', None)
+    elif situacao[0] == CONCLUIDA and (tarefa is None or not tarefa.ativa):
+        st.session_state.avisos_processamento = list(tarefa.avisos) if tarefa is not None else []
+        st.session_state.pop('id_tarefa', None)
+        st.query_params.pop('tarefa', None)
+        st.session_state.id_execucao = id_tarefa
+        st.query_params['execucao'] = id_tarefa
+        st.toast("✅ Dados processados com sucesso!")
+    else:
+        st.session_state.id_tarefa = id_tarefa
+
+def abrir_execucao_atual():
+    """Execução da sessão (ou do link ``?execucao=``), ou None se não houver ou tiver expirado"""
+    id_execucao = st.session_state.get('id_execucao') or st.query_params.get('execucao')
+    if not id_execucao:
+        return None
+    execucao = obter_armazem().abrir(id_execucao)
+    if execucao is None:
+        st.session_state.pop('id_execucao', None)
+    else:
+        st.session_state.id_execucao = execucao.id
+    return execucao
+
+@st.cache_resource(max_entries=4, show_spinner="📂 Carregando resultados...")
+def carregar_execucao(id_execucao, _execucao):
+    """(resultados, PDFs, estatísticas) da execução, lidos do disco uma vez por execução
+
+    Os objetos são compartilhados entre as sessões e reruns, sem cópia, e
+    por isso nunca são alterados pela interface.
+    """
+    armazem = obter_armazem()
+    return (
+        armazem.carregar_resultados(_execucao),
+        armazem.carregar_pdfs(_execucao),
+        armazem.carregar_stats(_execucao)
+    )
+
+concluir_tarefa_da_sessao()
+execucao_atual = abrir_execucao_atual()
+if execucao_atual is not None:
+    df_resultados, pdfs_execucao, stats_execucao = carregar_execucao(execucao_atual.id, execucao_atual)
+
 # Barra lateral para configurações
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/3135/3135715.png", width=100)
@@ -72,6 +145,57 @@ with st.sidebar:
     st.markdown("#### Opções de Processamento")
     baixar_pdfs = st.checkbox("📥 Baixar e unificar PDFs", value=True)
     agrupar_holdings = st.checkbox("🏢 Agrupar Holdings (mesmo telefone)", value=True)
+    reprocessamento_incremental = st.checkbox(
+        "♻️ Reaproveitar grupos inalterados",
+        value=True,
+        help="Compara a planilha com a última execução e reaproveita os PDFs dos grupos que não mudaram"
+    )
+    downloads_simultaneos = st.number_input(
+        "Downloads simultâneos",
+        min_value=1,
+        max_value=64,
+        value=8,
+        help="Quantidade de PDFs baixados em paralelo"
+    )
+    downloads_por_servidor = st.number_input(
+        "Downloads simultâneos por servidor",
+        min_value=1,
+        max_value=64,
+        value=8,
+        help="Limite de conexões a um mesmo portal; cai automaticamente quando o portal começa a falhar"
+    )
+    otimizar_pdfs = st.checkbox(
+        "🗜️ Otimizar PDFs unificados",
+        value=False,
+        help="Ignora PDFs repetidos no grupo, grava uma única vez as fontes e imagens repetidas e comprime o conteúdo"
+    )
+    memoria_limitada = st.checkbox(
+        "💾 Unificação com memória limitada",
+        value=False,
+        help="Grava os PDFs baixados em disco e unifica documento a documento, sem manter o grupo inteiro em memória"
+    )
+    memoria_max_mb = st.number_input(
+        "Orçamento de memória por documento (MB)",
+        min_value=8,
+        value=64,
+        step=8,
+        disabled=not memoria_limitada
+    )
+    processos_unificacao = st.number_input(
+        "Processos para unificação",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        help="Grupos unificados em paralelo; com mais de um processo os PDFs são gravados em disco e "
+             "cada processo é iniciado do zero, o que só compensa com muitos grupos grandes"
+    )
+    usar_cache_pdfs = st.checkbox(
+        "🗄️ Usar cache de PDFs",
+        value=True,
+        help="O cache é único para todas as sessões; tamanho e validade são definidos ao iniciar o aplicativo"
+    )
+    if usar_cache_pdfs:
+        st.caption(f"Cache de até {TAMANHO_CACHE_PDF_MB} MB • usado sem revalidar por {VALIDADE_CACHE_PDF_MIN} min")
     
     st.markdown("#### Filtros")
     valor_minimo = st.number_input("Valor mínimo (R$)", min_value=0, value=0)
@@ -79,11 +203,31 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 📊 Estatísticas")
     
-    if 'resultados' in st.session_state:
-        stats = st.session_state.resultados_stats
+    if execucao_atual is not None:
+        stats = stats_execucao
         st.metric("Total Clientes", stats['total_clientes'])
         st.metric("Valor Total", f"R$ {stats['valor_total']:,.2f}")
         st.metric("Média por Cliente", f"R$ {stats['media_cliente']:,.2f}")
+        if 'reprocessamento' in stats:
+            diferencas = stats['reprocessamento']
+            st.caption(
+                f"♻️ Em relação à execução anterior: {diferencas['reaproveitados']} grupos reaproveitados • "
+                f"{diferencas['alterados']} alterados • {diferencas['adicionados']} novos • "
+                f"{diferencas['removidos']} removidos"
+            )
+        if 'downloads_duplicados_evitados' in stats:
+            st.caption(f"🔁 Downloads duplicados evitados: {stats['downloads_duplicados_evitados']}")
+        if stats.get('downloads_novas_tentativas'):
+            st.caption(f"🔄 Novas tentativas de download: {stats['downloads_novas_tentativas']}")
+        if 'falhas_download' in stats:
+            st.caption(f"❌ PDFs não baixados: {sum(falha['quantidade'] for falha in stats['falhas_download'])} "
+                       "(detalhes no Diagnóstico da execução)")
+        if 'cache_pdfs' in stats:
+            cache_stats = stats['cache_pdfs']
+            st.caption(
+                f"🗄️ Cache de PDFs: {cache_stats['acertos']} acertos "
+                f"({cache_stats['revalidados']} revalidados) • {cache_stats['faltas']} baixados"
+            )
     
     st.markdown("---")
     st.markdown("#### ℹ️ Instruções")
@@ -95,234 +239,279 @@ with st.sidebar:
     """)
 
 # Funções principais
-def baixar_pdf_streamlit(url):
-    """Baixa um PDF a partir de uma URL"""
-    if pd.isna(url) or url == '' or not isinstance(url, str):
-        return None
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            return BytesIO(response.content)
-    except Exception as e:
-        st.warning(f"Erro ao baixar PDF: {e}")
-    return None
-
-def unificar_pdfs_streamlit(lista_pdfs_bytes, output_path):
-    """Unifica múltiplos PDFs em um único arquivo"""
-    if not lista_pdfs_bytes:
-        return False
-    
-    merger = PyPDF2.PdfMerger()
-    pdfs_adicionados = 0
-    
-    for pdf_bytes in lista_pdfs_bytes:
-        try:
-            merger.append(pdf_bytes)
-            pdfs_adicionados += 1
-        except Exception as e:
-            st.warning(f"Erro ao processar PDF: {e}")
-            continue
-    
-    if pdfs_adicionados > 0:
-        with open(output_path, 'wb') as output_file:
-            merger.write(output_file)
-        return True
-    return False
-
-def processar_dados(df, baixar_pdfs_option=True, agrupar_holdings_option=True):
-    """Processa os dados conforme configurações"""
-    
-    # Barra de progresso
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Etapa 1: Preparação dos dados
-    status_text.text("📋 Preparando dados...")
-    progress_bar.progress(10)
-    
-    # Renomear colunas
-    colunas_renomear = {
-        'ID Emp.': 'ID_Cliente',
-        'Razão Social': 'Razao_Social',
-        'CPF/CNPJ': 'CNPJ',
-        'Vencimento': 'Data_Vencimento',
-        'Valor': 'Valor_Bruto',
-        'Valor Líquido': 'Valor_Liquido',
-        'Boleto PDF': 'Link_Boleto',
-        'Nfse PDF': 'Link_NFSe',
-        'Faturamento PDF': 'Link_Faturamento',
-        'Funcionários PDF': 'Link_Funcionarios',
-        'Nosso Núm.': 'Telefone_Contato'
-    }
+def recursos_processamento():
+    """Objetos compartilhados usados pelo processamento, conforme a barra lateral"""
+    cache_pdfs = None
+    if usar_cache_pdfs:
+        cache_pdfs = obter_cache_pdf()
+    return {'cache_pdfs': cache_pdfs, 'downloads_em_andamento': obter_downloads_em_andamento()}
+
+def formatar_duracao(segundos):
+    """Duração aproximada para exibição: '1h 05min', '3min 20s' ou '45s'"""
+    segundos = int(segundos)
+    if segundos >= 3600:
+        return f"{segundos // 3600}h {segundos % 3600 // 60:02d}min"
+    if segundos >= 60:
+        return f"{segundos // 60}min {segundos % 60:02d}s"
+    return f"{segundos}s"
+
+@st.fragment(run_every=1)
+def acompanhar_tarefa(id_tarefa):
+    """Progresso da tarefa em andamento, atualizado a cada segundo sem rerun da página"""
+    tarefa = obter_gerenciador_tarefas().obter(id_tarefa)
+    if tarefa is None or not tarefa.ativa:
+        st.rerun()
     
-    df = df.rename(columns=colunas_renomear)
+    andamento = tarefa.andamento
+    st.progress(andamento.percentual, text=andamento.mensagem)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Grupos unificados", f"{andamento.grupos_concluidos} de {andamento.grupos_total}")
+    with col2:
+        st.metric("Downloads", f"{andamento.downloads_concluidos} de {andamento.downloads_total}")
+    with col3:
+        st.metric("Baixado", f"{andamento.bytes_baixados / 1024 ** 2:,.1f} MB")
+    with col4:
+        restante = andamento.segundos_restantes()
+        st.metric("Tempo restante", formatar_duracao(restante) if restante is not None else "—")
     
-    # Converter datas e valores
-    df['Data_Vencimento'] = pd.to_datetime(df['Data_Vencimento'], errors='coerce')
-    df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+    if tarefa.total_avisos:
+        with st.expander(f"⚠️ {tarefa.total_avisos} aviso(s)"):
+            for aviso in list(tarefa.avisos)[-20:]:
+                st.caption(aviso)
     
-    df['Valor_Liquido'] = df['Valor_Liquido'].fillna(df['Valor_Bruto'])
-    df['Valor_Atualizado'] = pd.to_numeric(
-        df['Valor_Liquido'].replace('R\$ ', '', regex=True).replace('.', '', regex=True).replace(',', '.', regex=True),
-        errors='coerce'
-    )
+    if andamento.cancelado:
+        st.info("⏳ Cancelando... os downloads e grupos em andamento serão concluídos.")
+    elif st.button("⛔ Cancelar processamento", key="cancelar_tarefa"):
+        tarefa.cancelar()
+
+def exibir_tarefa(id_tarefa):
+    """Painel da tarefa da sessão: progresso enquanto roda, ou opção de retomar"""
+    tarefa = obter_gerenciador_tarefas().obter(id_tarefa)
+    if tarefa is not None and tarefa.ativa:
+        acompanhar_tarefa(id_tarefa)
+        return
     
-    # Etapa 2: Agrupamento por telefone (holdings)
-    if agrupar_holdings_option:
-        status_text.text("🏢 Agrupando holdings...")
-        progress_bar.progress(30)
-        
-        # Agrupar por CNPJ
-        df_agrupado_cnpj = df.groupby('CNPJ').agg({
-            'Telefone_Contato': 'first',
-            'Razao_Social': 'first',
-            'ID_Cliente': lambda x: list(set(x))
-        }).reset_index()
-        
-        # Identificar holdings pelo telefone
-        telefone_para_cnpjs = {}
-        for _, row in df_agrupado_cnpj.iterrows():
-            telefone = row['Telefone_Contato']
-            if pd.isna(telefone):
-                continue
-            telefone = str(telefone)
-            if telefone not in telefone_para_cnpjs:
-                telefone_para_cnpjs[telefone] = []
-            telefone_para_cnpjs[telefone].append(row['CNPJ'])
-        
-        # Mapear CNPJ para telefone principal
-        cnpj_para_telefone_principal = {}
-        for telefone, cnpjs in telefone_para_cnpjs.items():
-            if len(cnpjs) > 1:  # É uma holding
-                for cnpj in cnpjs:
-                    cnpj_para_telefone_principal[cnpj] = telefone
-        
-        df['Telefone_Agrupado'] = df['CNPJ'].map(cnpj_para_telefone_principal).fillna(df['Telefone_Contato'])
-        grupo_cols = ['Telefone_Agrupado', 'CNPJ']
+    status, erro = obter_armazem().situacao(id_tarefa)
+    if status == CANCELADA:
+        st.warning("⚠️ O processamento foi cancelado.")
+    elif status == COM_ERRO:
+        st.error(f"❌ Erro ao processar arquivo: {erro}")
     else:
-        df['Telefone_Agrupado'] = df['Telefone_Contato']
-        grupo_cols = ['ID_Cliente', 'CNPJ']
+        st.warning("⚠️ O processamento foi interrompido antes de terminar.")
+    st.caption("Ao retomar, os grupos já unificados são reaproveitados.")
     
-    # Etapa 3: Processamento por grupo
-    status_text.text("📊 Processando grupos...")
-    progress_bar.progress(50)
-    
-    resultados = []
-    pdfs_para_download = {}
-    grupos_processados = set()
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🔁 Retomar processamento", key="retomar_tarefa"):
+            if obter_gerenciador_tarefas().retomar(id_tarefa, recursos_processamento()) is None:
+                st.error("❌ Não foi possível retomar: a planilha de entrada desta execução não está mais disponível.")
+            else:
+                st.rerun()
+    with col2:
+        if st.button("🗑️ Descartar", key="descartar_tarefa"):
+            obter_armazem().remover(id_tarefa)
+            st.session_state.pop('id_tarefa', None)
+            st.query_params.pop('tarefa', None)
+            st.rerun()
+
+def ler_arquivo(caminho):
+    """Conteúdo do arquivo; usado como ``data`` adiado dos botões de download"""
+    with open(caminho, 'rb') as f:
+        return f.read()
+
+def ler_zip_da_execucao(execucao, pdfs_dict, compactar=False):
+    """Conteúdo do ZIP da execução, criando o arquivo na primeira chamada"""
+    return ler_arquivo(obter_arquivo_zip(execucao, pdfs_dict, compactar))
+
+def ler_planilha_da_execucao(execucao, df_resultados):
+    """Conteúdo da planilha Excel da execução, criando o arquivo na primeira chamada"""
+    return ler_arquivo(obter_planilha_excel(execucao, df_resultados))
+
+def ler_exportacao_da_execucao(execucao, df_resultados, nome_formato, conteudo='resultados'):
+    """Conteúdo da exportação da execução no formato pedido, gerada na primeira chamada"""
+    return ler_arquivo(obter_exportacao(execucao, df_resultados, nome_formato, conteudo))
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def variaveis_disparo_da_execucao(id_execucao, _df_resultados):
+    """Variáveis de disparo, montadas uma única vez por execução"""
+    return variaveis_disparo(_df_resultados)
+
+@st.cache_resource(max_entries=4, show_spinner="🔎 Indexando resultados...")
+def indice_da_execucao(id_execucao, _df_resultados):
+    """Índice da tabela de resultados, montado uma única vez por execução"""
+    return IndiceResultados(_df_resultados)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def agregados_da_execucao(id_execucao, _df_resultados):
+    """Agregados do dashboard, calculados uma única vez por execução"""
+    return agregados_dashboard(_df_resultados)
+
+def paginar(total, chave, tamanhos=(25, 50, 100, 250)):
+    """Exibe os controles de paginação e retorna (início, fim) da página atual"""
+    col_pagina, col_tamanho, col_info = st.columns([1, 1, 2])
+    with col_tamanho:
+        tamanho = st.selectbox("Itens por página", tamanhos, index=1, key=f"{chave}_tamanho")
+    paginas = max((total - 1) // tamanho + 1, 1)
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, key=chave)
+    inicio = (min(pagina, paginas) - 1) * tamanho
+    fim = min(inicio + tamanho, total)
+    with col_info:
+        st.caption(f"Exibindo {inicio + 1 if total else 0}–{fim} de {total} • {paginas} página(s)")
+    return inicio, fim
+
+@st.cache_resource
+def obter_cache_pdf():
+    """Instância única do cache de PDFs, compartilhada entre as sessões"""
+    return CachePDF(
+        tamanho_max_bytes=TAMANHO_CACHE_PDF_MB * 1024 * 1024,
+        validade_segundos=VALIDADE_CACHE_PDF_MIN * 60
+    )
+
+@st.cache_resource
+def obter_downloads_em_andamento():
+    """Registro de downloads em andamento, compartilhado entre as sessões"""
+    return DownloadsEmAndamento()
+
+@st.cache_resource(max_entries=4, show_spinner="📖 Lendo planilha...")
+def ler_planilha_cacheada(hash_conteudo, _conteudo):
+    """Lê a planilha uma única vez por conteúdo, e não a cada rerun da página
+
+    Apenas ``hash_conteudo`` entra na chave do cache; o conteúdo em si não é
+    re-hasheado pelo Streamlit. A tabela é compartilhada, sem uma cópia por
+    sessão e por rerun, e é somente leitura (``processar_dados`` trabalha
+    sobre uma cópia renomeada). Retorna (df, segundos da leitura).
+    """
+    inicio = time.perf_counter()
+    df = ler_planilha(BytesIO(_conteudo))
+    return df, time.perf_counter() - inicio
+
+ROTULOS_ETAPAS = {
+    'leitura': '📖 Leitura da planilha',
+    'preparacao': '📋 Preparação dos dados',
+    'holdings': '🏢 Holdings',
+    'agregacao': '📊 Agregação',
+    'download': '📥 Download dos PDFs',
+    'unificacao': '📄 Unificação dos PDFs',
+    'finalizacao': '✅ Finalização',
+    'exportacao': '💾 Exportação'
+}
+
+ROTULOS_MEMORIA = {
+    'entrada': 'planilha',
+    'trabalho': 'tabela de trabalho',
+    'resultados': 'resultados'
+}
+
+def exibir_diagnostico(execucao, stats):
+    """Painel com as métricas gravadas pela execução: etapas, downloads, falhas, unificação, cache e memória"""
+    if 'falhas_download' in stats:
+        st.markdown("**❌ Falhas de download por servidor e motivo**")
+        st.dataframe(
+            pd.DataFrame([
+                {'Servidor': falha['host'], 'Motivo': falha['motivo'], 'PDFs': falha['quantidade'],
+                 'Exemplos': ', '.join(falha['exemplos'])}
+                for falha in stats['falhas_download']
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
     
-    total_grupos = len(df.groupby(grupo_cols))
-    grupos_processados_count = 0
+    metricas = carregar_metricas(execucao.diretorio)
+    if metricas is None:
+        st.info("ℹ️ Esta execução não tem métricas gravadas.")
+        return
     
-    for (telefone, cnpj), grupo in df.groupby(grupo_cols):
-        grupo_id = f"{telefone}_{cnpj}"
-        if grupo_id in grupos_processados:
-            continue
-        
-        grupos_processados.add(grupo_id)
-        grupos_processados_count += 1
-        
-        # Atualizar progresso
-        progresso = 50 + (grupos_processados_count / total_grupos * 40)
-        progress_bar.progress(int(progresso))
-        status_text.text(f"📄 Processando grupo {grupos_processados_count} de {total_grupos}...")
-        
-        # Dados do grupo
-        razao_social = grupo['Razao_Social'].iloc[0]
-        id_cliente = grupo['ID_Cliente'].iloc[0] if not agrupar_holdings_option else str(grupo['ID_Cliente'].iloc[0])
-        
-        # Lógica da data
-        datas_vencimento = grupo['Data_Vencimento'].dropna().dt.strftime('%d/%m/%Y').unique()
-        if len(datas_vencimento) == 1:
-            data_vencimento = datas_vencimento[0]
-        else:
-            data_vencimento = "datas variadas"
-        
-        # Lógica do valor
-        valor_total = grupo['Valor_Atualizado'].sum()
-        
-        # Processar PDFs se habilitado
-        caminho_pdf = None
-        if baixar_pdfs_option:
-            todos_pdfs_bytes = []
-            colunas_pdf = ['Link_Boleto', 'Link_NFSe', 'Link_Faturamento', 'Link_Funcionarios']
-            
-            for _, linha in grupo.iterrows():
-                for coluna in colunas_pdf:
-                    pdf_bytes = baixar_pdf_streamlit(linha[coluna])
-                    if pdf_bytes:
-                        todos_pdfs_bytes.append(pdf_bytes)
-            
-            if todos_pdfs_bytes:
-                # Criar diretório temporário para PDFs
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', 
-                                                prefix=f"{id_cliente}_") as tmp_file:
-                    tmp_path = tmp_file.name
-                
-                if unificar_pdfs_streamlit(todos_pdfs_bytes, tmp_path):
-                    caminho_pdf = tmp_path
-                    pdfs_para_download[grupo_id] = {
-                        'caminho': tmp_path,
-                        'nome': f"{id_cliente}_{razao_social[:30]}.pdf".replace('/', '_')
-                    }
-        
-        # Adicionar ao resultado
-        resultados.append({
-            'ID_Cliente': id_cliente,
-            'Razao_Social': razao_social,
-            'CNPJ': cnpj,
-            'Telefone_Contato': telefone,
-            'Data_Vencimento': data_vencimento,
-            'Valor_Total': round(valor_total, 2),
-            'Quantidade_Contas': len(grupo),
-            'PDF_Disponivel': 'Sim' if caminho_pdf else 'Não',
-            'Grupo_ID': grupo_id
-        })
-    
-    # Etapa 4: Finalizar
-    status_text.text("✅ Processamento concluído!")
-    progress_bar.progress(100)
+    etapas = pd.DataFrame(
+        [(ROTULOS_ETAPAS.get(nome, nome), segundos) for nome, segundos in metricas['etapas'].items()],
+        columns=['Etapa', 'Segundos']
+    )
+    st.markdown("**⏱️ Duração das etapas**")
+    st.bar_chart(etapas, x='Etapa', y='Segundos', horizontal=True)
     
-    # Criar DataFrame de resultados
-    df_resultado = pd.DataFrame(resultados)
+    cache = metricas['cache']
+    if cache:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            taxa = cache['taxa_acerto']
+            st.metric("Acertos do cache", f"{taxa:.0%}" if taxa is not None else "—")
+        with col2:
+            st.metric("Baixados da rede", cache['faltas'])
+        with col3:
+            st.metric("Duplicados evitados", cache['duplicados_evitados'])
     
-    # Ordenar por valor total
-    df_resultado = df_resultado.sort_values('Valor_Total', ascending=False)
+    if metricas['downloads']:
+        linhas = []
+        for item in metricas['downloads']:
+            latencia = Histograma.de_dict(item['latencia'])
+            tamanho = Histograma.de_dict(item['bytes'])
+            linhas.append({
+                'Host': item['host'],
+                'Status': item['status'],
+                'Downloads': latencia.total,
+                'Latência média (s)': latencia.soma / latencia.total,
+                'p50 (s)': latencia.quantil(0.5),
+                'p95 (s)': latencia.quantil(0.95),
+                'Tamanho médio (KB)': tamanho.soma / tamanho.total / 1024,
+                'Total (MB)': tamanho.soma / 1024 / 1024
+            })
+        st.markdown("**📥 Downloads por host e status**")
+        st.dataframe(pd.DataFrame(linhas), hide_index=True, use_container_width=True)
+    if metricas.get('servidores'):
+        st.caption(" • ".join(
+            f"{host}: timeout {situacao['timeout']:.1f}s, até {int(situacao['limite'])} conexões"
+            + (" 🔌 suspenso" if situacao['circuito_aberto'] else "")
+            for host, situacao in metricas['servidores'].items()
+        ))
     
-    # Formatar valor para exibição
-    df_resultado['Valor_Total_Formatado'] = df_resultado['Valor_Total'].apply(
-        lambda x: f'R$ {x:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
+    if metricas.get('memoria'):
+        st.caption("🧠 Memória das tabelas: " + " • ".join(
+            f"{ROTULOS_MEMORIA.get(tabela, tabela)} {tamanho / 1024 ** 2:,.1f} MB"
+            for tabela, tamanho in metricas['memoria'].items()
+        ))
     
-    # Calcular estatísticas
-    stats = {
-        'total_clientes': len(df_resultado),
-        'valor_total': df_resultado['Valor_Total'].sum(),
-        'media_cliente': df_resultado['Valor_Total'].mean(),
-        'clientes_com_pdf': df_resultado['PDF_Disponivel'].eq('Sim').sum()
-    }
+    unificacoes = Histograma.de_dict(metricas['unificacoes'])
+    if unificacoes.total:
+        st.markdown("**📄 Unificação dos PDFs**")
+        st.caption(f"{unificacoes.total} grupo(s) • média {unificacoes.soma / unificacoes.total:.2f}s • "
+                   f"p95 {unificacoes.quantil(0.95):.2f}s")
+        pdfs = metricas.get('pdfs')
+        if pdfs and pdfs['bytes_entrada']:
+            reducao = 1 - pdfs['bytes_saida'] / pdfs['bytes_entrada']
+            st.caption(
+                f"🗜️ Entrada {pdfs['bytes_entrada'] / 1024 ** 2:,.1f} MB → unificados "
+                f"{pdfs['bytes_saida'] / 1024 ** 2:,.1f} MB ({reducao:.0%} menor) • "
+                f"{pdfs['duplicados']} PDF(s) repetido(s) ignorado(s) • {pdfs['segundos_otimizacao']:.2f}s otimizando"
+            )
     
-    return df_resultado, pdfs_para_download, stats
-
-# Funções para download
-def criar_arquivo_zip(pdfs_dict, nome_arquivo="PDFs_Unificados.zip"):
-    """Cria um arquivo ZIP com todos os PDFs"""
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for grupo_id, info in pdfs_dict.items():
-            if os.path.exists(info['caminho']):
-                zip_file.write(info['caminho'], info['nome'])
-                # Remover arquivo temporário
-                os.remove(info['caminho'])
+    col1, col2 = st.columns(2)
+    with col1:
+        if metricas['downloads_mais_lentos']:
+            st.markdown("**🐢 Downloads mais lentos**")
+            st.dataframe(pd.DataFrame(metricas['downloads_mais_lentos']), hide_index=True, use_container_width=True)
+    with col2:
+        if metricas['unificacoes_mais_lentas']:
+            st.markdown("**🐢 Grupos mais lentos**")
+            st.dataframe(pd.DataFrame(metricas['unificacoes_mais_lentas']), hide_index=True, use_container_width=True)
     
-    zip_buffer.seek(0)
-    return zip_buffer
-
-def get_download_link(data, filename, text):
-    """Gera link de download para arquivos"""
-    b64 = base64.b64encode(data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">{text}</a>'
-    return href
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📋 Métricas (JSON)",
+            data=partial(ler_arquivo, execucao.caminho(ARQUIVO_JSON)),
+            file_name=f"metricas_{execucao.id}.json",
+            mime="application/json",
+            key="baixar_metricas_json"
+        )
+    with col2:
+        st.download_button(
+            label="📈 Métricas (Prometheus)",
+            data=partial(ler_arquivo, execucao.caminho(ARQUIVO_PROMETHEUS)),
+            file_name=f"metricas_{execucao.id}.prom",
+            mime="text/plain",
+            key="baixar_metricas_prometheus"
+        )
 
 # Interface principal
 tab1, tab2, tab3, tab4 = st.tabs(["📤 Upload", "📊 Visualização", "📈 Dashboard", "📥 Download"])
@@ -339,8 +528,8 @@ with tab1:
     if uploaded_file is not None:
         try:
             # Ler o arquivo
-            df_original = pd.read_excel(uploaded_file, header=1)
-            st.session_state.df_original = df_original
+            conteudo = uploaded_file.getvalue()
+            df_original, segundos_leitura = ler_planilha_cacheada(hashlib.sha256(conteudo).hexdigest(), conteudo)
             
             # Mostrar prévia
             st.success(f"✅ Arquivo carregado com sucesso! ({len(df_original)} registros)")
@@ -349,40 +538,66 @@ with tab1:
                 st.dataframe(df_original.head(10))
             
             # Botão para processar
-            if st.button("🚀 Processar Dados", type="primary"):
-                with st.spinner("Processando dados..."):
-                    resultados, pdfs, stats = processar_dados(
-                        df_original.copy(),
-                        baixar_pdfs_option=baixar_pdfs,
-                        agrupar_holdings_option=agrupar_holdings
-                    )
-                    
-                    # Salvar resultados na sessão
-                    st.session_state.resultados = resultados
-                    st.session_state.pdfs_para_download = pdfs
-                    st.session_state.resultados_stats = stats
-                    
-                    st.success("✅ Dados processados com sucesso!")
-                    
-                    # Atualizar sidebar automaticamente
-                    st.rerun()
+            tarefa_sessao = obter_gerenciador_tarefas().obter(st.session_state.get('id_tarefa'))
+            em_andamento = tarefa_sessao is not None and tarefa_sessao.ativa
+            if st.button("🚀 Processar Dados", type="primary", disabled=em_andamento):
+                # O processamento roda em segundo plano; resultados, PDFs e ZIP
+                # ficam no diretório da execução no armazém, e a sessão e o
+                # link da página guardam só o id da tarefa
+                metricas = Metricas()
+                metricas.registrar_etapa('leitura', segundos_leitura)
+                tarefa = obter_gerenciador_tarefas().iniciar(
+                    df_original,
+                    {
+                        'baixar_pdfs_option': baixar_pdfs,
+                        'agrupar_holdings_option': agrupar_holdings,
+                        'max_workers_download': int(downloads_simultaneos),
+                        'max_downloads_por_host': int(downloads_por_servidor),
+                        'memoria_max_mb': int(memoria_max_mb) if memoria_limitada else None,
+                        'processos_unificacao': int(processos_unificacao),
+                        'otimizar_pdfs': otimizar_pdfs
+                    },
+                    recursos_processamento(),
+                    incremental=reprocessamento_incremental,
+                    metricas=metricas
+                )
+                st.session_state.id_tarefa = tarefa.id
+                st.session_state.pop('avisos_processamento', None)
+                st.query_params['tarefa'] = tarefa.id
+                st.rerun()
                     
         except Exception as e:
             st.error(f"❌ Erro ao processar arquivo: {str(e)}")
             st.info("Verifique se o arquivo está no formato correto.")
+    
+    # Andamento do processamento da sessão; a página continua utilizável
+    if 'id_tarefa' in st.session_state:
+        st.markdown("### ⏳ Processamento")
+        exibir_tarefa(st.session_state.id_tarefa)
+    elif st.session_state.get('avisos_processamento'):
+        with st.expander(f"⚠️ {len(st.session_state.avisos_processamento)} aviso(s) do último processamento"):
+            for aviso in st.session_state.avisos_processamento:
+                st.caption(aviso)
 
 with tab2:
     st.markdown('<h2 class="sub-header">📊 Visualização dos Resultados</h2>', unsafe_allow_html=True)
     
-    if 'resultados' in st.session_state:
-        df_resultados = st.session_state.resultados
+    if execucao_atual is not None:
+        valores_invalidos = stats_execucao.get('valores_invalidos')
+        if valores_invalidos is not None:
+            st.warning(
+                f"⚠️ {len(valores_invalidos)} valores não puderam ser convertidos e "
+                "ficaram fora do Valor Total."
+            )
+            with st.expander("Ver linhas com valores inválidos"):
+                st.dataframe(valores_invalidos, use_container_width=True)
         
         # Filtros
         col1, col2, col3 = st.columns(3)
         with col1:
             filtro_pdf = st.selectbox(
                 "Filtrar por PDF disponível",
-                ["Todos", "Com PDF", "Sem PDF"]
+                list(FILTROS_PDF)
             )
         with col2:
             filtro_valor = st.selectbox(
@@ -396,25 +611,15 @@ with tab2:
                 default=['Razao_Social', 'CNPJ', 'Telefone_Contato', 'Data_Vencimento', 'Valor_Total_Formatado', 'PDF_Disponivel']
             )
         
-        # Aplicar filtros
-        df_filtrado = df_resultados.copy()
-        
-        if filtro_pdf == "Com PDF":
-            df_filtrado = df_filtrado[df_filtrado['PDF_Disponivel'] == 'Sim']
-        elif filtro_pdf == "Sem PDF":
-            df_filtrado = df_filtrado[df_filtrado['PDF_Disponivel'] == 'Não']
-        
-        if filtro_valor == "Menor valor":
-            df_filtrado = df_filtrado.sort_values('Valor_Total')
-        else:
-            df_filtrado = df_filtrado.sort_values('Valor_Total', ascending=False)
-        
-        # Aplicar valor mínimo
-        df_filtrado = df_filtrado[df_filtrado['Valor_Total'] >= valor_minimo]
+        # Aplicar filtros: a visão é um recorte das ordenações já indexadas,
+        # sem cópia da tabela, e só a página exibida é montada
+        indice = indice_da_execucao(execucao_atual.id, df_resultados)
+        visao = indice.visao(filtro_pdf, decrescente=filtro_valor == "Maior valor", valor_minimo=valor_minimo)
         
         # Exibir resultados
+        inicio, fim = paginar(len(visao), "pagina_resultados", tamanhos=(50, 100, 250, 1000))
         st.dataframe(
-            df_filtrado[mostrar_colunas] if mostrar_colunas else df_filtrado,
+            visao.pagina(inicio, fim, mostrar_colunas),
             use_container_width=True,
             height=400
         )
@@ -424,23 +629,37 @@ with tab2:
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Clientes", len(df_filtrado))
+            st.metric("Total Clientes", visao.clientes)
         with col2:
-            st.metric("Valor Total", f"R$ {df_filtrado['Valor_Total'].sum():,.2f}")
+            st.metric("Valor Total", f"R$ {visao.valor_total:,.2f}")
         with col3:
-            st.metric("Média por Cliente", f"R$ {df_filtrado['Valor_Total'].mean():,.2f}")
+            st.metric("Média por Cliente", f"R$ {visao.media:,.2f}")
         with col4:
-            st.metric("Com PDF", f"{df_filtrado['PDF_Disponivel'].eq('Sim').sum()}")
+            st.metric("Com PDF", f"{visao.com_pdf}")
         
         # Visualização detalhada
         with st.expander("🔍 Detalhes por cliente"):
+            busca = st.text_input(
+                "Buscar cliente",
+                placeholder="Início da razão social ou do CNPJ/CPF",
+                key="busca_cliente"
+            )
+            # Sem busca, a lista traz os primeiros clientes da visão atual
+            if busca.strip():
+                posicoes = indice.buscar(busca)
+            else:
+                posicoes = visao.posicoes[:LIMITE_BUSCA]
+            if busca.strip() and not len(posicoes):
+                st.caption("Nenhum cliente encontrado.")
             cliente_selecionado = st.selectbox(
                 "Selecione um cliente para detalhes",
-                df_resultados['Razao_Social'].tolist()
+                posicoes.tolist(),
+                format_func=lambda posicao: f"{df_resultados['Razao_Social'].iat[posicao]} "
+                                            f"({df_resultados['CNPJ'].iat[posicao]})"
             )
             
-            if cliente_selecionado:
-                cliente_info = df_resultados[df_resultados['Razao_Social'] == cliente_selecionado].iloc[0]
+            if cliente_selecionado is not None:
+                cliente_info = indice.linha(cliente_selecionado)
                 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -468,129 +687,65 @@ with tab2:
 with tab3:
     st.markdown('<h2 class="sub-header">📈 Dashboard Analítico</h2>', unsafe_allow_html=True)
     
-    if 'resultados' in st.session_state:
-        df_resultados = st.session_state.resultados
+    if execucao_atual is not None:
+        agregados = agregados_da_execucao(execucao_atual.id, df_resultados)
+        figuras = figuras_dashboard(agregados)
         
         # Gráfico 1: Top 10 clientes por valor
-        fig1 = px.bar(
-            df_resultados.head(10),
-            x='Razao_Social',
-            y='Valor_Total',
-            title='🔝 Top 10 Clientes por Valor',
-            labels={'Razao_Social': 'Cliente', 'Valor_Total': 'Valor (R$)'},
-            color='Valor_Total',
-            color_continuous_scale='Blues'
-        )
-        fig1.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig1, use_container_width=True)
+        st.plotly_chart(figuras['top'], use_container_width=True)
         
         # Gráfico 2: Distribuição de valores
         col1, col2 = st.columns(2)
         
         with col1:
-            fig2 = px.pie(
-                df_resultados,
-                names='PDF_Disponivel',
-                title='📄 Distribuição de PDFs Disponíveis',
-                color='PDF_Disponivel',
-                color_discrete_map={'Sim': '#10B981', 'Não': '#EF4444'}
-            )
-            st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(figuras['pdfs'], use_container_width=True)
         
         with col2:
-            fig3 = px.histogram(
-                df_resultados,
-                x='Valor_Total',
-                title='📊 Distribuição de Valores',
-                nbins=20,
-                labels={'Valor_Total': 'Valor (R$)'}
-            )
-            fig3.update_layout(bargap=0.1)
-            st.plotly_chart(fig3, use_container_width=True)
+            st.plotly_chart(figuras['valores'], use_container_width=True)
         
         # Gráfico 3: Linha do tempo (se houver datas específicas)
-        df_datas = df_resultados[df_resultados['Data_Vencimento'] != 'datas variadas'].copy()
-        if not df_datas.empty:
-            df_datas['Data_Vencimento'] = pd.to_datetime(df_datas['Data_Vencimento'], format='%d/%m/%Y')
-            df_datas = df_datas.sort_values('Data_Vencimento')
-            
-            fig4 = px.scatter(
-                df_datas,
-                x='Data_Vencimento',
-                y='Valor_Total',
-                size='Valor_Total',
-                color='Razao_Social',
-                title='📅 Distribuição por Data de Vencimento',
-                labels={'Data_Vencimento': 'Data de Vencimento', 'Valor_Total': 'Valor (R$)'}
-            )
-            st.plotly_chart(fig4, use_container_width=True)
+        if 'dispersao' in figuras:
+            st.plotly_chart(figuras['por_dia'], use_container_width=True)
+            st.plotly_chart(figuras['dispersao'], use_container_width=True)
+            if len(agregados['pontos']) < agregados['total_pontos']:
+                st.caption(f"Exibindo {len(agregados['pontos']):,} de {agregados['total_pontos']:,} clientes: "
+                           "os maiores valores e uma amostra dos demais.")
         
         # Tabela de estatísticas avançadas
+        resumo = agregados['resumo']
         with st.expander("📋 Estatísticas Detalhadas"):
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.metric("Valor Máximo", f"R$ {df_resultados['Valor_Total'].max():,.2f}")
-                st.metric("Valor Mínimo", f"R$ {df_resultados['Valor_Total'].min():,.2f}")
+                st.metric("Valor Máximo", f"R$ {resumo['maximo']:,.2f}")
+                st.metric("Valor Mínimo", f"R$ {resumo['minimo']:,.2f}")
             
             with col2:
-                st.metric("Mediana", f"R$ {df_resultados['Valor_Total'].median():,.2f}")
-                st.metric("Desvio Padrão", f"R$ {df_resultados['Valor_Total'].std():,.2f}")
+                st.metric("Mediana", f"R$ {resumo['mediana']:,.2f}")
+                st.metric("Desvio Padrão", f"R$ {resumo['desvio']:,.2f}")
             
             with col3:
-                st.metric("Q1 (25%)", f"R$ {df_resultados['Valor_Total'].quantile(0.25):,.2f}")
-                st.metric("Q3 (75%)", f"R$ {df_resultados['Valor_Total'].quantile(0.75):,.2f}")
+                st.metric("Q1 (25%)", f"R$ {resumo['q1']:,.2f}")
+                st.metric("Q3 (75%)", f"R$ {resumo['q3']:,.2f}")
+        
+        with st.expander("🩺 Diagnóstico da execução"):
+            exibir_diagnostico(execucao_atual, stats_execucao)
     else:
         st.info("👆 Processe os dados para visualizar o dashboard.")
 
 with tab4:
     st.markdown('<h2 class="sub-header">📥 Download dos Resultados</h2>', unsafe_allow_html=True)
     
-    if 'resultados' in st.session_state:
-        df_resultados = st.session_state.resultados
-        
+    if execucao_atual is not None:
         # Seção 1: Download da planilha
         st.markdown("### 📋 Planilha de Resultados")
         
-        # Criar Excel em memória
-        excel_buffer = BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            # Planilha principal
-            df_export = df_resultados.copy()
-            df_export['Valor_Total'] = df_export['Valor_Total'].apply(
-                lambda x: f'R$ {x:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
-            )
-            
-            df_export[[
-                'ID_Cliente',
-                'Razao_Social',
-                'CNPJ',
-                'Telefone_Contato',
-                'Data_Vencimento',
-                'Valor_Total',
-                'Quantidade_Contas',
-                'PDF_Disponivel'
-            ]].to_excel(writer, sheet_name='Clientes_Unificados', index=False)
-            
-            # Planilha de estatísticas
-            stats_df = pd.DataFrame({
-                'Métrica': ['Total de Clientes', 'Valor Total', 'Média por Cliente', 'Clientes com PDF'],
-                'Valor': [
-                    len(df_resultados),
-                    f"R$ {df_resultados['Valor_Total'].sum():,.2f}",
-                    f"R$ {df_resultados['Valor_Total'].mean():,.2f}",
-                    df_resultados['PDF_Disponivel'].eq('Sim').sum()
-                ]
-            })
-            stats_df.to_excel(writer, sheet_name='Estatisticas', index=False)
-        
-        excel_buffer.seek(0)
-        
         col1, col2 = st.columns(2)
         with col1:
+            # Planilha gerada em disco no primeiro download e reaproveitada na execução
             st.download_button(
                 label="📥 Baixar Planilha Excel",
-                data=excel_buffer,
+                data=partial(ler_planilha_da_execucao, execucao_atual, df_resultados),
                 file_name="Clientes_Unificados.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
@@ -598,34 +753,42 @@ with tab4:
         # Seção 2: Download de PDFs
         st.markdown("### 📄 PDFs Unificados")
         
-        if 'pdfs_para_download' in st.session_state and st.session_state.pdfs_para_download:
-            pdfs_dict = st.session_state.pdfs_para_download
+        if pdfs_execucao:
+            pdfs_dict = pdfs_execucao
             
             with col2:
-                # Criar ZIP com todos os PDFs
-                zip_buffer = criar_arquivo_zip(pdfs_dict)
+                compactar_zip = st.checkbox(
+                    "Comprimir PDFs no ZIP",
+                    value=False,
+                    help="PDFs já são comprimidos; comprimir de novo é lento e reduz pouco o tamanho"
+                )
                 
+                # ZIP criado em disco uma única vez por execução, no primeiro download
                 st.download_button(
                     label="📦 Baixar Todos os PDFs (ZIP)",
-                    data=zip_buffer.getvalue(),
+                    data=partial(ler_zip_da_execucao, execucao_atual, pdfs_dict, compactar_zip),
                     file_name="PDFs_Unificados.zip",
                     mime="application/zip"
                 )
             
-            # Lista individual de PDFs
+            # Lista individual de PDFs: só a página visível é exibida e cada
+            # arquivo é lido apenas quando o download é acionado
             st.markdown("#### 📋 PDFs Disponíveis")
-            for grupo_id, info in pdfs_dict.items():
+            busca_pdf = st.text_input("🔍 Filtrar PDFs pelo nome", key="busca_pdf")
+            itens_pdf = list(pdfs_dict.items())
+            if busca_pdf:
+                termo = busca_pdf.casefold()
+                itens_pdf = [(grupo_id, info) for grupo_id, info in itens_pdf if termo in info['nome'].casefold()]
+            inicio, fim = paginar(len(itens_pdf), "pagina_pdfs")
+            for grupo_id, info in itens_pdf[inicio:fim]:
                 if os.path.exists(info['caminho']):
-                    with open(info['caminho'], 'rb') as f:
-                        pdf_data = f.read()
-                    
                     col_pdf1, col_pdf2 = st.columns([3, 1])
                     with col_pdf1:
                         st.write(f"**{info['nome']}**")
                     with col_pdf2:
                         st.download_button(
                             label="⬇️ Baixar",
-                            data=pdf_data,
+                            data=partial(ler_arquivo, info['caminho']),
                             file_name=info['nome'],
                             mime="application/pdf",
                             key=f"pdf_{grupo_id}"
@@ -650,57 +813,54 @@ Equipe Financeira"""
             st.code(template, language='text')
             
             st.markdown("#### Dados para substituição:")
-            for _, row in df_resultados.iterrows():
-                with st.expander(f"{row['Razao_Social']}"):
-                    st.write(f"**{{1}}**: {row['Razao_Social']}")
-                    st.write(f"**{{2}}**: R$ {row['Valor_Total']:,.2f}")
-                    st.write(f"**{{3}}**: {row['Data_Vencimento']}")
+            
+            # Arquivo único com as variáveis de todos os clientes, para a ferramenta de disparo
+            col_disparo1, col_disparo2 = st.columns(2)
+            for coluna, nome_formato in zip((col_disparo1, col_disparo2), ('csv', 'json')):
+                formato = FORMATOS_EXPORTACAO[nome_formato]
+                with coluna:
+                    st.download_button(
+                        label=f"📤 Variáveis para disparo ({formato.extensao.upper()})",
+                        data=partial(ler_exportacao_da_execucao, execucao_atual,
+                                     df_resultados, nome_formato, 'disparo'),
+                        file_name=formato.nome_arquivo('disparo_whatsapp'),
+                        mime=formato.mime,
+                        key=f"disparo_{nome_formato}"
+                    )
+            
+            # Apenas a página visível é enviada ao navegador
+            busca_disparo = st.text_input(
+                "🔍 Buscar cliente ou telefone",
+                key="busca_disparo"
+            )
+            variaveis = variaveis_disparo_da_execucao(execucao_atual.id, df_resultados)
+            if busca_disparo:
+                variaveis = variaveis[
+                    variaveis['Variavel_1'].str.contains(busca_disparo, case=False, regex=False, na=False)
+                    | variaveis['Telefone'].str.contains(busca_disparo, regex=False, na=False)
+                ]
+            inicio, fim = paginar(len(variaveis), "pagina_disparo")
+            st.dataframe(
+                variaveis.iloc[inicio:fim].rename(columns={
+                    'Variavel_1': '{{1}}', 'Variavel_2': '{{2}}', 'Variavel_3': '{{3}}'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
         
         # Seção 4: Exportação em outros formatos
         st.markdown("### 🔄 Outros Formatos")
         
-        col_format1, col_format2, col_format3 = st.columns(3)
-        
-        with col_format1:
-            # CSV
-            csv = df_resultados.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📄 CSV",
-                data=csv,
-                file_name="clientes_unificados.csv",
-                mime="text/csv"
-            )
-        
-        with col_format2:
-            # JSON
-            json_str = df_resultados.to_json(orient='records', force_ascii=False)
-            st.download_button(
-                label="📋 JSON",
-                data=json_str.encode('utf-8'),
-                file_name="clientes_unificados.json",
-                mime="application/json"
-            )
-        
-        with col_format3:
-            # Texto simples
-            txt_content = "CLIENTES UNIFICADOS\n===================\n\n"
-            for _, row in df_resultados.iterrows():
-                txt_content += f"""
-Cliente: {row['Razao_Social']}
-CNPJ: {row['CNPJ']}
-Telefone: {row['Telefone_Contato']}
-Valor: R$ {row['Valor_Total']:,.2f}
-Vencimento: {row['Data_Vencimento']}
-PDF: {row['PDF_Disponivel']}
-{'-'*40}
-"""
-            
-            st.download_button(
-                label="📝 TXT",
-                data=txt_content.encode('utf-8'),
-                file_name="clientes_unificados.txt",
-                mime="text/plain"
-            )
+        # Cada formato é gerado em disco só quando pedido, uma vez por execução
+        for coluna, formato in zip(st.columns(len(FORMATOS_EXPORTACAO)), FORMATOS_EXPORTACAO.values()):
+            with coluna:
+                st.download_button(
+                    label=formato.rotulo,
+                    data=partial(ler_exportacao_da_execucao, execucao_atual, df_resultados, formato.nome),
+                    file_name=formato.nome_arquivo(),
+                    mime=formato.mime,
+                    key=f"exportar_{formato.nome}"
+                )
     else:
         st.info("👆 Processe os dados para habilitar o download.")
 
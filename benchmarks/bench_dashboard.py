@@ -0,0 +1,56 @@
+"""Compara o dashboard montado dos agregados com os gráficos anteriores sobre a tabela inteira
+
+Mede o tempo para montar as figuras e o tamanho do JSON enviado ao navegador.
+
+Uso: python benchmarks/bench_dashboard.py [clientes]
+"""
+import os
+import sys
+
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.dashboard import agregados_dashboard, figuras_dashboard
+from comum import cronometrar, gerar_resultados
+
+
+def figuras_anteriores(df_resultados):
+    """Gráficos anteriores do dashboard, mantidos apenas para comparação"""
+    figuras = [
+        px.bar(df_resultados.head(10), x='Razao_Social', y='Valor_Total', color='Valor_Total'),
+        px.pie(df_resultados, names='PDF_Disponivel', color='PDF_Disponivel'),
+        px.histogram(df_resultados, x='Valor_Total', nbins=20)
+    ]
+    df_datas = df_resultados[df_resultados['Data_Vencimento'] != 'datas variadas'].copy()
+    df_datas['Data_Vencimento'] = pd.to_datetime(df_datas['Data_Vencimento'], format='%d/%m/%Y')
+    df_datas = df_datas.sort_values('Data_Vencimento')
+    figuras.append(px.scatter(df_datas, x='Data_Vencimento', y='Valor_Total', size='Valor_Total',
+                              color='Razao_Social'))
+    return figuras
+
+
+def figuras_atuais(df_resultados):
+    return list(figuras_dashboard(agregados_dashboard(df_resultados)).values())
+
+
+def tamanho_json(figuras):
+    return sum(len(figura.to_json()) for figura in figuras)
+
+
+def main():
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"{'Clientes':>10} {'Anterior':>10} {'JSON ant.':>11} {'Traces ant.':>12} "
+          f"{'Atual':>8} {'JSON atual':>11} {'Traces':>7}")
+    for n in (clientes // 100, clientes // 10, clientes):
+        df = gerar_resultados(n).sort_values('Valor_Total', ascending=False)
+        anteriores, tempo_anterior = cronometrar(figuras_anteriores, df)
+        atuais, tempo_atual = cronometrar(figuras_atuais, df)
+        print(f"{n:>10,} {tempo_anterior:>9.2f}s {tamanho_json(anteriores) / 1024 ** 2:>9.1f}MB "
+              f"{sum(len(f.data) for f in anteriores):>12,} {tempo_atual:>7.2f}s "
+              f"{tamanho_json(atuais) / 1024 ** 2:>9.1f}MB {sum(len(f.data) for f in atuais):>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Compara a exportação da planilha de resultados com a versão anterior (openpyxl)
+
+Uso: python benchmarks/bench_excel.py [linhas]
+"""
+import os
+import sys
+import tempfile
+
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.pipeline import COLUNAS_PLANILHA, criar_planilha_excel
+from comum import cronometrar, gerar_resultados
+
+
+def exportacao_anterior(df_resultados, destino):
+    with pd.ExcelWriter(destino, engine='openpyxl') as writer:
+        df_export = df_resultados.copy()
+        df_export['Valor_Total'] = df_export['Valor_Total'].apply(
+            lambda x: f'R$ {x:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+        )
+        df_export[COLUNAS_PLANILHA].to_excel(writer, sheet_name='Clientes_Unificados', index=False)
+        stats_df = pd.DataFrame({
+            'Métrica': ['Total de Clientes', 'Valor Total', 'Média por Cliente', 'Clientes com PDF'],
+            'Valor': [
+                len(df_resultados),
+                f"R$ {df_resultados['Valor_Total'].sum():,.2f}",
+                f"R$ {df_resultados['Valor_Total'].mean():,.2f}",
+                df_resultados['PDF_Disponivel'].eq('Sim').sum()
+            ]
+        })
+        stats_df.to_excel(writer, sheet_name='Estatisticas', index=False)
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df_resultados = gerar_resultados(linhas)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        anterior = os.path.join(diretorio, 'anterior.xlsx')
+        novo = os.path.join(diretorio, 'novo.xlsx')
+        _, tempo_anterior = cronometrar(exportacao_anterior, df_resultados, anterior)
+        _, tempo_novo = cronometrar(criar_planilha_excel, df_resultados, novo)
+
+        aba = openpyxl.load_workbook(novo, read_only=True)['Clientes_Unificados']
+        celula = next(aba.iter_rows(min_row=2, max_row=2))[COLUNAS_PLANILHA.index('Valor_Total')]
+
+        print(f"Linhas: {linhas:,}")
+        print(f"openpyxl + .apply:     {tempo_anterior:7.2f} s  {os.path.getsize(anterior) / 1024 ** 2:6.2f} MB")
+        print(f"criar_planilha_excel:  {tempo_novo:7.2f} s  {os.path.getsize(novo) / 1024 ** 2:6.2f} MB")
+        print(f"Aceleração: {tempo_anterior / tempo_novo:.1f}x  "
+              f"Valor_Total: {type(celula.value).__name__} com formato {celula.number_format!r}")
+
+
+if __name__ == '__main__':
+    main()
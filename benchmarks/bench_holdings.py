@@ -0,0 +1,84 @@
+"""Compara a identificação de holdings com o laço por iterrows anterior
+
+Uso: python benchmarks/bench_holdings.py [linhas]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.holdings import identificar_holdings
+from comum import cronometrar
+
+
+def gerar_planilha(linhas, semente=0):
+    """Gera CNPJs com telefones, em que ~10% dos CNPJs compartilham telefone
+
+    Alguns CNPJs recebem um segundo telefone, formando cadeias entre grupos.
+    """
+    rng = np.random.default_rng(semente)
+    total_cnpjs = max(linhas // 5, 1)
+    telefone_cnpj = np.arange(total_cnpjs) + 11_900_000_000
+    compartilhados = rng.random(total_cnpjs) < 0.1
+    telefone_cnpj[compartilhados] = rng.choice(telefone_cnpj[compartilhados], size=compartilhados.sum())
+    
+    cnpj_linha = rng.integers(0, total_cnpjs, size=linhas)
+    telefone_linha = telefone_cnpj[cnpj_linha]
+    segundo_telefone = rng.random(linhas) < 0.01
+    telefone_linha[segundo_telefone] = rng.choice(telefone_cnpj, size=segundo_telefone.sum())
+    return pd.DataFrame({
+        'CNPJ': pd.Series(cnpj_linha).map('{:014d}'.format),
+        'Telefone_Contato': telefone_linha,
+        'Razao_Social': pd.Series(cnpj_linha).map('Empresa {}'.format),
+        'ID_Cliente': cnpj_linha,
+    })
+
+
+def holdings_anterior(df):
+    """Laço anterior de processar_dados, mantido apenas para comparação"""
+    df_agrupado_cnpj = df.groupby('CNPJ').agg({
+        'Telefone_Contato': 'first',
+        'Razao_Social': 'first',
+        'ID_Cliente': lambda x: list(set(x))
+    }).reset_index()
+    
+    telefone_para_cnpjs = {}
+    for _, row in df_agrupado_cnpj.iterrows():
+        telefone = row['Telefone_Contato']
+        if pd.isna(telefone):
+            continue
+        telefone = str(telefone)
+        if telefone not in telefone_para_cnpjs:
+            telefone_para_cnpjs[telefone] = []
+        telefone_para_cnpjs[telefone].append(row['CNPJ'])
+    
+    cnpj_para_telefone_principal = {}
+    for telefone, cnpjs in telefone_para_cnpjs.items():
+        if len(cnpjs) > 1:
+            for cnpj in cnpjs:
+                cnpj_para_telefone_principal[cnpj] = telefone
+    return df['CNPJ'].map(cnpj_para_telefone_principal).fillna(df['Telefone_Contato'])
+
+
+def holdings_atual(df):
+    holdings = identificar_holdings(df['CNPJ'], df['Telefone_Contato'])
+    return df['CNPJ'].map(holdings['Telefone_Principal']).fillna(df['Telefone_Contato'])
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    print(f"{'Linhas':>10} {'Laço anterior':>14} {'Union-find':>11} {'Holdings ant.':>14} {'Holdings novo':>14}")
+    for n in (linhas // 100, linhas // 10, linhas):
+        df = gerar_planilha(n)
+        anterior, tempo_anterior = cronometrar(holdings_anterior, df)
+        atual, tempo_atual = cronometrar(holdings_atual, df)
+        grupos_anterior = df.assign(T=anterior.astype(str)).groupby('T')['CNPJ'].nunique().gt(1).sum()
+        grupos_atual = df.assign(T=atual.astype(str)).groupby('T')['CNPJ'].nunique().gt(1).sum()
+        print(f"{n:>10,} {tempo_anterior:>13.3f}s {tempo_atual:>10.3f}s {grupos_anterior:>14,} {grupos_atual:>14,}")
+
+
+if __name__ == '__main__':
+    main()
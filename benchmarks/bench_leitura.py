@@ -0,0 +1,86 @@
+"""Compara a leitura da planilha com o ``pd.read_excel`` da planilha inteira
+
+Gera um .xlsx no formato do export (título, cabeçalho na segunda linha e
+colunas que o pipeline não usa) e mede cada motor disponível.
+
+Uso: python benchmarks/bench_leitura.py [linhas] [colunas_extras]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.leitura import COLUNAS_LEITURA, ler_planilha, motor_padrao
+from comum import cronometrar
+
+
+def gerar_planilha(caminho, linhas, colunas_extras=15, semente=0):
+    """Grava uma planilha sintética com as colunas do export e colunas extras"""
+    rng = np.random.default_rng(semente)
+    clientes = rng.integers(0, max(linhas // 5, 1), size=linhas)
+    centavos = rng.integers(100, 500_000, size=linhas)
+    dias = rng.integers(0, 60, size=linhas)
+    extras = [f'Campo Extra {i}' for i in range(colunas_extras)]
+
+    # Livro comum (não write_only) para gravar strings compartilhadas e a
+    # dimensão da aba, como nos arquivos exportados pelo Excel
+    livro = openpyxl.Workbook()
+    aba = livro.active
+    aba.title = 'Contas'
+    aba.append(['Relatório de Contas a Receber'])
+    aba.append([*COLUNAS_LEITURA, 'Data', *extras])
+    inicio = datetime(2024, 1, 1)
+    for i in range(linhas):
+        c = int(clientes[i])
+        valor = f'R$ {centavos[i] / 100:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+        vencimento = inicio + timedelta(days=int(dias[i]))
+        aba.append([
+            1000 + c, f'Empresa {c}', f'{c:014d}', vencimento, valor,
+            valor if i % 3 == 0 else None,
+            f'https://exemplo.com/boleto/{i}.pdf', f'https://exemplo.com/nfse/{c}.pdf',
+            None, None, 11_900_000_000 + c // 3, inicio,
+            *(f'texto {i} {j}' if j % 2 else i * j for j in range(colunas_extras))
+        ])
+    livro.save(caminho)
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    colunas_extras = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'contas.xlsx')
+        gerar_planilha(caminho, linhas, colunas_extras)
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+        print(f"Linhas: {linhas:,}  colunas: {len(COLUNAS_LEITURA) + 1 + colunas_extras}  "
+              f"arquivo: {len(conteudo) / 1024 ** 2:.1f} MB")
+
+        anterior, tempo_anterior = cronometrar(pd.read_excel, caminho, header=1)
+        print(f"read_excel (planilha inteira): {tempo_anterior:8.3f} s")
+
+        referencia, tempo_referencia = cronometrar(ler_planilha, caminho, motor='openpyxl')
+        print(f"ler_planilha (openpyxl): {tempo_referencia:8.3f} s  "
+              f"aceleração: {tempo_anterior / tempo_referencia:.1f}x")
+
+        # Os demais motores devem produzir o mesmo DataFrame do read_excel com
+        # as mesmas colunas e tipos
+        motores = ['streaming'] + (['calamine'] if motor_padrao() == 'calamine' else [])
+        for motor in motores:
+            novo, tempo = cronometrar(ler_planilha, caminho, motor=motor)
+            print(f"ler_planilha ({motor}): {tempo:8.3f} s  "
+                  f"iguais: {novo.equals(referencia)}  aceleração: {tempo_anterior / tempo:.1f}x")
+
+        _, tempo_hash = cronometrar(lambda: hashlib.sha256(conteudo).hexdigest(), repeticoes=3)
+        print(f"Rerun com cache (sha256 do conteúdo): {tempo_hash:8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
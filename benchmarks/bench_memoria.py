@@ -0,0 +1,88 @@
+"""Compara a memória da planilha e da tabela de trabalho com a representação anterior
+
+A representação anterior guarda todas as colunas lidas (inclusive ``Data``)
+com os textos como strings, e a tabela de trabalho mantém os textos dos
+valores e as colunas derivadas como strings. A linha "(object)" mostra a
+planilha com os textos como objetos Python (pandas 2 ou sem pyarrow). A atual compacta os textos
+repetidos em categóricos e descarta as colunas que não são usadas. Os
+totais e as assinaturas dos grupos devem ser iguais.
+
+Uso: python benchmarks/bench_memoria.py [linhas]
+"""
+import os
+import pickle
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import gerar_contas
+from comum import cronometrar
+
+from cobranca.holdings import identificar_holdings
+from cobranca.leitura import COLUNAS_RENOMEAR, TIPOS_COLUNAS, compactar_textos
+from cobranca.metricas import Metricas
+from cobranca.pipeline import agregar_grupos, assinaturas_dos_grupos, processar_dados
+from cobranca.valores import converter_valores_brl
+
+
+def tabela_trabalho_anterior(df):
+    """Preparação dos dados como era feita antes, sem compactar nem descartar colunas"""
+    df = df.rename(columns=COLUNAS_RENOMEAR)
+    df['Data_Vencimento'] = pd.to_datetime(df['Data_Vencimento'], errors='coerce')
+    df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+    df['Valor_Liquido'] = df['Valor_Liquido'].fillna(df['Valor_Bruto'])
+    df['Valor_Atualizado'], _ = converter_valores_brl(df['Valor_Liquido'])
+    holdings = identificar_holdings(df['CNPJ'], df['Telefone_Contato'])
+    df['Telefone_Agrupado'] = df['CNPJ'].map(holdings['Telefone_Principal']).fillna(df['Telefone_Contato'])
+    df['Holding_ID'] = df['CNPJ'].map(holdings['Holding_ID'])
+    return df
+
+
+def memoria_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def exibir(rotulo, anterior, atual):
+    print(f"{rotulo:<28} {anterior:10.1f} MB {atual:10.1f} MB   redução: {1 - atual / anterior:4.0%}")
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    bases = ['https://portal-a.exemplo.com.br', 'https://portal-b.exemplo.com.br']
+
+    # Planilha como lida antes: textos com os tipos de TIPOS_COLUNAS, mais a coluna Data
+    planilha = gerar_contas(linhas, bases)
+    planilha = planilha.astype({nome: tipo for nome, tipo in TIPOS_COLUNAS.items() if nome in planilha})
+    compacta, tempo_compactar = cronometrar(
+        compactar_textos, planilha.drop(columns=['Data']), TIPOS_COLUNAS
+    )
+    print(f"Linhas: {linhas:,}  compactação: {tempo_compactar:.2f} s")
+    print(f"{'':<28} {'anterior':>13} {'atual':>13}")
+    exibir("Planilha lida", memoria_mb(planilha), memoria_mb(compacta))
+    exibir("Planilha lida (object)", memoria_mb(planilha.astype(object)), memoria_mb(compacta))
+    exibir("Planilha serializada", len(pickle.dumps(planilha)) / 1024 ** 2, len(pickle.dumps(compacta)) / 1024 ** 2)
+
+    anterior = tabela_trabalho_anterior(planilha)
+    grupo_cols = ['Telefone_Agrupado', 'CNPJ']
+    resultado_anterior = agregar_grupos(anterior, grupo_cols, id_como_texto=True)
+    resultado_anterior['Assinatura'] = assinaturas_dos_grupos(anterior, grupo_cols)
+
+    metricas = Metricas()
+    resultado, _, stats = processar_dados(compacta, baixar_pdfs_option=False, metricas=metricas)
+    exibir("Tabela de trabalho", memoria_mb(anterior), metricas.memoria['trabalho'] / 1024 ** 2)
+
+    # Mesmos grupos, com o mesmo valor total e a mesma assinatura
+    anterior_por_grupo = resultado_anterior.set_index('Grupo_ID').sort_index()
+    atual_por_grupo = resultado.set_index('Grupo_ID').sort_index()
+    iguais = (
+        anterior_por_grupo.index.equals(atual_por_grupo.index)
+        and anterior_por_grupo['Valor_Total'].equals(atual_por_grupo['Valor_Total'])
+        and (anterior_por_grupo['Assinatura'].to_numpy() == stats['assinaturas'].sort_index().to_numpy()).all()
+    )
+    print(f"Valor total: R$ {stats['valor_total']:,.2f}  totais e assinaturas dos grupos iguais: {iguais}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Mede o ``processar_dados`` de ponta a ponta com dados e PDFs sintéticos
+
+Gera planilhas no layout do export (``COLUNAS_RENOMEAR``) em várias escalas,
+com proporção de holdings e taxa de links duplicados configuráveis, e serve
+os PDFs de servidores HTTP locais com latência, erros e timeouts injetáveis.
+Cada etapa é cronometrada pelas ``Metricas`` do pipeline; os tempos podem
+ser gravados como linha de base e comparados em execuções seguintes. Tudo
+roda localmente, sem acesso à rede.
+
+Uso: python benchmarks/bench_pipeline.py [--linhas 1000,10000,100000] [--sem-pdfs]
+     [--latencia-ms 20] [--erros 0.01] [--timeouts 0] [--salvar-base base.json]
+     [--base base.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import PyPDF2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.exportacao import exportar
+from cobranca.leitura import ler_planilha
+from cobranca.metricas import Metricas
+from cobranca.pipeline import criar_planilha_excel, processar_dados
+from cobranca.valores import formatar_valores_brl
+
+# PDFs distintos servidos; cada URL recebe um deles pelo número do documento
+PDFS_DISTINTOS = 64
+
+# Regressão sinalizada quando a etapa fica mais lenta que a base além disso
+TOLERANCIA_PADRAO = 0.25
+
+
+def gerar_pdf(paginas, largura):
+    escritor = PyPDF2.PdfWriter()
+    for _ in range(paginas):
+        escritor.add_blank_page(largura, 842)
+    buffer = BytesIO()
+    escritor.write(buffer)
+    return buffer.getvalue()
+
+
+def gerar_contas(linhas, bases, proporcao_holdings=0.1, duplicacao_links=0.3, semente=0):
+    """Gera um export de contas a receber com as colunas de ``COLUNAS_RENOMEAR``
+
+    Cada cliente tem ~5 contas. ``proporcao_holdings`` dos clientes compartilham
+    o telefone com outro cliente (formando holdings) e ``duplicacao_links`` das
+    contas reaproveitam o link de boleto/NFS-e de outra conta. Os links são
+    distribuídos entre os servidores de ``bases``.
+    """
+    rng = np.random.default_rng(semente)
+    total_clientes = max(linhas // 5, 1)
+    telefones = np.arange(total_clientes) + 11_900_000_000
+    compartilhados = rng.random(total_clientes) < proporcao_holdings
+    telefones[compartilhados] = rng.choice(telefones, size=compartilhados.sum())
+
+    clientes = rng.integers(0, total_clientes, size=linhas)
+    centavos = pd.Series(rng.integers(100, 1_000_000, size=linhas) / 100)
+    liquido = formatar_valores_brl(centavos * 0.95)
+    liquido[rng.random(linhas) < 0.6] = None
+    vencimentos = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 60, size=linhas), unit='D')
+
+    def links(tipo):
+        documentos = np.arange(linhas)
+        duplicados = rng.random(linhas) < duplicacao_links
+        documentos[duplicados] = rng.integers(0, linhas, size=duplicados.sum())
+        servidores = np.asarray(bases, dtype=object)[documentos % len(bases)]
+        return pd.Series(servidores + f'/{tipo}/' + pd.Series(documentos).astype(str).to_numpy() + '.pdf')
+
+    return pd.DataFrame({
+        'ID Emp.': clientes + 1000,
+        'Razão Social': pd.Series(clientes).map('Empresa {} Comércio e Serviços Ltda'.format),
+        'CPF/CNPJ': pd.Series(clientes).map('{:014d}'.format),
+        'Vencimento': vencimentos,
+        'Valor': formatar_valores_brl(centavos),
+        'Valor Líquido': liquido,
+        'Boleto PDF': links('boleto') if bases else None,
+        'Nfse PDF': links('nfse') if bases else None,
+        'Faturamento PDF': None,
+        'Funcionários PDF': None,
+        'Nosso Núm.': telefones[clientes],
+        'Data': pd.Timestamp('2024-01-01')
+    })
+
+
+class ServidorPDFs(ThreadingHTTPServer):
+    """Servidor local de PDFs com latência, erros (503) e timeouts injetáveis
+
+    Um timeout é simulado segurando a resposta por ``espera_timeout_s``,
+    além do timeout do cliente.
+    """
+    daemon_threads = True
+
+    def __init__(self, latencia_ms=0, taxa_erros=0.0, taxa_timeouts=0.0, espera_timeout_s=15, semente=0):
+        super().__init__(('127.0.0.1', 0), _TratadorPDF)
+        self.latencia = latencia_ms / 1000
+        self.taxa_erros = taxa_erros
+        self.taxa_timeouts = taxa_timeouts
+        self.espera_timeout = espera_timeout_s
+        self.pdfs = [gerar_pdf(1 + i % 3, 400 + i) for i in range(PDFS_DISTINTOS)]
+        self.requisicoes = 0
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def sortear(self):
+        with self._lock:
+            self.requisicoes += 1
+            return self._aleatorio.random()
+
+
+class _TratadorPDF(BaseHTTPRequestHandler):
+    def do_GET(self):
+        servidor = self.server
+        sorteio = servidor.sortear()
+        time.sleep(servidor.latencia)
+        if sorteio < servidor.taxa_timeouts:
+            time.sleep(servidor.espera_timeout)
+            return
+        if sorteio < servidor.taxa_timeouts + servidor.taxa_erros:
+            self.send_response(503)
+            self.end_headers()
+            return
+        try:
+            documento = int(os.path.splitext(os.path.basename(self.path))[0])
+        except ValueError:
+            self.send_response(404)
+            self.end_headers()
+            return
+        corpo = servidor.pdfs[documento % PDFS_DISTINTOS]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def medir_cenario(df_export, args, diretorio):
+    """Executa leitura (opcional), processamento e exportação; retorna o resumo do cenário"""
+    metricas = Metricas()
+    if args.planilha:
+        caminho = os.path.join(diretorio, 'contas.xlsx')
+        df_export.to_excel(caminho, index=False, startrow=1, engine='xlsxwriter')
+        inicio = time.perf_counter()
+        df_export = ler_planilha(caminho)
+        metricas.registrar_etapa('leitura', time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    resultados, pdfs, stats = processar_dados(
+        df_export,
+        baixar_pdfs_option=not args.sem_pdfs,
+        agrupar_holdings_option=True,
+        max_workers_download=args.downloads,
+        max_downloads_por_host=args.downloads_por_host,
+        processos_unificacao=args.processos,
+        otimizar_pdfs=args.otimizar_pdfs,
+        callback_aviso=lambda mensagem: None,
+        diretorio_pdfs=diretorio,
+        metricas=metricas
+    )
+    total = time.perf_counter() - inicio
+
+    metricas.iniciar_etapa('exportacao')
+    criar_planilha_excel(resultados, os.path.join(diretorio, 'Clientes_Unificados.xlsx'))
+    with open(os.path.join(diretorio, 'clientes_unificados.csv'), 'wb') as arquivo:
+        exportar(resultados, 'csv', arquivo)
+    metricas.encerrar_etapa()
+
+    dados = metricas.para_dict()
+    downloads = sum(item['latencia']['total'] for item in dados['downloads'])
+    falhas = sum(item['latencia']['total'] for item in dados['downloads'] if item['status'] != '200')
+    return {
+        'etapas': dados['etapas'],
+        'processamento': total,
+        'clientes': int(stats['total_clientes']),
+        'clientes_com_pdf': int(stats['clientes_com_pdf']),
+        'valor_total': round(float(stats['valor_total']), 2),
+        'downloads': downloads,
+        'falhas_download': falhas,
+        'pdfs': dados['pdfs']
+    }
+
+
+def exibir_cenario(nome, resumo, base=None, tolerancia=TOLERANCIA_PADRAO):
+    """Imprime os tempos do cenário e retorna as etapas que regrediram em relação à base"""
+    print(f"\n{nome}: {resumo['clientes']:,} clientes • {resumo['clientes_com_pdf']:,} com PDF • "
+          f"{resumo['downloads']:,} downloads ({resumo['falhas_download']:,} falhas)")
+    if resumo['pdfs']['bytes_entrada']:
+        print(f"  PDFs: entrada {resumo['pdfs']['bytes_entrada'] / 1024 ** 2:.1f} MB • "
+              f"unificados {resumo['pdfs']['bytes_saida'] / 1024 ** 2:.1f} MB • "
+              f"{resumo['pdfs']['duplicados']} repetidos ignorados • "
+              f"{resumo['pdfs']['segundos_otimizacao']:.2f}s otimizando")
+    regressoes = []
+    etapas_base = (base or {}).get('etapas', {})
+    for etapa, segundos in [*resumo['etapas'].items(), ('processamento', resumo['processamento'])]:
+        anterior = base.get('processamento') if base and etapa == 'processamento' else etapas_base.get(etapa)
+        linha = f"  {etapa:<14} {segundos:9.3f} s"
+        if anterior:
+            razao = segundos / anterior
+            linha += f"  base {anterior:9.3f} s  {razao:5.2f}x"
+            # Etapas muito curtas variam mais que a tolerância por ruído
+            if razao > 1 + tolerancia and segundos - anterior > 0.05:
+                linha += '  ⚠️ regressão'
+                regressoes.append(etapa)
+        print(linha)
+    if base:
+        for chave in ('clientes', 'clientes_com_pdf', 'valor_total'):
+            if base.get(chave) != resumo[chave]:
+                print(f"  ⚠️ {chave} diferente da base: {base.get(chave)} → {resumo[chave]}")
+                regressoes.append(chave)
+    return regressoes
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--linhas', default='1000,10000', help='escalas, separadas por vírgula (padrão: 1000,10000)')
+    parser.add_argument('--holdings', type=float, default=0.1, help='proporção de clientes em holdings (padrão: 0.1)')
+    parser.add_argument('--duplicacao', type=float, default=0.3, help='taxa de links duplicados (padrão: 0.3)')
+    parser.add_argument('--sem-pdfs', action='store_true', help='não baixa nem unifica os PDFs')
+    parser.add_argument('--planilha', action='store_true', help='grava e lê o .xlsx, medindo a leitura')
+    parser.add_argument('--servidores', type=int, default=1, help='servidores (hosts) de PDFs (padrão: 1)')
+    parser.add_argument('--latencia-ms', type=float, default=20, help='latência de cada PDF (padrão: 20)')
+    parser.add_argument('--erros', type=float, default=0.0, help='proporção de respostas 503 (padrão: 0)')
+    parser.add_argument('--timeouts', type=float, default=0.0, help='proporção de respostas que não chegam (padrão: 0)')
+    parser.add_argument('--downloads', type=int, default=16, help='downloads simultâneos (padrão: 16)')
+    parser.add_argument('--downloads-por-host', type=int, default=None,
+                        help='conexões simultâneas por servidor (padrão: o valor de --downloads)')
+    parser.add_argument('--processos', type=int, default=1, help='processos de unificação (padrão: 1)')
+    parser.add_argument('--otimizar-pdfs', action='store_true', help='otimiza os PDFs unificados')
+    parser.add_argument('--base', help='JSON de linha de base para comparação')
+    parser.add_argument('--salvar-base', help='grava os tempos medidos como linha de base neste JSON')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help=f'aumento relativo tolerado por etapa (padrão: {TOLERANCIA_PADRAO})')
+    return parser
+
+
+def main():
+    args = criar_parser().parse_args()
+    escalas = [int(linhas) for linhas in args.linhas.split(',')]
+    servidores = [] if args.sem_pdfs else [
+        ServidorPDFs(args.latencia_ms, args.erros, args.timeouts, semente=indice)
+        for indice in range(args.servidores)
+    ]
+    base = {}
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+
+    resultados = {}
+    regressoes = []
+    for linhas in escalas:
+        nome = f"{linhas} linhas, {args.holdings:g} holdings, {args.duplicacao:g} duplicados" + (
+            '' if args.sem_pdfs else f", {args.latencia_ms:g} ms, {args.erros:g} erros, {args.timeouts:g} timeouts"
+        )
+        df_export = gerar_contas(linhas, [servidor.base for servidor in servidores], args.holdings, args.duplicacao)
+        with tempfile.TemporaryDirectory() as diretorio:
+            resultados[nome] = medir_cenario(df_export, args, diretorio)
+        regressoes += exibir_cenario(nome, resultados[nome], base.get(nome), args.tolerancia)
+
+    if args.salvar_base:
+        with open(args.salvar_base, 'w', encoding='utf-8') as f:
+            json.dump({**base, **resultados}, f, ensure_ascii=False, indent=1)
+        print(f"\nLinha de base gravada em {args.salvar_base}")
+    for servidor in servidores:
+        servidor.shutdown()
+    if regressoes:
+        print(f"\n⚠️ {len(regressoes)} regressão(ões) em relação à base")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Compara a unificação em um processo (padrão atual) com o pool de processos
+
+O padrão anterior usava um processo por CPU. Com mais de um processo os
+PDFs baixados vão para o spool em disco e cada processo do pool ('spawn')
+reimporta o pacote, o que custa mais que a unificação em si na maioria dos
+cenários. Mede ``processar_dados`` de ponta a ponta, com os PDFs servidos
+por um servidor HTTP local, e confere que os resultados são os mesmos.
+
+Uso: python benchmarks/bench_processos.py [--linhas 500,5000] [--processos N] [--latencia-ms 0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import ServidorPDFs, gerar_contas
+from cobranca.pipeline import processar_dados
+from comum import cronometrar
+
+
+def processar(df_export, processos):
+    with tempfile.TemporaryDirectory() as diretorio:
+        resultados, pdfs, stats = processar_dados(
+            df_export,
+            baixar_pdfs_option=True,
+            agrupar_holdings_option=True,
+            processos_unificacao=processos,
+            callback_aviso=lambda mensagem: None,
+            diretorio_pdfs=diretorio
+        )
+        return sorted(pdfs), sorted(os.path.getsize(info['caminho']) for info in pdfs.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--linhas', default='500,5000', help='escalas, separadas por vírgula (padrão: 500,5000)')
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                        help='processos do pool comparado (padrão: número de CPUs, o padrão anterior)')
+    parser.add_argument('--latencia-ms', type=float, default=0, help='latência de cada PDF (padrão: 0)')
+    args = parser.parse_args()
+
+    servidor = ServidorPDFs(args.latencia_ms)
+    print(f"{'Linhas':>8} {'anterior':>12} {'atual':>12} {'ganho':>8}  resultados iguais")
+    print(f"{'':>8} {f'{args.processos} proc. (s)':>12} {'1 proc. (s)':>12}")
+    try:
+        for linhas in [int(valor) for valor in args.linhas.split(',')]:
+            df_export = gerar_contas(linhas, [servidor.base])
+            # Uma execução para aquecer o cache de disco e os imports
+            processar(df_export, 1)
+            resultado_anterior, tempo_anterior = cronometrar(processar, df_export, args.processos)
+            resultado_atual, tempo_atual = cronometrar(processar, df_export, 1)
+            print(f"{linhas:>8} {tempo_anterior:12.2f} {tempo_atual:12.2f} {tempo_anterior / tempo_atual:7.1f}x  "
+                  f"{resultado_anterior == resultado_atual}")
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compara a unificação otimizada dos PDFs com a unificação anterior (PdfMerger)
+
+Gera documentos como os dos portais: cada um embute a própria cópia da mesma
+fonte e do mesmo logotipo e grava o conteúdo das páginas sem compressão. Os
+grupos repetem parte dos documentos (a mesma NFS-e ou lista de funcionários
+em várias contas). Mede os bytes de entrada e de saída, o tempo de
+unificação e o tamanho do ZIP, e confere que o conteúdo das páginas é o
+mesmo, sem as páginas dos documentos repetidos.
+
+Uso: python benchmarks/bench_unificacao.py [grupos] [documentos_por_grupo]
+"""
+import os
+import random
+import sys
+import tempfile
+from io import BytesIO
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.pipeline import criar_arquivo_zip
+from cobranca.unificacao import unificar_pdfs
+from comum import cronometrar
+
+# Documentos distintos; os grupos sorteiam entre eles, com repetição
+DOCUMENTOS_DISTINTOS = 40
+
+
+def _stream(dados, **entradas):
+    stream = DecodedStreamObject()
+    stream._data = dados
+    stream.update({NameObject(chave): valor for chave, valor in entradas.items()})
+    return stream
+
+
+def gerar_documento(numero, fonte, logotipo, paginas=2):
+    """PDF com fonte e logotipo embutidos e conteúdo das páginas sem compressão"""
+    escritor = PyPDF2.PdfWriter()
+    arquivo_fonte = escritor._add_object(_stream(fonte, **{'/Length1': NumberObject(len(fonte))}))
+    descritor = escritor._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/FontDescriptor'),
+        NameObject('/FontName'): NameObject('/Portal'),
+        NameObject('/FontFile2'): arquivo_fonte
+    }))
+    fonte_pagina = escritor._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/TrueType'),
+        NameObject('/BaseFont'): NameObject('/Portal'),
+        NameObject('/FontDescriptor'): descritor
+    }))
+    imagem = escritor._add_object(_stream(logotipo, **{
+        '/Type': NameObject('/XObject'), '/Subtype': NameObject('/Image'),
+        '/Width': NumberObject(120), '/Height': NumberObject(60),
+        '/ColorSpace': NameObject('/DeviceRGB'), '/BitsPerComponent': NumberObject(8)
+    }))
+    for pagina_numero in range(paginas):
+        linhas = [f"BT /F1 9 Tf 40 {800 - 12 * i} Td (Documento {numero} pagina {pagina_numero} "
+                  f"item {i} valor R$ {numero * 31 + i},00) Tj ET" for i in range(60)]
+        conteudo = escritor._add_object(_stream(('q 120 0 0 60 40 760 cm /Logo Do Q\n' + '\n'.join(linhas)).encode()))
+        escritor.add_blank_page(595, 842)
+        pagina = escritor.pages[-1]
+        pagina[NameObject('/Contents')] = conteudo
+        pagina[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): fonte_pagina}),
+            NameObject('/XObject'): DictionaryObject({NameObject('/Logo'): imagem}),
+            NameObject('/ProcSet'): ArrayObject([NameObject('/PDF'), NameObject('/Text'), NameObject('/ImageC')])
+        })
+    buffer = BytesIO()
+    escritor.write(buffer)
+    return buffer.getvalue()
+
+
+def gerar_grupos(grupos, documentos_por_grupo, semente=0):
+    aleatorio = random.Random(semente)
+    fonte = aleatorio.randbytes(60_000)  # fonte já comprimida: bytes sem padrão
+    logotipo = bytes((x * 7 + y * 3) % 256 for y in range(60) for x in range(120 * 3))
+    documentos = [gerar_documento(numero, fonte, logotipo) for numero in range(DOCUMENTOS_DISTINTOS)]
+    return [
+        [documentos[aleatorio.randrange(len(documentos))] for _ in range(documentos_por_grupo)]
+        for _ in range(grupos)
+    ]
+
+
+def unificar_todos(grupos, diretorio, otimizar):
+    pdfs = {}
+    bytes_saida = 0
+    for indice, documentos in enumerate(grupos):
+        caminho = os.path.join(diretorio, f'{indice}.pdf')
+        sucesso, erros, relatorio = unificar_pdfs([BytesIO(pdf) for pdf in documentos], caminho, otimizar=otimizar)
+        assert sucesso and not erros, erros
+        pdfs[indice] = {'caminho': caminho, 'nome': f'{indice}.pdf'}
+        bytes_saida += relatorio['bytes_saida']
+    return pdfs, bytes_saida
+
+
+def conteudos(caminho):
+    return [pagina.get_contents().get_data() for pagina in PyPDF2.PdfReader(caminho).pages]
+
+
+def main():
+    total_grupos = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    documentos_por_grupo = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    grupos = gerar_grupos(total_grupos, documentos_por_grupo)
+    bytes_entrada = sum(len(pdf) for documentos in grupos for pdf in documentos)
+    repetidos = sum(len(documentos) - len(set(documentos)) for documentos in grupos)
+    print(f"Grupos: {total_grupos}  documentos: {total_grupos * documentos_por_grupo} "
+          f"({repetidos} repetidos no grupo)  entrada: {bytes_entrada / 1024 ** 2:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as anterior, tempfile.TemporaryDirectory() as atual:
+        (pdfs_anteriores, saida_anterior), tempo_anterior = cronometrar(unificar_todos, grupos, anterior, False)
+        (pdfs_atuais, saida_atual), tempo_atual = cronometrar(unificar_todos, grupos, atual, True)
+        zip_anterior = len(criar_arquivo_zip(pdfs_anteriores).getvalue())
+        zip_atual = len(criar_arquivo_zip(pdfs_atuais).getvalue())
+
+        # Mesmo conteúdo, na mesma ordem, sem os documentos repetidos
+        iguais = all(
+            [pagina for pdf in dict.fromkeys(documentos) for pagina in conteudos(BytesIO(pdf))]
+            == conteudos(pdfs_atuais[indice]['caminho'])
+            for indice, documentos in enumerate(grupos)
+        )
+
+    print(f"{'':<22} {'anterior':>12} {'otimizada':>12}")
+    print(f"{'Unificados (MB)':<22} {saida_anterior / 1024 ** 2:12.1f} {saida_atual / 1024 ** 2:12.1f}")
+    print(f"{'ZIP (MB)':<22} {zip_anterior / 1024 ** 2:12.1f} {zip_atual / 1024 ** 2:12.1f}")
+    print(f"{'Unificação (s)':<22} {tempo_anterior:12.2f} {tempo_atual:12.2f}")
+    print(f"Redução: {1 - saida_atual / saida_anterior:.0%}  conteúdo das páginas igual: {iguais}")
+
+
+if __name__ == '__main__':
+    main()
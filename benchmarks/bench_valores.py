@@ -0,0 +1,60 @@
+"""Compara a conversão de valores em reais com a cadeia de .replace anterior
+
+Uso: python benchmarks/bench_valores.py [linhas] [valores_distintos]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cobranca.valores import converter_valores_brl
+from comum import cronometrar
+
+
+def gerar_coluna(linhas, distintos=None, semente=0):
+    """Gera uma coluna no formato das planilhas exportadas: textos em reais e números
+
+    ``distintos`` limita a quantidade de valores diferentes, como acontece
+    com mensalidades que se repetem entre clientes.
+    """
+    rng = np.random.default_rng(semente)
+    centavos = rng.integers(-50_000, 5_000_000, size=distintos or linhas)
+    if distintos:
+        centavos = rng.choice(centavos, size=linhas)
+    textos = pd.Series(centavos / 100).map(
+        lambda x: f'R$ {x:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+    )
+    coluna = textos.astype(object)
+    numericos = rng.random(linhas) < 0.2
+    coluna[numericos] = centavos[numericos] / 100
+    return coluna, centavos / 100
+
+
+def conversao_anterior(coluna):
+    return pd.to_numeric(
+        coluna.replace('R\\$ ', '', regex=True).replace('.', '', regex=True).replace(',', '.', regex=True),
+        errors='coerce'
+    )
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    distintos = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    coluna, esperado = gerar_coluna(linhas, distintos)
+    
+    anterior, tempo_anterior = cronometrar(conversao_anterior, coluna, repeticoes=3)
+    (novo, invalidos), tempo_novo = cronometrar(converter_valores_brl, coluna, repeticoes=3)
+    
+    print(f"Linhas: {linhas:,}  valores distintos: {coluna.nunique():,}")
+    print(f"Cadeia de .replace: {tempo_anterior:8.3f} s  "
+          f"corretos: {int(np.isclose(anterior, esperado).sum()):,}")
+    print(f"converter_valores_brl: {tempo_novo:8.3f} s  "
+          f"corretos: {int(np.isclose(novo, esperado).sum()):,}  inválidos: {int(invalidos.sum()):,}")
+    print(f"Aceleração: {tempo_anterior / tempo_novo:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compara a aba de visualização indexada com os filtros anteriores sobre a tabela inteira
+
+Mede uma interação (filtro de PDF, ordenação, valor mínimo, resumo, página
+exibida e busca de um cliente) e a montagem do índice.
+
+Uso: python benchmarks/bench_visualizacao.py [linhas]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from comum import cronometrar, gerar_resultados
+
+from cobranca.consulta import IndiceResultados
+
+COLUNAS = ['Razao_Social', 'CNPJ', 'Telefone_Contato', 'Data_Vencimento', 'Valor_Total', 'PDF_Disponivel']
+
+
+def interacao_anterior(df_resultados, valor_minimo, cliente):
+    """Filtros, resumo e detalhe do cliente como eram feitos a cada rerun"""
+    df_filtrado = df_resultados.copy()
+    df_filtrado = df_filtrado[df_filtrado['PDF_Disponivel'] == 'Sim']
+    df_filtrado = df_filtrado.sort_values('Valor_Total')
+    df_filtrado = df_filtrado[df_filtrado['Valor_Total'] >= valor_minimo]
+    pagina = df_filtrado[COLUNAS]
+    resumo = (len(df_filtrado), df_filtrado['Valor_Total'].sum(), df_filtrado['Valor_Total'].mean(),
+              df_filtrado['PDF_Disponivel'].eq('Sim').sum())
+    opcoes = df_resultados['Razao_Social'].tolist()
+    detalhe = df_resultados[df_resultados['Razao_Social'] == cliente].iloc[0]
+    return pagina, resumo, len(opcoes), detalhe
+
+
+def interacao_atual(indice, valor_minimo, cliente):
+    visao = indice.visao('Com PDF', decrescente=False, valor_minimo=valor_minimo)
+    pagina = visao.pagina(0, 100, COLUNAS)
+    resumo = (visao.clientes, visao.valor_total, visao.media, visao.com_pdf)
+    opcoes = indice.buscar(cliente)
+    detalhe = indice.linha(opcoes[0])
+    return pagina, resumo, len(opcoes), detalhe
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = gerar_resultados(linhas).sort_values('Valor_Total', ascending=False)
+    cliente = df['Razao_Social'].iloc[linhas // 2]
+    valor_minimo = float(df['Valor_Total'].median())
+
+    indice, tempo_indice = cronometrar(IndiceResultados, df)
+    _, tempo_busca = cronometrar(indice.buscar, cliente)
+    print(f"Linhas: {linhas:,}  índice: {tempo_indice:.2f} s  índice de busca (1ª busca): {tempo_busca:.2f} s")
+
+    anterior, tempo_anterior = cronometrar(interacao_anterior, df, valor_minimo, cliente)
+    atual, tempo_atual = cronometrar(interacao_atual, indice, valor_minimo, cliente, repeticoes=5)
+    iguais = (anterior[1][0] == atual[1][0] and abs(anterior[1][1] - atual[1][1]) < 1e-6 * anterior[1][1]
+              and anterior[3].equals(atual[3]))
+    print(f"Interação anterior: {tempo_anterior * 1000:9.1f} ms  ({anterior[2]:,} razões sociais enviadas)")
+    print(f"Interação indexada: {tempo_atual * 1000:9.1f} ms  ({atual[2]:,} opções)  "
+          f"aceleração: {tempo_anterior / tempo_atual:.0f}x  resumo e cliente iguais: {iguais}")
+
+
+if __name__ == '__main__':
+    main()
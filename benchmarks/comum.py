@@ -0,0 +1,34 @@
+"""Utilitários compartilhados pelos benchmarks"""
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def cronometrar(funcao, *args, repeticoes=1, **kwargs):
+    """Executa a função ``repeticoes`` vezes e retorna (resultado, melhor tempo)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, min(tempos)
+
+
+def gerar_resultados(linhas, semente=0):
+    """Gera uma tabela de resultados no formato retornado por ``processar_dados``"""
+    rng = np.random.default_rng(semente)
+    ids = np.arange(linhas) + 1000
+    dias = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 60, size=linhas), unit='D')
+    datas = pd.Series(dias.strftime('%d/%m/%Y'))
+    datas[rng.random(linhas) < 0.3] = 'datas variadas'
+    return pd.DataFrame({
+        'ID_Cliente': ids,
+        'Razao_Social': [f'Empresa {i} Comércio e Serviços Ltda' for i in ids],
+        'CNPJ': [f'{i:014d}' for i in ids],
+        'Telefone_Contato': 11_900_000_000 + ids,
+        'Data_Vencimento': datas,
+        'Valor_Total': (rng.integers(100, 5_000_000, size=linhas) / 100),
+        'Quantidade_Contas': rng.integers(1, 10, size=linhas),
+        'PDF_Disponivel': np.where(rng.random(linhas) < 0.8, 'Sim', 'Não')
+    })
@@ -0,0 +1 @@
+"""Rotinas do Sistema de Cobrança usadas pela interface Streamlit"""
@@ -0,0 +1,7 @@
+"""Permite executar ``python -m cobranca planilha.xlsx``"""
+import sys
+
+from cobranca.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
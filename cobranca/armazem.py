@@ -0,0 +1,333 @@
+"""Armazenamento em disco das execuções do processamento
+
+Cada execução tem um diretório ``<raiz>/<id>`` com a tabela de resultados em
+Parquet, os PDFs unificados e os arquivos gerados para download. Um índice
+SQLite guarda as datas, as estatísticas e a lista de PDFs de cada execução.
+A interface mantém na sessão apenas o id da execução e carrega os resultados
+sob demanda, então reinícios do servidor não perdem o trabalho e a memória
+não cresce com o número de sessões. Execuções não acessadas dentro da
+validade são removidas com seus arquivos.
+
+Enquanto a execução está em andamento, a planilha de entrada, as opções e
+cada grupo com PDF unificado ficam registrados (checkpoint), para que uma
+execução cancelada ou interrompida seja retomada de onde parou. As
+assinaturas dos grupos de cada execução concluída permitem que a próxima
+reaproveite os PDFs dos grupos inalterados.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+from cobranca.execucao import Execucao
+from cobranca.leitura import TIPO_TEXTO
+
+DIRETORIO_EXECUCOES = os.path.join(os.path.expanduser('~'), '.cache', 'cobranca', 'execucoes')
+
+ARQUIVO_RESULTADOS = 'resultados.parquet'
+ARQUIVO_VALORES_INVALIDOS = 'valores_invalidos.parquet'
+ARQUIVO_ENTRADA = 'entrada.pickle'
+ARQUIVO_ASSINATURAS = 'assinaturas.parquet'
+
+# Situações de uma execução no índice
+EM_ANDAMENTO = 'em_andamento'
+CONCLUIDA = 'concluida'
+CANCELADA = 'cancelada'
+COM_ERRO = 'erro'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id TEXT PRIMARY KEY,
+    criada_em REAL NOT NULL,
+    acessada_em REAL NOT NULL,
+    status TEXT NOT NULL,
+    clientes INTEGER,
+    estatisticas TEXT,
+    opcoes TEXT,
+    erro TEXT,
+    anterior TEXT
+);
+CREATE TABLE IF NOT EXISTS pdfs (
+    execucao_id TEXT NOT NULL,
+    ordem INTEGER NOT NULL,
+    grupo_id TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, ordem)
+);
+CREATE TABLE IF NOT EXISTS grupos_concluidos (
+    execucao_id TEXT NOT NULL,
+    grupo_id TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, grupo_id)
+);
+"""
+
+
+def _gravar_parquet(df, caminho):
+    """Grava a tabela em Parquet; colunas com tipos mistos são gravadas como texto (vazios como nulos)"""
+    mistas = [coluna for coluna in df.columns if df[coluna].dtype == object]
+    df.astype({coluna: TIPO_TEXTO for coluna in mistas}).to_parquet(caminho, index=False)
+
+
+def _valor_json(valor):
+    """Converte escalares do numpy para o ``json.dumps``"""
+    if hasattr(valor, 'item'):
+        return valor.item()
+    raise TypeError(f'Valor não serializável: {valor!r}')
+
+
+class ArmazemExecucoes:
+    """Execuções persistidas em disco, indexadas por id
+
+    ``validade_segundos`` é o tempo sem acesso após o qual a execução é
+    removida por ``coletar_expiradas()``, chamada ao abrir o armazém e a cada
+    nova execução.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_EXECUCOES, validade_segundos=7 * 24 * 3600):
+        self.diretorio = diretorio
+        self.validade_segundos = validade_segundos
+        self.caminho_indice = os.path.join(diretorio, 'indice.sqlite3')
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.executescript(_ESQUEMA)
+            # Índices criados antes do checkpoint não têm estas colunas
+            colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(execucoes)")}
+            for coluna in ('opcoes', 'erro', 'anterior'):
+                if coluna not in colunas:
+                    conexao.execute(f"ALTER TABLE execucoes ADD COLUMN {coluna} TEXT")
+        self.coletar_expiradas()
+
+    @contextmanager
+    def _conectar(self):
+        """Conexão com o índice, em uma transação, fechada ao final
+
+        Uma conexão por operação: o armazém é compartilhado entre as threads
+        das sessões do Streamlit.
+        """
+        conexao = sqlite3.connect(self.caminho_indice, timeout=30)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _diretorio_execucao(self, id_execucao):
+        return os.path.join(self.diretorio, id_execucao)
+
+    def criar(self, df_entrada=None, opcoes=None, id_anterior=None):
+        """Registra uma nova execução e cria o seu diretório
+
+        ``df_entrada``, ``opcoes`` (valores simples, como os argumentos de
+        ``processar_dados``) e ``id_anterior`` (execução comparada no
+        reprocessamento incremental) são guardados para retomar a execução.
+        """
+        self.coletar_expiradas()
+        id_execucao = uuid.uuid4().hex
+        execucao = Execucao(id_execucao=id_execucao, diretorio=self._diretorio_execucao(id_execucao))
+        os.makedirs(execucao.diretorio)
+        if df_entrada is not None:
+            df_entrada.to_pickle(execucao.caminho(ARQUIVO_ENTRADA))
+        agora = time.time()
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT INTO execucoes (id, criada_em, acessada_em, status, opcoes, anterior) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (execucao.id, agora, agora, EM_ANDAMENTO, json.dumps(opcoes or {}), id_anterior)
+            )
+        return execucao
+
+    def registrar_grupo_concluido(self, execucao, grupo_id, info):
+        """Checkpoint de um grupo cujo PDF unificado já está no diretório da execução"""
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO grupos_concluidos (execucao_id, grupo_id, nome, arquivo) VALUES (?, ?, ?, ?)",
+                (execucao.id, str(grupo_id), info['nome'], os.path.basename(info['caminho']))
+            )
+
+    def carregar_checkpoint(self, execucao):
+        """(df_entrada, opcoes, pdfs_reaproveitados, id_anterior) para retomar a execução
+
+        ``pdfs_reaproveitados`` segue o formato de ``processar_dados``. Sem a
+        planilha de entrada (execução antiga ou já concluída) ``df_entrada``
+        é None.
+        """
+        caminho_entrada = execucao.caminho(ARQUIVO_ENTRADA)
+        df_entrada = pd.read_pickle(caminho_entrada) if os.path.exists(caminho_entrada) else None
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT opcoes, anterior FROM execucoes WHERE id = ?", (execucao.id,)
+            ).fetchone()
+            grupos = conexao.execute(
+                "SELECT grupo_id, nome, arquivo FROM grupos_concluidos WHERE execucao_id = ?",
+                (execucao.id,)
+            ).fetchall()
+        opcoes = json.loads(linha[0]) if linha and linha[0] else {}
+        pdfs_reaproveitados = {
+            grupo_id: {'caminho': execucao.caminho(arquivo), 'nome': nome}
+            for grupo_id, nome, arquivo in grupos
+        }
+        return df_entrada, opcoes, pdfs_reaproveitados, linha[1] if linha else None
+
+    def ultima_concluida(self, **opcoes):
+        """Execução concluída mais recente com as ``opcoes`` informadas, ou None
+
+        Usada como base do reprocessamento incremental; execuções sem
+        assinaturas (anteriores a ele) são ignoradas. Opções ausentes de uma
+        execução (gravada antes de a opção existir) contam como False.
+        """
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                "SELECT id, opcoes FROM execucoes WHERE status = ? ORDER BY criada_em DESC", (CONCLUIDA,)
+            ).fetchall()
+        for id_execucao, opcoes_execucao in linhas:
+            opcoes_execucao = json.loads(opcoes_execucao) if opcoes_execucao else {}
+            if all(opcoes_execucao.get(nome, False) == valor for nome, valor in opcoes.items()):
+                execucao = self.abrir(id_execucao)
+                if execucao is not None and os.path.exists(execucao.caminho(ARQUIVO_ASSINATURAS)):
+                    return execucao
+        return None
+
+    def carregar_assinaturas(self, execucao):
+        """Assinaturas dos grupos da execução (Series grupo_id -> assinatura), ou None"""
+        caminho = execucao.caminho(ARQUIVO_ASSINATURAS)
+        if not os.path.exists(caminho):
+            return None
+        tabela = pd.read_parquet(caminho)
+        return pd.Series(tabela['Assinatura'].to_numpy(), index=tabela['Grupo_ID'].to_numpy())
+
+    def marcar(self, id_execucao, status, erro=None):
+        """Atualiza a situação da execução (``EM_ANDAMENTO``, ``CANCELADA`` ou ``COM_ERRO``)"""
+        with self._conectar() as conexao:
+            conexao.execute(
+                "UPDATE execucoes SET status = ?, erro = ?, acessada_em = ? WHERE id = ?",
+                (status, erro, time.time(), id_execucao)
+            )
+
+    def situacao(self, id_execucao):
+        """(status, erro) da execução, ou None se ela não existe"""
+        with self._conectar() as conexao:
+            return conexao.execute(
+                "SELECT status, erro FROM execucoes WHERE id = ?", (id_execucao,)
+            ).fetchone()
+
+    def salvar_resultados(self, execucao, df_resultados, pdfs_para_download, stats):
+        """Grava os resultados de ``processar_dados`` e marca a execução como concluída
+
+        Os caminhos dos PDFs devem estar no diretório da execução; o índice
+        guarda apenas o nome do arquivo. O checkpoint deixa de ser necessário
+        e é descartado.
+        """
+        _gravar_parquet(df_resultados, execucao.caminho(ARQUIVO_RESULTADOS))
+        estatisticas = dict(stats)
+        valores_invalidos = estatisticas.pop('valores_invalidos', None)
+        if valores_invalidos is not None:
+            _gravar_parquet(valores_invalidos, execucao.caminho(ARQUIVO_VALORES_INVALIDOS))
+        assinaturas = estatisticas.pop('assinaturas', None)
+        if assinaturas is not None:
+            pd.DataFrame({'Grupo_ID': assinaturas.index.astype(str), 'Assinatura': assinaturas.to_numpy()}).to_parquet(
+                execucao.caminho(ARQUIVO_ASSINATURAS), index=False
+            )
+
+        with self._conectar() as conexao:
+            conexao.executemany(
+                "INSERT INTO pdfs (execucao_id, ordem, grupo_id, nome, arquivo) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (execucao.id, ordem, str(grupo_id), info['nome'], os.path.basename(info['caminho']))
+                    for ordem, (grupo_id, info) in enumerate(pdfs_para_download.items())
+                )
+            )
+            conexao.execute(
+                "UPDATE execucoes SET status = ?, clientes = ?, estatisticas = ?, acessada_em = ?, erro = NULL "
+                "WHERE id = ?",
+                (CONCLUIDA, len(df_resultados), json.dumps(estatisticas, default=_valor_json), time.time(),
+                 execucao.id)
+            )
+            conexao.execute("DELETE FROM grupos_concluidos WHERE execucao_id = ?", (execucao.id,))
+        if os.path.exists(execucao.caminho(ARQUIVO_ENTRADA)):
+            os.remove(execucao.caminho(ARQUIVO_ENTRADA))
+
+    def abrir(self, id_execucao, apenas_concluida=True):
+        """Execução com este id, ou None se não existe, já expirou ou (com
+        ``apenas_concluida``) ainda não foi concluída
+
+        Atualiza a data de acesso, que conta a validade da execução.
+        """
+        diretorio = self._diretorio_execucao(id_execucao)
+        with self._conectar() as conexao:
+            cursor = conexao.execute(
+                "UPDATE execucoes SET acessada_em = ? WHERE id = ? AND (status = ? OR NOT ?)",
+                (time.time(), id_execucao, CONCLUIDA, apenas_concluida)
+            )
+            if cursor.rowcount == 0 or not os.path.isdir(diretorio):
+                return None
+        return Execucao(id_execucao=id_execucao, diretorio=diretorio)
+
+    def carregar_resultados(self, execucao):
+        """Tabela de resultados da execução, lida do Parquet com mapeamento em memória"""
+        return pd.read_parquet(execucao.caminho(ARQUIVO_RESULTADOS), memory_map=True)
+
+    def carregar_pdfs(self, execucao):
+        """PDFs da execução no formato de ``processar_dados``: {grupo_id: {'caminho', 'nome'}}"""
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                "SELECT grupo_id, nome, arquivo FROM pdfs WHERE execucao_id = ? ORDER BY ordem",
+                (execucao.id,)
+            ).fetchall()
+        return {
+            grupo_id: {'caminho': execucao.caminho(arquivo), 'nome': nome}
+            for grupo_id, nome, arquivo in linhas
+        }
+
+    def carregar_stats(self, execucao):
+        """Estatísticas da execução, com ``valores_invalidos`` quando houver"""
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT estatisticas FROM execucoes WHERE id = ?", (execucao.id,)
+            ).fetchone()
+        stats = json.loads(linha[0]) if linha and linha[0] else {}
+        caminho_invalidos = execucao.caminho(ARQUIVO_VALORES_INVALIDOS)
+        if os.path.exists(caminho_invalidos):
+            stats['valores_invalidos'] = pd.read_parquet(caminho_invalidos)
+        return stats
+
+    def remover(self, id_execucao):
+        """Remove a execução do índice e apaga o seu diretório"""
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM pdfs WHERE execucao_id = ?", (id_execucao,))
+            conexao.execute("DELETE FROM grupos_concluidos WHERE execucao_id = ?", (id_execucao,))
+            conexao.execute("DELETE FROM execucoes WHERE id = ?", (id_execucao,))
+        shutil.rmtree(self._diretorio_execucao(id_execucao), ignore_errors=True)
+
+    def coletar_expiradas(self, agora=None):
+        """Remove as execuções não acessadas dentro da validade e retorna quantas foram removidas
+
+        Diretórios sem registro no índice (de uma execução interrompida antes
+        de ser registrada) também são removidos depois da validade.
+        """
+        agora = time.time() if agora is None else agora
+        limite = agora - self.validade_segundos
+        with self._lock:
+            with self._conectar() as conexao:
+                expiradas = [linha[0] for linha in conexao.execute(
+                    "SELECT id FROM execucoes WHERE acessada_em < ?", (limite,)
+                )]
+                registradas = {linha[0] for linha in conexao.execute("SELECT id FROM execucoes")}
+            for id_execucao in expiradas:
+                self.remover(id_execucao)
+
+            with os.scandir(self.diretorio) as entradas:
+                for entrada in entradas:
+                    if (entrada.is_dir() and entrada.name not in registradas
+                            and entrada.stat().st_mtime < limite):
+                        shutil.rmtree(entrada.path, ignore_errors=True)
+        return len(expiradas)
@@ -0,0 +1,130 @@
+"""Linha de comando para processar a planilha sem a interface Streamlit
+
+Uso: ``python -m cobranca planilha.xlsx -o saida/``. Gera a planilha Excel,
+as exportações pedidas em ``--formatos`` (CSV por padrão) e o ZIP com os PDFs
+unificados no diretório de saída, permitindo a consolidação em lote por cron
+ou por um worker. As métricas da execução (``metricas.json`` e
+``metricas.prom``) também são gravadas no diretório de saída.
+"""
+import argparse
+import os
+import sys
+import time
+
+from cobranca.downloads import CachePDF
+from cobranca.execucao import Execucao
+from cobranca.exportacao import FORMATOS_EXPORTACAO, exportar
+from cobranca.leitura import ler_planilha
+from cobranca.metricas import Metricas
+from cobranca.pipeline import criar_arquivo_zip, criar_planilha_excel, processar_dados
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m cobranca',
+        description='Unifica as contas a receber por cliente/holding e gera os arquivos de saída.'
+    )
+    parser.add_argument('planilha', help='arquivo Excel de contas a receber')
+    parser.add_argument('-o', '--saida', default='.', help='diretório dos arquivos gerados (padrão: atual)')
+    parser.add_argument('--sem-pdfs', action='store_true', help='não baixa nem unifica os PDFs')
+    parser.add_argument('--sem-holdings', action='store_true', help='agrupa por cliente, sem identificar holdings')
+    parser.add_argument('--downloads', type=int, default=8, help='PDFs baixados em paralelo (padrão: 8)')
+    parser.add_argument('--downloads-por-host', type=int, default=None,
+                        help='conexões simultâneas por servidor de PDFs (padrão: o valor de --downloads)')
+    parser.add_argument('--tentativas', type=int, default=4,
+                        help='tentativas por PDF em falhas transitórias (padrão: 4)')
+    parser.add_argument('--processos', type=int, default=1,
+                        help='processos para unificação (padrão: 1; mais processos só compensam com muitos '
+                             'grupos grandes, veja benchmarks/bench_processos.py)')
+    parser.add_argument('--memoria-max-mb', type=int, default=None,
+                        help='unifica com memória limitada, com este orçamento por documento')
+    parser.add_argument('--sem-cache', action='store_true', help='não usa o cache persistente de PDFs')
+    parser.add_argument('--cache-mb', type=int, default=1024, help='tamanho máximo do cache (padrão: 1024)')
+    parser.add_argument('--validade-cache-min', type=int, default=15,
+                        help='validade do cache sem revalidar, em minutos (padrão: 15)')
+    parser.add_argument('--formatos', default='csv',
+                        help=f"formatos exportados além do Excel, separados por vírgula "
+                             f"({', '.join(FORMATOS_EXPORTACAO)}; padrão: csv)")
+    parser.add_argument('--otimizar-pdfs', action='store_true',
+                        help='ignora PDFs repetidos no grupo, compartilha fontes e imagens idênticas e '
+                             'comprime o conteúdo dos PDFs unificados')
+    parser.add_argument('--compactar-zip', action='store_true',
+                        help='comprime os PDFs no ZIP (por padrão são apenas armazenados)')
+    parser.add_argument('-q', '--silencioso', action='store_true', help='não exibe o progresso')
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    formatos = [nome.strip() for nome in args.formatos.split(',') if nome.strip()]
+    desconhecidos = [nome for nome in formatos if nome not in FORMATOS_EXPORTACAO]
+    if desconhecidos:
+        parser.error(f"formato desconhecido: {', '.join(desconhecidos)}")
+    os.makedirs(args.saida, exist_ok=True)
+    
+    def exibir_progresso(percentual, mensagem):
+        if not args.silencioso:
+            print(f"[{percentual:3d}%] {mensagem}", file=sys.stderr)
+    
+    def exibir_aviso(mensagem):
+        print(f"⚠️ {mensagem}", file=sys.stderr)
+    
+    cache_pdfs = None
+    if not args.sem_pdfs and not args.sem_cache:
+        cache_pdfs = CachePDF(
+            tamanho_max_bytes=args.cache_mb * 1024 * 1024,
+            validade_segundos=args.validade_cache_min * 60
+        )
+    
+    metricas = Metricas()
+    inicio = time.perf_counter()
+    df_original = ler_planilha(args.planilha)
+    metricas.registrar_etapa('leitura', time.perf_counter() - inicio)
+    execucao = Execucao()
+    try:
+        resultados, pdfs, stats = processar_dados(
+            df_original,
+            baixar_pdfs_option=not args.sem_pdfs,
+            agrupar_holdings_option=not args.sem_holdings,
+            max_workers_download=args.downloads,
+            max_downloads_por_host=args.downloads_por_host,
+            tentativas_download=args.tentativas,
+            cache_pdfs=cache_pdfs,
+            memoria_max_mb=args.memoria_max_mb,
+            processos_unificacao=args.processos,
+            otimizar_pdfs=args.otimizar_pdfs,
+            callback_progresso=exibir_progresso,
+            callback_aviso=exibir_aviso,
+            diretorio_pdfs=execucao.diretorio,
+            metricas=metricas
+        )
+        
+        metricas.iniciar_etapa('exportacao')
+        arquivos = [os.path.join(args.saida, 'Clientes_Unificados.xlsx')]
+        criar_planilha_excel(resultados, arquivos[0])
+        for nome in formatos:
+            arquivos.append(os.path.join(args.saida, FORMATOS_EXPORTACAO[nome].nome_arquivo()))
+            with open(arquivos[-1], 'wb') as arquivo:
+                exportar(resultados, nome, arquivo)
+        if pdfs:
+            arquivos.append(os.path.join(args.saida, 'PDFs_Unificados.zip'))
+            criar_arquivo_zip(pdfs, arquivos[-1], compactar=args.compactar_zip)
+        metricas.encerrar_etapa()
+        arquivos += metricas.gravar(args.saida)
+    finally:
+        execucao.remover()
+    
+    if 'valores_invalidos' in stats:
+        exibir_aviso(f"{len(stats['valores_invalidos'])} valores não puderam ser convertidos e "
+                     "ficaram fora do Valor Total.")
+    print(f"Clientes: {stats['total_clientes']} • Valor total: R$ {stats['valor_total']:,.2f} • "
+          f"Com PDF: {stats['clientes_com_pdf']}")
+    if metricas.pdfs['bytes_entrada']:
+        print(f"PDFs: entrada {metricas.pdfs['bytes_entrada'] / 1024 ** 2:,.1f} MB • "
+              f"unificados {metricas.pdfs['bytes_saida'] / 1024 ** 2:,.1f} MB • "
+              f"{metricas.pdfs['duplicados']} repetidos ignorados • "
+              f"{metricas.pdfs['segundos_otimizacao']:.2f}s otimizando")
+    for arquivo in arquivos:
+        print(arquivo)
+    return 0
@@ -0,0 +1,153 @@
+"""Consulta indexada da tabela de resultados, para a aba de visualização
+
+A tabela é ordenada e indexada uma única vez por execução: para cada filtro
+de PDF ('Todos', 'Com PDF', 'Sem PDF') ficam as posições em ordem de valor e
+as somas acumuladas. Um filtro (PDF, ordem e valor mínimo) vira então um
+recorte dessas posições por busca binária, sem copiar a tabela, e o resumo
+(clientes, total, média e com PDF) sai das somas acumuladas. A busca de
+clientes usa a razão social (sem acentos e maiúsculas) e o CNPJ (só dígitos)
+ordenados, também por busca binária; esses índices só são montados na
+primeira busca.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+FILTROS_PDF = {
+    'Todos': None,
+    'Com PDF': 'Sim',
+    'Sem PDF': 'Não'
+}
+
+# Clientes retornados por uma busca
+LIMITE_BUSCA = 50
+
+# Pontuação ignorada quando a busca é por CNPJ/CPF
+_PONTUACAO_CNPJ = str.maketrans('', '', ' ./-')
+
+
+def normalizar_nomes(nomes):
+    """Nomes em minúsculas e sem acentos, para busca"""
+    return (
+        nomes.astype(str)
+        .str.normalize('NFKD')
+        .str.encode('ascii', 'ignore')
+        .str.decode('ascii')
+        .str.lower()
+        .str.strip()
+    )
+
+
+def _ordenar(textos):
+    textos = textos.to_numpy(dtype=str)
+    ordem = np.argsort(textos, kind='stable')
+    return textos[ordem], ordem
+
+
+def _prefixo(ordenados, ordem, prefixo, limite):
+    """Posições (até ``limite``) dos textos ordenados que começam com o prefixo"""
+    inicio = np.searchsorted(ordenados, prefixo, side='left')
+    fim = np.searchsorted(ordenados, prefixo + '\U0010ffff', side='left')
+    return ordem[inicio:min(fim, inicio + limite)]
+
+
+class _Ordenacao:
+    """Posições de um subconjunto em ordem crescente de valor, com somas acumuladas"""
+
+    def __init__(self, posicoes, valores, com_pdf):
+        ordem = posicoes[np.argsort(valores[posicoes], kind='stable')]
+        self.posicoes = ordem
+        self.valores = valores[ordem]
+        self.soma = np.concatenate([[0.0], np.cumsum(self.valores)])
+        self.com_pdf = np.concatenate([[0], np.cumsum(com_pdf[ordem])])
+
+    def inicio(self, valor_minimo):
+        return int(np.searchsorted(self.valores, valor_minimo, side='left'))
+
+
+class VisaoResultados:
+    """Recorte filtrado e ordenado da tabela: posições (sem cópia) e resumo"""
+
+    def __init__(self, df, posicoes, clientes, valor_total, com_pdf):
+        self.df = df
+        self.posicoes = posicoes
+        self.clientes = clientes
+        self.valor_total = valor_total
+        self.com_pdf = com_pdf
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    @property
+    def media(self):
+        return self.valor_total / self.clientes if self.clientes else float('nan')
+
+    def pagina(self, inicio, fim, colunas=None):
+        """Linhas [inicio, fim) da visão; só elas são copiadas da tabela"""
+        linhas = self.df.iloc[self.posicoes[inicio:fim]]
+        return linhas[colunas] if colunas else linhas
+
+
+class IndiceResultados:
+    """Tabela de resultados com ordenações e índices pré-calculados
+
+    É somente leitura e pode ser compartilhada entre sessões.
+    """
+
+    def __init__(self, df_resultados):
+        self.df = df_resultados
+        valores = df_resultados['Valor_Total'].to_numpy(dtype=float)
+        pdf = df_resultados['PDF_Disponivel'].to_numpy()
+        com_pdf = pdf == 'Sim'
+        todas = np.arange(len(df_resultados))
+        self._ordenacoes = {
+            filtro: _Ordenacao(todas if valor is None else np.flatnonzero(pdf == valor), valores, com_pdf)
+            for filtro, valor in FILTROS_PDF.items()
+        }
+
+    @cached_property
+    def _indice_nomes(self):
+        """(razões sociais normalizadas em ordem, posições na tabela)"""
+        return _ordenar(normalizar_nomes(self.df['Razao_Social']))
+
+    @cached_property
+    def _indice_cnpjs(self):
+        """(dígitos dos CNPJs em ordem, posições na tabela)"""
+        return _ordenar(self.df['CNPJ'].astype(str).str.replace(r'\D', '', regex=True))
+
+    def __len__(self):
+        return len(self.df)
+
+    def visao(self, filtro_pdf='Todos', decrescente=True, valor_minimo=0):
+        """Clientes do filtro de PDF com valor >= ``valor_minimo``, ordenados por valor"""
+        ordenacao = self._ordenacoes[filtro_pdf]
+        inicio = ordenacao.inicio(valor_minimo)
+        posicoes = ordenacao.posicoes[inicio:]
+        return VisaoResultados(
+            self.df,
+            posicoes[::-1] if decrescente else posicoes,
+            len(posicoes),
+            float(ordenacao.soma[-1] - ordenacao.soma[inicio]),
+            int(ordenacao.com_pdf[-1] - ordenacao.com_pdf[inicio])
+        )
+
+    def buscar(self, texto, limite=LIMITE_BUSCA):
+        """Posições dos clientes cuja razão social ou CNPJ começa com o texto buscado
+
+        A razão social é comparada sem acentos e maiúsculas e o CNPJ apenas
+        pelos dígitos.
+        """
+        encontrados = []
+        digitos = texto.translate(_PONTUACAO_CNPJ)
+        if digitos.isdigit():
+            encontrados.append(_prefixo(*self._indice_cnpjs, digitos, limite))
+        nome = normalizar_nomes(pd.Series([texto])).iloc[0]
+        if nome:
+            encontrados.append(_prefixo(*self._indice_nomes, nome, limite))
+        if not encontrados:
+            return np.zeros(0, dtype=np.int64)
+        return pd.unique(np.concatenate(encontrados))[:limite]
+
+    def linha(self, posicao):
+        return self.df.iloc[int(posicao)]
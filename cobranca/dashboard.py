@@ -0,0 +1,157 @@
+"""Agregados e figuras do dashboard, calculados uma vez por execução
+
+Os gráficos do dashboard são montados a partir destes agregados, e não da
+tabela de resultados inteira: o tamanho dos gráficos enviados ao navegador
+depende do número de faixas, dias e pontos amostrados, e não do número de
+clientes. A dispersão por vencimento usa um único trace (SVG até
+``LIMITE_SVG`` pontos, WebGL acima disso) e é amostrada acima de
+``LIMITE_PONTOS``, mantendo sempre os maiores valores.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Pontos desenhados em SVG; acima disso a dispersão usa WebGL (scattergl)
+LIMITE_SVG = 1_000
+
+# Pontos enviados ao navegador na dispersão; acima disso ela é amostrada
+LIMITE_PONTOS = 20_000
+
+TOP_N = 10
+FAIXAS_HISTOGRAMA = 20
+
+
+def amostrar_pontos(pontos, limite=LIMITE_PONTOS, semente=0):
+    """Até ``limite`` pontos: os 10% de maior valor e uma amostra aleatória do restante"""
+    if len(pontos) <= limite:
+        return pontos
+    maiores = pontos.nlargest(limite // 10, 'Valor_Total')
+    restante = pontos.drop(maiores.index)
+    amostra = restante.sample(limite - len(maiores), random_state=semente)
+    return pd.concat([maiores, amostra]).sort_values('Data_Vencimento')
+
+
+def agregados_dashboard(df_resultados, top_n=TOP_N, faixas=FAIXAS_HISTOGRAMA, limite_pontos=LIMITE_PONTOS):
+    """Agregados usados pelos gráficos e estatísticas do dashboard
+
+    Retorna um dicionário com 'top' (maiores clientes), 'pdfs' (contagem por
+    ``PDF_Disponivel``), 'histograma' (contagens e limites das faixas de
+    valor), 'por_dia' (valor e clientes por data de vencimento), 'pontos'
+    (dispersão, possivelmente amostrada), 'total_pontos' e 'resumo'
+    (máximo, mínimo, mediana, desvio e quartis).
+    """
+    valores = df_resultados['Valor_Total']
+    contagens, limites = np.histogram(valores.to_numpy(dtype=float), bins=faixas) if len(valores) else ([], [])
+
+    # Grupos com vencimentos diferentes ('datas variadas') ficam fora das datas
+    datas = pd.to_datetime(df_resultados['Data_Vencimento'], format='%d/%m/%Y', errors='coerce')
+    com_data = datas.notna()
+    pontos = pd.DataFrame({
+        'Data_Vencimento': datas[com_data],
+        'Valor_Total': valores[com_data],
+        'Razao_Social': df_resultados['Razao_Social'][com_data]
+    })
+    por_dia = pontos.groupby('Data_Vencimento')['Valor_Total'].agg(Valor_Total='sum', Clientes='size').reset_index()
+
+    return {
+        'top': df_resultados.nlargest(top_n, 'Valor_Total')[['Razao_Social', 'Valor_Total']],
+        'pdfs': df_resultados['PDF_Disponivel'].value_counts(),
+        'histograma': (np.asarray(contagens), np.asarray(limites)),
+        'por_dia': por_dia,
+        'pontos': amostrar_pontos(pontos.sort_values('Data_Vencimento'), limite_pontos),
+        'total_pontos': len(pontos),
+        'resumo': {
+            'maximo': valores.max(),
+            'minimo': valores.min(),
+            'mediana': valores.median(),
+            'desvio': valores.std(),
+            'q1': valores.quantile(0.25),
+            'q3': valores.quantile(0.75)
+        }
+    }
+
+
+def figura_dispersao(pontos):
+    """Dispersão valor x vencimento em um único trace, com o valor na cor (e no tamanho, em SVG)"""
+    marcador = {'color': pontos['Valor_Total'], 'colorscale': 'Blues', 'showscale': True}
+    if len(pontos) <= LIMITE_SVG:
+        tipo_trace = go.Scatter
+        # O tamanho não pode ser negativo (créditos e estornos) nem vazio
+        tamanhos = pontos['Valor_Total'].abs().fillna(0)
+        maior = tamanhos.max()
+        if maior > 0:
+            marcador.update(size=tamanhos, sizemode='area', sizemin=4, sizeref=2 * maior / 40 ** 2)
+        else:
+            marcador.update(size=8)
+    else:
+        tipo_trace = go.Scattergl
+        marcador.update(size=5, opacity=0.6)
+    figura = go.Figure(tipo_trace(
+        x=pontos['Data_Vencimento'],
+        y=pontos['Valor_Total'],
+        mode='markers',
+        marker=marcador,
+        text=pontos['Razao_Social'],
+        hovertemplate='%{text}<br>%{x|%d/%m/%Y}<br>R$ %{y:,.2f}<extra></extra>'
+    ))
+    figura.update_layout(
+        title='📅 Distribuição por Data de Vencimento',
+        xaxis_title='Data de Vencimento',
+        yaxis_title='Valor (R$)'
+    )
+    return figura
+
+
+def figuras_dashboard(agregados):
+    """Figuras do dashboard montadas a partir de ``agregados_dashboard``
+
+    Retorna 'top', 'pdfs' e 'valores' e, havendo datas específicas de
+    vencimento, 'por_dia' e 'dispersao'.
+    """
+    figuras = {}
+    figuras['top'] = px.bar(
+        agregados['top'],
+        x='Razao_Social',
+        y='Valor_Total',
+        title='🔝 Top 10 Clientes por Valor',
+        labels={'Razao_Social': 'Cliente', 'Valor_Total': 'Valor (R$)'},
+        color='Valor_Total',
+        color_continuous_scale='Blues'
+    )
+    figuras['top'].update_layout(xaxis_tickangle=-45)
+    
+    figuras['pdfs'] = px.pie(
+        names=agregados['pdfs'].index,
+        values=agregados['pdfs'].to_numpy(),
+        title='📄 Distribuição de PDFs Disponíveis',
+        color=agregados['pdfs'].index,
+        color_discrete_map={'Sim': '#10B981', 'Não': '#EF4444'}
+    )
+    
+    # Histograma já agregado: o navegador recebe as faixas, não os valores
+    contagens, limites = agregados['histograma']
+    figuras['valores'] = go.Figure(go.Bar(
+        x=(limites[:-1] + limites[1:]) / 2,
+        y=contagens,
+        width=limites[1:] - limites[:-1],
+        hovertemplate='R$ %{x:,.2f}<br>%{y} clientes<extra></extra>'
+    ))
+    figuras['valores'].update_layout(
+        title='📊 Distribuição de Valores',
+        xaxis_title='Valor (R$)',
+        yaxis_title='Clientes',
+        bargap=0.1
+    )
+    
+    if not agregados['pontos'].empty:
+        figuras['por_dia'] = px.bar(
+            agregados['por_dia'],
+            x='Data_Vencimento',
+            y='Valor_Total',
+            hover_data=['Clientes'],
+            title='📆 Valor por Data de Vencimento',
+            labels={'Data_Vencimento': 'Data de Vencimento', 'Valor_Total': 'Valor (R$)'}
+        )
+        figuras['dispersao'] = figura_dispersao(agregados['pontos'])
+    return figuras
@@ -0,0 +1,653 @@
+"""Download de PDFs: sessão HTTP, cache persistente e downloads concorrentes
+
+Nada aqui depende do Streamlit; avisos e progresso são repassados por
+callbacks para que a interface (ou a linha de comando) decida como exibi-los.
+Os downloads concorrentes passam pelo ``AgendadorDownloads``, que limita as
+conexões por servidor, repete falhas transitórias e deixa de consultar um
+servidor que continua falhando; as falhas são reunidas em um único relatório.
+"""
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from functools import partial
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def link_valido(url):
+    """Indica se o valor da célula é uma URL que pode ser baixada"""
+    return isinstance(url, str) and url != ''
+
+
+def criar_sessao_http(max_conexoes=8):
+    """Cria uma sessão HTTP com pool de conexões keep-alive"""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=max_conexoes, pool_maxsize=max_conexoes)
+    sessao.mount('http://', adaptador)
+    sessao.mount('https://', adaptador)
+    return sessao
+
+
+DIRETORIO_CACHE_PDF = os.path.join(os.path.expanduser('~'), '.cache', 'cobranca', 'pdfs')
+
+
+class CachePDF:
+    """Cache persistente de PDFs, indexado por URL e armazenado pelo hash do conteúdo
+
+    Cada URL aponta para um objeto ``objetos/<sha256>.pdf``; URLs com o mesmo
+    conteúdo compartilham o arquivo. Entradas dentro da validade são usadas
+    sem consultar o servidor; as demais são revalidadas com ETag/Last-Modified
+    quando o servidor informou esses cabeçalhos. O tamanho total é limitado,
+    removendo primeiro as URLs acessadas há mais tempo (LRU).
+    
+    O índice fica na ordem de acesso (a mais antiga primeiro) e o total de
+    bytes e o uso de cada objeto são mantidos a cada inclusão e remoção, de
+    modo que guardar uma entrada não percorre o índice inteiro.
+    """
+    
+    def __init__(self, diretorio=DIRETORIO_CACHE_PDF, tamanho_max_bytes=1024 ** 3, validade_segundos=15 * 60):
+        self.diretorio = diretorio
+        self.diretorio_objetos = os.path.join(diretorio, 'objetos')
+        self.caminho_indice = os.path.join(diretorio, 'indice.json')
+        self.tamanho_max_bytes = tamanho_max_bytes
+        self.validade_segundos = validade_segundos
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio_objetos, exist_ok=True)
+        self.indice = {}
+        self._uso_por_hash = Counter()
+        self._bytes_total = 0
+        for url, entrada in self._carregar_indice():
+            self._incluir(url, entrada)
+    
+    def _carregar_indice(self):
+        """Entradas do índice em disco com objeto, da acessada há mais tempo à mais recente"""
+        try:
+            with open(self.caminho_indice, encoding='utf-8') as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return sorted(
+            (
+                (url, entrada) for url, entrada in indice.items()
+                if os.path.exists(self._caminho_objeto(entrada['hash']))
+            ),
+            key=lambda item: item[1]['acesso']
+        )
+    
+    def _caminho_objeto(self, hash_conteudo):
+        return os.path.join(self.diretorio_objetos, f"{hash_conteudo}.pdf")
+    
+    def _incluir(self, url, entrada):
+        """Inclui a entrada no fim do índice (a mais recente), atualizando o total"""
+        if self._uso_por_hash[entrada['hash']] == 0:
+            self._bytes_total += entrada['tamanho']
+        self._uso_por_hash[entrada['hash']] += 1
+        self.indice[url] = entrada
+    
+    def _retirar(self, url, manter=None):
+        """Retira a entrada do índice; o objeto sem outras URLs é apagado do disco
+
+        O objeto com o hash ``manter`` fica no disco mesmo sem uso, pois vai
+        ser incluído de novo em seguida.
+        """
+        entrada = self.indice.pop(url)
+        self._uso_por_hash[entrada['hash']] -= 1
+        if self._uso_por_hash[entrada['hash']] == 0:
+            del self._uso_por_hash[entrada['hash']]
+            self._bytes_total -= entrada['tamanho']
+            if entrada['hash'] != manter:
+                try:
+                    os.remove(self._caminho_objeto(entrada['hash']))
+                except OSError:
+                    pass
+    
+    def consultar(self, url):
+        """Retorna (conteúdo, cabeçalhos) para a URL
+
+        O conteúdo vem preenchido quando a entrada ainda está válida. Caso
+        contrário, os cabeçalhos condicionais para revalidação são retornados
+        (vazios se não houver entrada ou o servidor não enviou validadores).
+        """
+        with self._lock:
+            entrada = self.indice.get(url)
+            if entrada is None:
+                return None, {}
+            entrada = dict(entrada)
+        
+        if time.time() - entrada['baixado_em'] < self.validade_segundos:
+            conteudo = self.ler(url)
+            if conteudo is not None:
+                return conteudo, {}
+        
+        cabecalhos = {}
+        if entrada.get('etag'):
+            cabecalhos['If-None-Match'] = entrada['etag']
+        if entrada.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = entrada['last_modified']
+        return None, cabecalhos
+    
+    def ler(self, url, revalidado=False):
+        """Lê o conteúdo em cache da URL, atualizando a ordem de uso"""
+        with self._lock:
+            entrada = self.indice.pop(url, None)
+            if entrada is None:
+                return None
+            # Reinserida no fim: o índice segue a ordem de acesso
+            self.indice[url] = entrada
+            entrada['acesso'] = time.time()
+            if revalidado:
+                entrada['baixado_em'] = entrada['acesso']
+            caminho = self._caminho_objeto(entrada['hash'])
+        try:
+            with open(caminho, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def guardar(self, url, conteudo, etag=None, last_modified=None):
+        """Armazena o conteúdo da URL e aplica o limite de tamanho"""
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+        caminho = self._caminho_objeto(hash_conteudo)
+        if not os.path.exists(caminho):
+            with tempfile.NamedTemporaryFile(dir=self.diretorio_objetos, delete=False) as tmp:
+                tmp.write(conteudo)
+            os.replace(tmp.name, caminho)
+        
+        agora = time.time()
+        with self._lock:
+            if url in self.indice:
+                self._retirar(url, manter=hash_conteudo)
+            self._incluir(url, {
+                'hash': hash_conteudo,
+                'tamanho': len(conteudo),
+                'etag': etag,
+                'last_modified': last_modified,
+                'baixado_em': agora,
+                'acesso': agora
+            })
+            self._remover_excedente()
+    
+    def _remover_excedente(self):
+        """Remove as entradas menos usadas (o início do índice) até caber no tamanho máximo"""
+        while self._bytes_total > self.tamanho_max_bytes and self.indice:
+            self._retirar(next(iter(self.indice)))
+    
+    def salvar(self):
+        """Grava o índice em disco de forma atômica"""
+        with self._lock:
+            self._remover_excedente()
+            dados = json.dumps(self.indice)
+        with tempfile.NamedTemporaryFile('w', dir=self.diretorio, delete=False, encoding='utf-8') as tmp:
+            tmp.write(dados)
+        os.replace(tmp.name, self.caminho_indice)
+
+
+# Respostas e erros que costumam passar sozinhos e justificam nova tentativa
+STATUS_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504}
+ERROS_TRANSITORIOS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError
+)
+
+
+class CircuitoAberto(Exception):
+    """O servidor falhou seguidamente e não está sendo consultado no momento"""
+
+
+class _EstadoServidor:
+    """Limite de conexões, timeout e circuito de um servidor (host)"""
+
+    def __init__(self, limite, timeout):
+        self.condicao = threading.Condition()
+        self.limite_max = limite
+        self.limite = float(limite)
+        self.ultima_reducao = 0.0
+        self.em_uso = 0
+        self.timeout = timeout
+        self.latencia_media = None
+        self.latencia_desvio = 0.0
+        self.falhas_seguidas = 0
+        self.aberto_ate = None
+        self.pausa = None
+        self.sonda_em_andamento = False
+
+
+class AgendadorDownloads:
+    """Requisições por servidor com limite adaptativo, novas tentativas e circuito
+
+    Cada servidor aceita até ``max_por_host`` requisições simultâneas; o limite
+    cai pela metade com as falhas transitórias (no máximo uma vez a cada
+    ``intervalo_reducao`` segundos) e volta a subir aos poucos com os sucessos,
+    de modo que um portal sobrecarregado recebe menos carga em vez de mais.
+    Falhas transitórias (``STATUS_TRANSITORIOS`` e erros de conexão/timeout)
+    são repetidas até ``tentativas`` vezes, com espera exponencial aleatória
+    ("full jitter") ou a indicada em ``Retry-After``. O timeout acompanha a
+    latência observada (média + 4 desvios, como o RTO do TCP), entre
+    ``timeout_min`` e ``timeout_max``, e dobra a cada timeout.
+    
+    Após ``limiar_circuito`` falhas seguidas o circuito do servidor abre: por
+    ``pausa_circuito`` segundos as URLs dele falham na hora com
+    ``CircuitoAberto``, sem custar um timeout cada. Depois da pausa uma única
+    requisição de teste é liberada; se falhar, a pausa dobra.
+    """
+
+    def __init__(self, max_por_host=8, tentativas=4, espera_base=0.5, espera_max=30,
+                 timeout_inicial=10, timeout_min=2, timeout_max=60, limiar_circuito=5, pausa_circuito=30,
+                 intervalo_reducao=1.0, cancelamento=None):
+        self.max_por_host = max_por_host
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.timeout_inicial = timeout_inicial
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.limiar_circuito = limiar_circuito
+        self.pausa_circuito = pausa_circuito
+        self.intervalo_reducao = intervalo_reducao
+        self.cancelamento = cancelamento or threading.Event()
+        self.novas_tentativas = 0
+        self._servidores = {}
+        self._lock = threading.Lock()
+    
+    def _estado(self, host):
+        with self._lock:
+            estado = self._servidores.get(host)
+            if estado is None:
+                estado = self._servidores[host] = _EstadoServidor(self.max_por_host, self.timeout_inicial)
+            return estado
+    
+    def _reservar(self, host, estado):
+        """Ocupa uma vaga do servidor e retorna (timeout, sonda), ou levanta ``CircuitoAberto``
+
+        ``sonda`` indica a requisição de teste liberada ao fim da pausa do circuito.
+        """
+        with estado.condicao:
+            while True:
+                sonda = estado.aberto_ate is not None
+                if sonda:
+                    if time.monotonic() < estado.aberto_ate:
+                        raise CircuitoAberto(host)
+                    if estado.sonda_em_andamento:
+                        estado.condicao.wait()
+                        continue
+                if estado.em_uso < max(int(estado.limite), 1):
+                    estado.em_uso += 1
+                    estado.sonda_em_andamento = sonda
+                    return estado.timeout, sonda
+                estado.condicao.wait()
+    
+    def _liberar(self, estado, sonda, latencia=None, transitoria=False, timeout_esgotado=None, neutra=False):
+        """Devolve a vaga e ajusta limite, timeout e circuito pelo resultado
+
+        ``timeout_esgotado`` é o timeout usado por uma requisição que o esgotou.
+        Uma requisição ``neutra`` (erro que não veio do servidor) não altera nada.
+        """
+        with estado.condicao:
+            estado.em_uso -= 1
+            if sonda:
+                estado.sonda_em_andamento = False
+            if transitoria:
+                # Falhas em rajada contam como uma só redução, como o TCP faz por RTT
+                agora = time.monotonic()
+                if agora - estado.ultima_reducao >= self.intervalo_reducao:
+                    estado.limite = max(estado.limite / 2, 1.0)
+                    estado.ultima_reducao = agora
+                if timeout_esgotado is not None:
+                    estado.timeout = min(max(estado.timeout, timeout_esgotado * 2), self.timeout_max)
+                estado.falhas_seguidas += 1
+                # Uma sonda que falha dobra a pausa; requisições que já estavam
+                # em andamento quando o circuito abriu não mudam a pausa
+                if sonda:
+                    estado.pausa = min(estado.pausa * 2, 3600)
+                    estado.aberto_ate = time.monotonic() + estado.pausa
+                elif estado.aberto_ate is None and estado.falhas_seguidas >= self.limiar_circuito:
+                    estado.pausa = self.pausa_circuito
+                    estado.aberto_ate = time.monotonic() + estado.pausa
+            elif not neutra:
+                estado.limite = min(estado.limite + 1 / estado.limite, estado.limite_max)
+                estado.falhas_seguidas = 0
+                estado.aberto_ate = None
+                if latencia is not None:
+                    self._observar_latencia(estado, latencia)
+            estado.condicao.notify_all()
+    
+    def _observar_latencia(self, estado, latencia):
+        if estado.latencia_media is None:
+            estado.latencia_media, estado.latencia_desvio = latencia, latencia / 2
+        else:
+            estado.latencia_desvio = 0.75 * estado.latencia_desvio + 0.25 * abs(estado.latencia_media - latencia)
+            estado.latencia_media = 0.875 * estado.latencia_media + 0.125 * latencia
+        estado.timeout = min(max(estado.latencia_media + 4 * estado.latencia_desvio, self.timeout_min),
+                             self.timeout_max)
+    
+    def _espera(self, tentativa, resposta=None):
+        """Segundos até a próxima tentativa: ``Retry-After`` ou backoff exponencial com jitter"""
+        if resposta is not None:
+            try:
+                return min(float(resposta.headers.get('Retry-After')), self.espera_max)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.espera_base * 2 ** tentativa, self.espera_max))
+    
+    def obter(self, url, sessao=None, cabecalhos=None):
+        """GET da URL com as regras do servidor; retorna a resposta ou levanta o último erro"""
+        host = urlsplit(url).netloc
+        estado = self._estado(host)
+        for tentativa in range(self.tentativas):
+            timeout, sonda = self._reservar(host, estado)
+            try:
+                resposta = (sessao or requests).get(url, timeout=timeout, headers=cabecalhos)
+            except ERROS_TRANSITORIOS as e:
+                esgotado = timeout if isinstance(e, requests.exceptions.Timeout) else None
+                self._liberar(estado, sonda, transitoria=True, timeout_esgotado=esgotado)
+                erro, resposta = e, None
+            except Exception:
+                self._liberar(estado, sonda, neutra=True)
+                raise
+            else:
+                transitoria = resposta.status_code in STATUS_TRANSITORIOS
+                self._liberar(estado, sonda, resposta.elapsed.total_seconds(), transitoria)
+                if not transitoria:
+                    return resposta
+            if tentativa + 1 == self.tentativas or self.cancelamento.wait(self._espera(tentativa, resposta)):
+                break
+            with self._lock:
+                self.novas_tentativas += 1
+        if resposta is None:
+            raise erro
+        return resposta
+    
+    def situacao(self):
+        """Timeout, limite de conexões e circuito de cada servidor consultado"""
+        with self._lock:
+            servidores = dict(self._servidores)
+        return {
+            host: {
+                'timeout': estado.timeout,
+                'limite': estado.limite,
+                'circuito_aberto': estado.aberto_ate is not None
+            }
+            for host, estado in servidores.items()
+        }
+
+
+class RelatorioFalhas:
+    """Downloads que falharam, agrupados por servidor e motivo
+
+    Substitui um aviso por link: cada (servidor, motivo) vira uma linha, com
+    a quantidade de URLs e alguns exemplos.
+    """
+    
+    EXEMPLOS = 3
+    
+    def __init__(self):
+        self.grupos = {}
+    
+    @property
+    def total(self):
+        return sum(grupo['quantidade'] for grupo in self.grupos.values())
+    
+    def registrar(self, url, motivo):
+        host = urlsplit(url).netloc or url
+        grupo = self.grupos.setdefault((host, motivo), {'quantidade': 0, 'exemplos': []})
+        grupo['quantidade'] += 1
+        if len(grupo['exemplos']) < self.EXEMPLOS:
+            grupo['exemplos'].append(url)
+    
+    def resumo(self):
+        """Lista de {'host', 'motivo', 'quantidade', 'exemplos'}, da mais frequente para a menos"""
+        return sorted(
+            ({'host': host, 'motivo': motivo, **grupo} for (host, motivo), grupo in self.grupos.items()),
+            key=lambda item: -item['quantidade']
+        )
+    
+    def mensagens(self):
+        return [
+            f"{item['quantidade']} PDF(s) de {item['host']} não baixado(s): {item['motivo']} "
+            f"(ex.: {item['exemplos'][0]})"
+            for item in self.resumo()
+        ]
+
+
+def _motivo_falha(erro):
+    if isinstance(erro, CircuitoAberto):
+        return 'servidor suspenso após falhas seguidas'
+    if isinstance(erro, requests.exceptions.Timeout):
+        return 'tempo esgotado'
+    if isinstance(erro, requests.exceptions.ConnectionError):
+        return 'falha de conexão'
+    return f'{type(erro).__name__}: {erro}'
+
+
+def _baixar_pdf(url, sessao=None, cache=None, metricas=None, agendador=None):
+    """Baixa um PDF e retorna (conteúdo, erro, origem) sem chamar a interface
+
+    O conteúdo é retornado como ``bytes``. A origem é 'cache' (usado sem
+    consultar o servidor), 'revalidado' (servidor respondeu 304) ou 'rede'
+    (download completo); em caso de falha, ``erro`` traz o motivo (código
+    HTTP ou tipo do erro). Com ``agendador`` a requisição segue as regras do
+    ``AgendadorDownloads``; sem ele é feita uma única tentativa. Com
+    ``metricas`` a latência, o tamanho e o status (código HTTP, 'cache' ou o
+    tipo do erro) do download são registrados.
+    """
+    if not link_valido(url):
+        return None, None, None
+    inicio = time.perf_counter()
+    
+    def registrar(status, conteudo=None):
+        if metricas is not None:
+            metricas.registrar_download(url, status, time.perf_counter() - inicio, len(conteudo or b''))
+    
+    def requisitar(cabecalhos=None):
+        if agendador is not None:
+            return agendador.obter(url, sessao, cabecalhos)
+        return (sessao or requests).get(url, timeout=10, headers=cabecalhos)
+    
+    cabecalhos = {}
+    if cache is not None:
+        conteudo, cabecalhos = cache.consultar(url)
+        if conteudo is not None:
+            registrar('cache', conteudo)
+            return conteudo, None, 'cache'
+    try:
+        response = requisitar(cabecalhos)
+        if response.status_code == 304 and cache is not None:
+            conteudo = cache.ler(url, revalidado=True)
+            if conteudo is not None:
+                registrar(304, conteudo)
+                return conteudo, None, 'revalidado'
+            response = requisitar()
+        if response.status_code == 200:
+            if cache is not None:
+                cache.guardar(
+                    url,
+                    response.content,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+            registrar(200, response.content)
+            return response.content, None, 'rede'
+        registrar(response.status_code)
+        return None, f"HTTP {response.status_code}", None
+    except Exception as e:
+        registrar(type(e).__name__)
+        return None, _motivo_falha(e), None
+
+
+def baixar_pdf(url, sessao=None, cache=None, callback_aviso=None):
+    """Baixa um PDF a partir de uma URL, retornando ``BytesIO`` ou None"""
+    conteudo, erro, _ = _baixar_pdf(url, sessao, cache)
+    if erro and callback_aviso:
+        callback_aviso(f"Erro ao baixar PDF {url}: {erro}")
+    return BytesIO(conteudo) if conteudo is not None else None
+
+
+def _gravar_no_spool(conteudo, diretorio):
+    """Grava o PDF no diretório de spool e retorna o caminho
+
+    O arquivo recebe o hash do conteúdo como nome, de modo que apenas os
+    downloads em andamento ficam em memória.
+    """
+    caminho = os.path.join(diretorio, f"{hashlib.sha256(conteudo).hexdigest()}.pdf")
+    if not os.path.exists(caminho):
+        with tempfile.NamedTemporaryFile(dir=diretorio, delete=False) as tmp:
+            tmp.write(conteudo)
+        os.replace(tmp.name, caminho)
+    return caminho
+
+
+class DownloadsEmAndamento:
+    """Garante um único download em andamento por URL (single-flight)
+
+    Chamadas simultâneas para a mesma URL aguardam o download já iniciado
+    e recebem o mesmo resultado, em vez de abrir uma nova requisição. Pode ser
+    compartilhado entre execuções: só os bytes baixados são compartilhados,
+    e cada execução grava o próprio spool, registra as próprias métricas e
+    repete com o próprio agendador o download que falhou na outra.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+    
+    def executar(self, url, funcao, *args, cancelamento=None):
+        """Executa ``funcao(url, *args)`` uma única vez por URL em andamento
+
+        Retorna (resultado, compartilhado), onde ``compartilhado`` indica
+        que o resultado veio de um download iniciado por outra chamada.
+        Quem aguarda outra chamada deixa de aguardar quando o próprio evento
+        ``cancelamento`` é acionado, retornando (None, True); o mesmo vale se
+        a outra chamada levantar uma exceção.
+        """
+        with self._lock:
+            futuro = self._em_andamento.get(url)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._em_andamento[url] = futuro
+        
+        if not lider:
+            while True:
+                try:
+                    return futuro.result(timeout=0.1), True
+                except FuturesTimeoutError:
+                    if cancelamento is not None and cancelamento.is_set():
+                        return None, True
+                except Exception:
+                    return None, True
+        
+        try:
+            resultado = funcao(url, *args)
+            futuro.set_result(resultado)
+            return resultado, False
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[url]
+
+
+def baixar_pdfs_concorrente(urls, max_workers=8, callback_progresso=None, cache=None,
+                            em_andamento=None, diretorio_spool=None, callback_aviso=None, cancelamento=None,
+                            metricas=None, agendador=None, relatorio_falhas=None):
+    """Baixa uma lista de URLs em paralelo, mantendo a ordem original
+
+    Cada URL distinta é baixada uma única vez e o conteúdo é reaproveitado
+    em todas as posições em que aparece. Retorna a lista com o conteúdo de
+    cada posição (``BytesIO``, ou o caminho do arquivo quando
+    ``diretorio_spool`` é informado, ou None) e a contagem de origens ('cache',
+    'revalidado', 'rede' e 'duplicados_evitados') e os bytes recebidos ('bytes').
+    ``callback_progresso(concluidos, total, bytes_recebidos)`` acompanha as
+    URLs distintas. Quando o evento ``cancelamento`` é acionado, os downloads
+    ainda não iniciados são descartados e a função retorna o que já foi
+    baixado. ``metricas`` (``Metricas``) recebe cada download.
+    
+    As requisições passam pelo ``agendador`` (por padrão um
+    ``AgendadorDownloads`` com ``max_workers`` conexões por servidor) e as
+    novas tentativas feitas por ele são contadas em 'novas_tentativas'. As
+    falhas vão para ``relatorio_falhas`` (``RelatorioFalhas``) e, ao final,
+    ``callback_aviso`` recebe uma linha por servidor e motivo, na thread que
+    chamou a função, pois o Streamlit não aceita chamadas de interface a
+    partir das threads do pool.
+    """
+    resultados = [None] * len(urls)
+    origens = Counter()
+    
+    posicoes_por_url = {}
+    for i, url in enumerate(urls):
+        if link_valido(url):
+            posicoes_por_url.setdefault(url, []).append(i)
+    if not posicoes_por_url:
+        return resultados, origens
+    
+    origens['duplicados_evitados'] = sum(len(p) for p in posicoes_por_url.values()) - len(posicoes_por_url)
+    em_andamento = em_andamento or DownloadsEmAndamento()
+    agendador = agendador or AgendadorDownloads(max_por_host=max_workers, cancelamento=cancelamento)
+    relatorio_falhas = relatorio_falhas if relatorio_falhas is not None else RelatorioFalhas()
+    
+    sessao = criar_sessao_http(max_workers)
+    buscar = partial(_baixar_pdf, sessao=sessao, cache=cache, metricas=metricas, agendador=agendador)
+    
+    def baixar(url):
+        """(conteúdo, erro, origem, compartilhado) da URL, com o conteúdo no spool desta execução"""
+        inicio = time.perf_counter()
+        resultado, compartilhado = em_andamento.executar(url, buscar, cancelamento=cancelamento)
+        if resultado is None:
+            if cancelamento is not None and cancelamento.is_set():
+                return None, None, None, False
+            resultado = (None, None, None)
+        conteudo, erro, origem = resultado
+        if compartilhado:
+            if conteudo is None:
+                # Falhou (ou foi cancelado) na outra execução: tenta com o agendador desta
+                conteudo, erro, origem = buscar(url)
+                compartilhado = False
+            elif metricas is not None:
+                metricas.registrar_download(url, 'compartilhado', time.perf_counter() - inicio, len(conteudo))
+        if conteudo is not None and diretorio_spool:
+            conteudo = _gravar_no_spool(conteudo, diretorio_spool)
+        return conteudo, erro, origem, compartilhado
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {executor.submit(baixar, url): url for url in posicoes_por_url}
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                conteudo, erro, origem, compartilhado = futuro.result()
+                url = futuros[futuro]
+                if conteudo is not None:
+                    origens['bytes'] += os.path.getsize(conteudo) if diretorio_spool else len(conteudo)
+                    for i in posicoes_por_url[url]:
+                        resultados[i] = conteudo if diretorio_spool else BytesIO(conteudo)
+                if compartilhado:
+                    origens['duplicados_evitados'] += 1
+                elif origem:
+                    origens[origem] += 1
+                if erro:
+                    relatorio_falhas.registrar(url, erro)
+                if callback_progresso:
+                    callback_progresso(concluidos, len(futuros), origens['bytes'])
+                if cancelamento is not None and cancelamento.is_set():
+                    for pendente in futuros:
+                        pendente.cancel()
+                    break
+    finally:
+        sessao.close()
+        if cache is not None:
+            cache.salvar()
+    origens['novas_tentativas'] = agendador.novas_tentativas
+    if callback_aviso:
+        for mensagem in relatorio_falhas.mensagens():
+            callback_aviso(mensagem)
+    return resultados, origens
@@ -0,0 +1,51 @@
+"""Diretório de cada execução do processamento"""
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+
+
+class Execucao:
+    """Identificador e diretório de uma execução do processamento
+
+    Os PDFs unificados e os arquivos gerados a partir deles (como o ZIP)
+    ficam no diretório da execução e são removidos juntos. Sem ``diretorio``
+    a execução é temporária: o diretório é criado em ``raiz`` e removido por
+    ``remover()`` ou quando o objeto é descartado. Com ``diretorio`` (execuções
+    do ``ArmazemExecucoes``) o diretório já existe e só é removido por
+    ``remover()``.
+    """
+    
+    def __init__(self, raiz=None, id_execucao=None, diretorio=None):
+        self.id = id_execucao or uuid.uuid4().hex
+        self._finalizador = None
+        if diretorio is None:
+            diretorio = tempfile.mkdtemp(prefix=f'cobranca_{self.id}_', dir=raiz)
+            self._finalizador = weakref.finalize(self, shutil.rmtree, diretorio, ignore_errors=True)
+        self.diretorio = diretorio
+    
+    def caminho(self, nome):
+        """Caminho de um arquivo dentro do diretório da execução"""
+        return os.path.join(self.diretorio, nome)
+    
+    def obter_arquivo(self, nome, gerar):
+        """Caminho de um arquivo gerado da execução, criado apenas na primeira chamada
+
+        ``gerar(arquivo)`` recebe um arquivo binário aberto. O conteúdo é gravado
+        em um temporário e renomeado ao final, para que chamadas simultâneas
+        nunca leiam um arquivo pela metade.
+        """
+        caminho = self.caminho(nome)
+        if not os.path.exists(caminho):
+            with tempfile.NamedTemporaryFile(dir=self.diretorio, suffix='.tmp', delete=False) as tmp:
+                gerar(tmp)
+            os.replace(tmp.name, caminho)
+        return caminho
+    
+    def remover(self):
+        """Remove o diretório da execução e tudo o que foi gerado nele"""
+        if self._finalizador is not None:
+            self._finalizador()
+        else:
+            shutil.rmtree(self.diretorio, ignore_errors=True)
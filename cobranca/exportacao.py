@@ -0,0 +1,159 @@
+"""Exportação da tabela de resultados em formatos de texto e colunares
+
+Cada formato é uma função ``escrever(df, arquivo)`` que grava em um arquivo
+binário aberto, registrada com ``@registrar_formato``. Os formatos de texto
+são escritos em blocos de linhas, sem montar o arquivo inteiro em memória.
+O conteúdo exportado pode ser a própria tabela de resultados ou uma tabela
+derivada dela (``CONTEUDOS_EXPORTACAO``), como as variáveis de disparo.
+Para adicionar um formato basta registrar uma nova função:
+
+    @registrar_formato('tsv', '📄 TSV', 'tsv', 'text/tab-separated-values')
+    def escrever_tsv(df, arquivo):
+        ...
+"""
+import importlib.util
+import io
+from contextlib import contextmanager
+
+import pandas as pd
+
+from cobranca.leitura import TIPO_TEXTO
+from cobranca.valores import formatar_valores_brl
+
+# Linhas convertidas por vez nos formatos de texto
+TAMANHO_BLOCO = 50_000
+
+FORMATOS_EXPORTACAO = {}
+
+
+class FormatoExportacao:
+    """Formato registrado: nome, rótulo do botão, extensão, MIME e função de escrita"""
+
+    def __init__(self, nome, rotulo, extensao, mime, escrever):
+        self.nome = nome
+        self.rotulo = rotulo
+        self.extensao = extensao
+        self.mime = mime
+        self.escrever = escrever
+
+    def nome_arquivo(self, base='clientes_unificados'):
+        return f"{base}.{self.extensao}"
+
+
+def registrar_formato(nome, rotulo, extensao, mime):
+    """Decorador que registra ``escrever(df, arquivo)`` como formato de exportação"""
+    def decorador(escrever):
+        FORMATOS_EXPORTACAO[nome] = FormatoExportacao(nome, rotulo, extensao, mime, escrever)
+        return escrever
+    return decorador
+
+
+def exportar(df_resultados, nome_formato, arquivo):
+    """Grava a tabela no formato pedido em um arquivo binário aberto"""
+    FORMATOS_EXPORTACAO[nome_formato].escrever(df_resultados, arquivo)
+
+
+def obter_exportacao(execucao, df_resultados, nome_formato, conteudo='resultados'):
+    """Caminho da exportação da execução, gerada apenas na primeira chamada
+
+    ``conteudo`` escolhe a tabela exportada em ``CONTEUDOS_EXPORTACAO``; ela só
+    é montada quando o arquivo ainda não existe.
+    """
+    formato = FORMATOS_EXPORTACAO[nome_formato]
+    montar_tabela, base = CONTEUDOS_EXPORTACAO[conteudo]
+    return execucao.obter_arquivo(
+        formato.nome_arquivo(base),
+        lambda arquivo: formato.escrever(montar_tabela(df_resultados), arquivo)
+    )
+
+
+def variaveis_disparo(df_resultados):
+    """Variáveis do template de WhatsApp de cada cliente, prontas para o disparo em lote
+
+    {{1}} é a razão social, {{2}} o valor total em reais e {{3}} o vencimento.
+    """
+    return pd.DataFrame({
+        'Telefone': df_resultados['Telefone_Contato'].astype(str).to_numpy(),
+        'Variavel_1': df_resultados['Razao_Social'].to_numpy(),
+        'Variavel_2': formatar_valores_brl(df_resultados['Valor_Total']).to_numpy(),
+        'Variavel_3': df_resultados['Data_Vencimento'].to_numpy()
+    })
+
+
+# Tabelas que podem ser exportadas: nome -> (montar_tabela, nome base do arquivo)
+CONTEUDOS_EXPORTACAO = {
+    'resultados': (lambda df_resultados: df_resultados, 'clientes_unificados'),
+    'disparo': (variaveis_disparo, 'disparo_whatsapp')
+}
+
+
+@contextmanager
+def _como_texto(arquivo):
+    """Abre o arquivo binário como texto UTF-8 sem fechá-lo ao final"""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8', newline='')
+    try:
+        yield texto
+    finally:
+        texto.flush()
+        texto.detach()
+
+
+def _blocos(df):
+    for inicio in range(0, len(df), TAMANHO_BLOCO):
+        yield df.iloc[inicio:inicio + TAMANHO_BLOCO]
+
+
+@registrar_formato('csv', '📄 CSV', 'csv', 'text/csv')
+def escrever_csv(df, arquivo):
+    with _como_texto(arquivo) as texto:
+        if df.empty:
+            df.to_csv(texto, index=False)
+        for numero, bloco in enumerate(_blocos(df)):
+            bloco.to_csv(texto, index=False, header=numero == 0)
+
+
+@registrar_formato('json', '📋 JSON', 'json', 'application/json')
+def escrever_json(df, arquivo):
+    """Lista de registros, como ``to_json(orient='records')``, montada por blocos"""
+    with _como_texto(arquivo) as texto:
+        texto.write('[')
+        for numero, bloco in enumerate(_blocos(df)):
+            if numero:
+                texto.write(',')
+            texto.write(bloco.to_json(orient='records', force_ascii=False)[1:-1])
+        texto.write(']')
+
+
+@registrar_formato('ndjson', '🧾 NDJSON', 'ndjson', 'application/x-ndjson')
+def escrever_ndjson(df, arquivo):
+    """Um registro JSON por linha, para carga em outros sistemas"""
+    with _como_texto(arquivo) as texto:
+        for bloco in _blocos(df):
+            linhas = bloco.to_json(orient='records', lines=True, force_ascii=False)
+            texto.write(linhas if linhas.endswith('\n') else linhas + '\n')
+
+
+@registrar_formato('txt', '📝 TXT', 'txt', 'text/plain')
+def escrever_txt(df, arquivo):
+    """Relatório em texto, uma ficha por cliente, montado coluna a coluna"""
+    with _como_texto(arquivo) as texto:
+        texto.write("CLIENTES UNIFICADOS\n===================\n\n")
+        for bloco in _blocos(df):
+            fichas = (
+                "\nCliente: " + bloco['Razao_Social'].astype(str)
+                + "\nCNPJ: " + bloco['CNPJ'].astype(str)
+                + "\nTelefone: " + bloco['Telefone_Contato'].astype(str)
+                + "\nValor: R$ " + bloco['Valor_Total'].map('{:,.2f}'.format)
+                + "\nVencimento: " + bloco['Data_Vencimento'].astype(str)
+                + "\nPDF: " + bloco['PDF_Disponivel'].astype(str)
+                + "\n" + '-' * 40 + "\n"
+            )
+            texto.write(''.join(fichas.tolist()))
+
+
+if importlib.util.find_spec('pyarrow') is not None:
+    @registrar_formato('parquet', '🗃️ Parquet', 'parquet', 'application/vnd.apache.parquet')
+    def escrever_parquet(df, arquivo):
+        """Parquet (pyarrow); colunas com tipos mistos são gravadas como texto (vazios como nulos)"""
+        mistas = [coluna for coluna in df.columns if df[coluna].dtype == object]
+        df.astype({coluna: TIPO_TEXTO for coluna in mistas}).to_parquet(arquivo, index=False)
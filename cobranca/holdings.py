@@ -0,0 +1,76 @@
+"""Identificação de holdings: empresas ligadas por telefones em comum"""
+import numpy as np
+import pandas as pd
+
+
+def componentes_conexos(origem, destino, total_nos):
+    """Rotula os componentes conexos de um grafo não direcionado (union-find vetorizado)
+
+    ``origem`` e ``destino`` são arrays de inteiros com as arestas. Cada
+    rodada liga a raiz maior de cada aresta à menor (``np.minimum.at``) e
+    comprime os caminhos por saltos de ponteiro, até nenhuma aresta ligar
+    rótulos diferentes. Retorna o menor nó de cada componente como rótulo.
+    """
+    rotulo = np.arange(total_nos)
+    while True:
+        raiz_origem = rotulo[origem]
+        raiz_destino = rotulo[destino]
+        menor = np.minimum(raiz_origem, raiz_destino)
+        
+        novo = rotulo.copy()
+        np.minimum.at(novo, raiz_origem, menor)
+        np.minimum.at(novo, raiz_destino, menor)
+        while True:
+            saltado = novo[novo]
+            if np.array_equal(saltado, novo):
+                break
+            novo = saltado
+        
+        if np.array_equal(novo, rotulo):
+            return rotulo
+        rotulo = novo
+
+
+def identificar_holdings(cnpjs, telefones):
+    """Agrupa CNPJs ligados, direta ou indiretamente, por telefones em comum
+
+    Recebe as colunas CNPJ e Telefone_Contato da planilha (uma linha por
+    título). Cada par distinto CNPJ–telefone é uma aresta, de modo que
+    cadeias como A–tel1–B–tel2–C formam uma única holding.
+
+    Retorna um DataFrame indexado por CNPJ com:
+    - ``Holding_ID``: "H-" seguido do menor CNPJ do grupo, estável entre
+      execuções enquanto o grupo não mudar;
+    - ``Telefone_Principal``: telefone ligado a mais CNPJs do grupo (o menor
+      em caso de empate), preenchido apenas quando o grupo tem mais de um
+      CNPJ.
+    """
+    pares = pd.DataFrame({'CNPJ': cnpjs, 'Telefone': telefones}).dropna().drop_duplicates()
+    pares['Telefone'] = pares['Telefone'].astype(str)
+    pares = pares.drop_duplicates()
+    
+    codigo_cnpj, lista_cnpjs = pd.factorize(pares['CNPJ'])
+    codigo_telefone, lista_telefones = pd.factorize(pares['Telefone'])
+    total_cnpjs = len(lista_cnpjs)
+    
+    # Nós: CNPJs em [0, total_cnpjs) e telefones a partir de total_cnpjs
+    rotulo = componentes_conexos(codigo_cnpj, codigo_telefone + total_cnpjs, total_cnpjs + len(lista_telefones))
+    pares['Componente'] = rotulo[codigo_cnpj]
+    
+    por_cnpj = pd.DataFrame({'CNPJ': lista_cnpjs, 'Componente': rotulo[:total_cnpjs]})
+    tamanho_componente = pd.Series(np.bincount(rotulo[:total_cnpjs]))
+    menor_cnpj = por_cnpj.sort_values('CNPJ').drop_duplicates('Componente').set_index('Componente')['CNPJ']
+    
+    # Telefone principal: o que mais aparece entre os CNPJs do componente
+    contagem = pares.groupby(['Componente', 'Telefone']).size().rename('CNPJs').reset_index()
+    principal = (
+        contagem.sort_values(['Componente', 'CNPJs', 'Telefone'], ascending=[True, False, True])
+        .drop_duplicates('Componente')
+        .set_index('Componente')['Telefone']
+    )
+    
+    holdings = por_cnpj.set_index('CNPJ')
+    componente = holdings['Componente']
+    holdings['Holding_ID'] = 'H-' + componente.map(menor_cnpj).astype(str)
+    holdings['Telefone_Principal'] = componente.map(principal).where(componente.map(tamanho_componente) > 1)
+    return holdings[['Holding_ID', 'Telefone_Principal']]
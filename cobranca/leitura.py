@@ -0,0 +1,299 @@
+"""Leitura da planilha de contas a receber, apenas com as colunas usadas
+
+O export do sistema traz muitas colunas que o pipeline descarta. Aqui só as
+colunas renomeadas por ``processar_dados`` são convertidas, com tipos
+explícitos para os textos, e os textos repetidos entre as linhas ficam como
+categóricos (``compactar_textos``). Quando o ``python-calamine`` está
+instalado ele é usado pelo pandas; caso contrário os arquivos .xlsx são lidos
+em streaming direto do XML da aba, convertendo apenas as células das colunas
+usadas (o ``read_excel`` com openpyxl monta um objeto por célula da planilha
+inteira, mesmo com ``usecols``).
+"""
+import importlib.util
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import get_column_letter
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+COLUNAS_RENOMEAR = {
+    'ID Emp.': 'ID_Cliente',
+    'Razão Social': 'Razao_Social',
+    'CPF/CNPJ': 'CNPJ',
+    'Vencimento': 'Data_Vencimento',
+    'Valor': 'Valor_Bruto',
+    'Valor Líquido': 'Valor_Liquido',
+    'Boleto PDF': 'Link_Boleto',
+    'Nfse PDF': 'Link_NFSe',
+    'Faturamento PDF': 'Link_Faturamento',
+    'Funcionários PDF': 'Link_Funcionarios',
+    'Nosso Núm.': 'Telefone_Contato'
+}
+
+COLUNAS_LEITURA = list(COLUNAS_RENOMEAR)
+
+# Tipo dos textos: o 'str' do pandas 3. No pandas 2.3 o ``astype('str')``
+# transformaria as células vazias no texto 'None'; com este tipo elas
+# continuam ausentes (NaN)
+TIPO_TEXTO = pd.StringDtype(na_value=np.nan)
+
+# Colunas de texto. CNPJ e telefone são identificadores: como texto mantêm os
+# zeros à esquerda. As demais (ID, valores e datas) mantêm o tipo inferido,
+# pois podem vir como número ou texto e são tratadas no pipeline
+TIPOS_COLUNAS = {
+    'CPF/CNPJ': TIPO_TEXTO,
+    'Nosso Núm.': TIPO_TEXTO,
+    'Razão Social': TIPO_TEXTO,
+    'Boleto PDF': TIPO_TEXTO,
+    'Nfse PDF': TIPO_TEXTO,
+    'Faturamento PDF': TIPO_TEXTO,
+    'Funcionários PDF': TIPO_TEXTO
+}
+
+# Colunas de texto guardadas como categóricas quando os valores distintos são
+# no máximo esta fração das linhas
+PROPORCAO_CATEGORICA = 0.5
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+# Textos tratados como célula vazia, como no ``read_excel``
+_TEXTOS_AUSENTES = {'', '#N/A', 'N/A', 'n/a', 'NA', '<NA>', '#NA', 'NULL', 'null', 'NaN', 'nan', 'None'}
+
+
+def motor_padrao():
+    """Motor de leitura mais rápido disponível: 'calamine' ou 'streaming'"""
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return 'streaming'
+
+
+def _coluna_usada(nome):
+    return nome in COLUNAS_LEITURA
+
+
+def _eh_xlsx(arquivo):
+    """Indica se o arquivo é um .xlsx (pacote ZIP), preservando a posição de leitura"""
+    if hasattr(arquivo, 'seek'):
+        posicao = arquivo.tell()
+        try:
+            return zipfile.is_zipfile(arquivo)
+        finally:
+            arquivo.seek(posicao)
+    return zipfile.is_zipfile(arquivo)
+
+
+def _tag(nome):
+    return f'{{{_NS}}}{nome}'
+
+
+def _letra_coluna(celula, ordem):
+    """Letra da coluna da célula ('AB' em 'AB12'), ou pela posição se não houver referência"""
+    referencia = celula.get('r')
+    if referencia is None:
+        return get_column_letter(ordem + 1)
+    return referencia.rstrip('0123456789')
+
+
+def _texto(elemento):
+    """Texto de uma string simples (<t>) ou formatada (<r><t>), sem a fonética <rPh>"""
+    trechos = elemento.findall(_tag('t')) + elemento.findall(f"{_tag('r')}/{_tag('t')}")
+    return ''.join(t.text or '' for t in trechos)
+
+
+def _caminho_primeira_aba(pacote):
+    """Caminho, dentro do ZIP, da primeira aba do livro"""
+    livro = ET.fromstring(pacote.read('xl/workbook.xml'))
+    aba = livro.find(f"{_tag('sheets')}/{_tag('sheet')}")
+    id_relacao = aba.get(f'{{{_NS_REL}}}id')
+    relacoes = ET.fromstring(pacote.read('xl/_rels/workbook.xml.rels'))
+    for relacao in relacoes:
+        if relacao.get('Id') == id_relacao:
+            alvo = relacao.get('Target')
+            return alvo.lstrip('/') if alvo.startswith('/') else posixpath.normpath(posixpath.join('xl', alvo))
+    raise ValueError('Aba não encontrada no arquivo')
+
+
+def _epoca(pacote):
+    """Data base do livro: 1900 (Windows) ou 1904 (Mac)"""
+    propriedades = ET.fromstring(pacote.read('xl/workbook.xml')).find(_tag('workbookPr'))
+    if propriedades is not None and propriedades.get('date1904') in ('1', 'true'):
+        return CALENDAR_MAC_1904
+    return CALENDAR_WINDOWS_1900
+
+
+def _estilos_de_data(pacote):
+    """Índices de estilo (atributo ``s`` das células) com formato de data"""
+    if 'xl/styles.xml' not in pacote.namelist():
+        return set()
+    estilos = ET.fromstring(pacote.read('xl/styles.xml'))
+    formatos = dict(BUILTIN_FORMATS)
+    for formato in estilos.iterfind(f"{_tag('numFmts')}/{_tag('numFmt')}"):
+        formatos[int(formato.get('numFmtId'))] = formato.get('formatCode')
+    xfs = estilos.findall(f"{_tag('cellXfs')}/{_tag('xf')}")
+    return {
+        indice for indice, xf in enumerate(xfs)
+        if is_date_format(formatos.get(int(xf.get('numFmtId', 0))))
+    }
+
+
+def _textos_compartilhados(pacote):
+    """Tabela de strings compartilhadas do livro"""
+    if 'xl/sharedStrings.xml' not in pacote.namelist():
+        return []
+    textos = []
+    with pacote.open('xl/sharedStrings.xml') as arquivo:
+        for _, elemento in ET.iterparse(arquivo):
+            if elemento.tag == _tag('si'):
+                textos.append(_texto(elemento))
+                elemento.clear()
+    return textos
+
+
+def _converter_celula(celula, compartilhados, estilos_data, epoca):
+    """Converte a célula como o ``read_excel``: floats inteiros viram int,
+    erros e textos de ausência viram None e números com formato de data
+    viram ``datetime``"""
+    tipo = celula.get('t', 'n')
+    if tipo == 'inlineStr':
+        elemento = celula.find(_tag('is'))
+        valor = _texto(elemento) if elemento is not None else None
+    else:
+        v = celula.find(_tag('v'))
+        if v is None or v.text is None:
+            return None
+        valor = v.text
+        if tipo == 's':
+            valor = compartilhados[int(valor)]
+        elif tipo == 'n':
+            numero = float(valor)
+            if int(celula.get('s', 0)) in estilos_data:
+                return from_excel(numero, epoca)
+            return int(numero) if numero.is_integer() else numero
+        elif tipo == 'b':
+            return valor == '1'
+        elif tipo == 'd':
+            return datetime.fromisoformat(valor)
+        elif tipo == 'e':
+            return None
+    if valor in _TEXTOS_AUSENTES:
+        return None
+    return valor
+
+
+def _ler_xlsx_streaming(arquivo):
+    """Lê a primeira aba percorrendo o XML em streaming
+
+    Todas as células passam pelo parser de XML (em C), mas só as das colunas
+    usadas são convertidas, e cada linha é descartada assim que lida.
+    """
+    with zipfile.ZipFile(arquivo) as pacote:
+        compartilhados = _textos_compartilhados(pacote)
+        estilos_data = _estilos_de_data(pacote)
+        epoca = _epoca(pacote)
+
+        tag_linha = _tag('row')
+        colunas_por_letra = None
+        colunas = {}
+        numero_linha = 0
+        with pacote.open(_caminho_primeira_aba(pacote)) as aba:
+            for _, linha in ET.iterparse(aba):
+                if linha.tag != tag_linha:
+                    continue
+
+                numero_linha = int(linha.get('r', numero_linha + 1))
+                if numero_linha < 2:
+                    pass  # título acima do cabeçalho (header=1)
+                elif colunas_por_letra is None:
+                    # Cabeçalho: letra de cada coluna usada
+                    colunas_por_letra = {}
+                    for ordem, celula in enumerate(linha):
+                        nome = _converter_celula(celula, compartilhados, estilos_data, epoca)
+                        if _coluna_usada(nome) and nome not in colunas_por_letra.values():
+                            colunas_por_letra[_letra_coluna(celula, ordem)] = nome
+                    colunas = {nome: [] for nome in colunas_por_letra.values()}
+                else:
+                    valores = {}
+                    for ordem, celula in enumerate(linha):
+                        nome = colunas_por_letra.get(_letra_coluna(celula, ordem))
+                        if nome is not None:
+                            valores[nome] = _converter_celula(celula, compartilhados, estilos_data, epoca)
+                    if any(valor is not None for valor in valores.values()):
+                        for nome, lista in colunas.items():
+                            lista.append(valores.get(nome))
+                linha.clear()
+
+    df = pd.DataFrame({nome: _montar_coluna(nome, valores) for nome, valores in colunas.items()})
+    return df.astype({nome: tipo for nome, tipo in TIPOS_COLUNAS.items() if nome in df})
+
+
+def _montar_coluna(nome, valores):
+    """Monta a coluna inferindo o tipo como o ``read_excel``
+
+    Colunas com tipo explícito ficam como object até o ``astype``, para que
+    inteiros com células vazias não virem float ('3402.0'). Nas demais, textos
+    numéricos são convertidos quando a coluna inteira é numérica.
+    """
+    if nome in TIPOS_COLUNAS:
+        return pd.Series(valores, dtype=object)
+    coluna = pd.Series(valores, dtype=None if valores else object)
+    if coluna.dtype == object:
+        try:
+            return pd.to_numeric(coluna)
+        except (TypeError, ValueError):
+            pass
+    return coluna
+
+
+def compactar_textos(df, colunas, proporcao_max=PROPORCAO_CATEGORICA):
+    """Guarda como categóricas as colunas de texto com muitos valores repetidos
+
+    Razão social, CNPJ e telefone se repetem em todas as contas do cliente, e
+    os links de NFS-e costumam se repetir entre contas: como categórica, cada
+    linha guarda só um código inteiro e cada texto distinto é guardado uma
+    única vez. Os textos não mudam (nem o hash usado nas assinaturas dos
+    grupos) e as categorias ficam em ordem alfabética, como as chaves do
+    groupby. Colunas com textos quase todos distintos continuam como texto.
+    """
+    tipos = {}
+    for nome in colunas:
+        if nome not in df or isinstance(df[nome].dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_string_dtype(df[nome].dtype) and df[nome].nunique() <= proporcao_max * len(df):
+            tipos[nome] = 'category'
+    return df.astype(tipos) if tipos else df
+
+
+def expandir_textos(df):
+    """Volta as colunas categóricas ao tipo dos textos, para tabelas pequenas extraídas da planilha"""
+    return df.astype({
+        nome: df[nome].cat.categories.dtype for nome in df.columns if isinstance(df[nome].dtype, pd.CategoricalDtype)
+    })
+
+
+def ler_planilha(arquivo, motor=None):
+    """Lê a planilha de contas a receber (cabeçalho na segunda linha)
+
+    Apenas as colunas de ``COLUNAS_LEITURA`` são carregadas. ``motor`` pode
+    ser 'calamine', 'streaming' (leitor de XML deste módulo) ou 'openpyxl'
+    (``read_excel`` padrão); por padrão usa o mais rápido disponível.
+    Arquivos .xls seguem pelo ``read_excel`` com o motor do pandas. Os
+    textos repetidos são compactados por ``compactar_textos``.
+    """
+    motor = motor or motor_padrao()
+    if motor == 'streaming' and _eh_xlsx(arquivo):
+        df = _ler_xlsx_streaming(arquivo)
+    else:
+        df = pd.read_excel(
+            arquivo,
+            header=1,
+            usecols=_coluna_usada,
+            dtype=TIPOS_COLUNAS,
+            engine='calamine' if motor == 'calamine' else None
+        )
+    return compactar_textos(df, TIPOS_COLUNAS)
@@ -0,0 +1,293 @@
+"""Métricas de desempenho de uma execução do processamento
+
+Coleta a duração de cada etapa, a latência e o tamanho de cada download
+(em histogramas por host e status), a duração da unificação de cada grupo e
+os bytes de entrada e de saída dela, o uso do cache de PDFs e a memória das
+tabelas do processamento. Ao final da execução as métricas são gravadas no
+diretório dela como JSON (lido pelo painel de diagnóstico) e no formato de
+texto do Prometheus (para o textfile collector do node_exporter), o que
+permite acompanhar regressões e lentidão do portal ao longo do tempo.
+"""
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+ARQUIVO_JSON = 'metricas.json'
+ARQUIVO_PROMETHEUS = 'metricas.prom'
+
+LIMITES_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LIMITES_BYTES = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 10_000_000)
+LIMITES_UNIFICACAO = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 60)
+
+# Quantidade de downloads e grupos mais lentos guardados
+MAIS_LENTOS = 20
+
+
+class Histograma:
+    """Histograma de faixas fixas, como o do Prometheus (limites superiores inclusivos)"""
+
+    def __init__(self, limites, contagens=None, soma=0.0, total=0):
+        self.limites = tuple(limites)
+        self.contagens = list(contagens) if contagens is not None else [0] * (len(self.limites) + 1)
+        self.soma = soma
+        self.total = total
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, q):
+        """Estimativa do quantil por interpolação linear dentro da faixa, ou None se vazio"""
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            if contagem and acumulado + contagem >= alvo:
+                inferior = self.limites[indice - 1] if indice else 0.0
+                if indice == len(self.limites):
+                    return inferior  # acima do último limite
+                return inferior + (self.limites[indice] - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+    def para_dict(self):
+        return {'limites': list(self.limites), 'contagens': self.contagens, 'soma': self.soma, 'total': self.total}
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(dados['limites'], dados['contagens'], dados['soma'], dados['total'])
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos.items()) + '}'
+
+
+def _linhas_histograma(nome, histograma, rotulos=None):
+    rotulos = rotulos or {}
+    acumulado = 0
+    for limite, contagem in zip(histograma.limites + ('+Inf',), histograma.contagens):
+        acumulado += contagem
+        yield f"{nome}_bucket{_formatar_rotulos({**rotulos, 'le': limite})} {acumulado}"
+    yield f"{nome}_sum{_formatar_rotulos(rotulos)} {histograma.soma}"
+    yield f"{nome}_count{_formatar_rotulos(rotulos)} {histograma.total}"
+
+
+class Metricas:
+    """Coletor de métricas de uma execução, seguro para as threads de download
+
+    As etapas seguem a estrutura linear do pipeline: ``iniciar_etapa(nome)``
+    encerra a etapa anterior e começa a próxima; ``encerrar_etapa()`` fecha a
+    última. Etapas medidas fora do pipeline (leitura da planilha, exportação)
+    entram com ``registrar_etapa``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas = {}
+        self._etapa_atual = None
+        self.downloads = {}
+        self.downloads_mais_lentos = []
+        self.unificacoes = Histograma(LIMITES_UNIFICACAO)
+        self.unificacoes_mais_lentas = []
+        self.pdfs = {'bytes_entrada': 0, 'bytes_saida': 0, 'duplicados': 0, 'segundos_otimizacao': 0.0}
+        self.cache = {}
+        self.servidores = {}
+        self.memoria = {}
+
+    def registrar_etapa(self, nome, segundos):
+        with self._lock:
+            self.etapas[nome] = self.etapas.get(nome, 0.0) + segundos
+
+    def iniciar_etapa(self, nome):
+        self.encerrar_etapa()
+        self._etapa_atual = (nome, time.perf_counter())
+
+    def encerrar_etapa(self):
+        if self._etapa_atual is not None:
+            nome, inicio = self._etapa_atual
+            self._etapa_atual = None
+            self.registrar_etapa(nome, time.perf_counter() - inicio)
+
+    def registrar_download(self, url, status, segundos, tamanho):
+        """Um download por URL: ``status`` é o código HTTP, 'cache', 'compartilhado' ou o tipo do erro"""
+        host = urlsplit(url).netloc or '?'
+        with self._lock:
+            histogramas = self.downloads.setdefault(
+                (host, str(status)), {'latencia': Histograma(LIMITES_LATENCIA), 'bytes': Histograma(LIMITES_BYTES)}
+            )
+            histogramas['latencia'].observar(segundos)
+            histogramas['bytes'].observar(tamanho)
+            _guardar_mais_lento(self.downloads_mais_lentos, segundos, {'url': url, 'status': str(status)})
+
+    def registrar_unificacao(self, grupo_id, segundos, relatorio=None):
+        """Um grupo unificado; ``relatorio`` é o de ``unificar_pdfs`` (bytes e otimização)"""
+        with self._lock:
+            self.unificacoes.observar(segundos)
+            for chave, valor in (relatorio or {}).items():
+                self.pdfs[chave] += valor
+            _guardar_mais_lento(self.unificacoes_mais_lentas, segundos, {'grupo_id': str(grupo_id)})
+
+    def registrar_cache(self, origens):
+        """Uso do cache de PDFs a partir das origens de ``baixar_pdfs_concorrente``"""
+        acertos = origens['cache'] + origens['revalidado']
+        consultas = acertos + origens['rede']
+        self.cache = {
+            'acertos': acertos,
+            'revalidados': origens['revalidado'],
+            'faltas': origens['rede'],
+            'taxa_acerto': acertos / consultas if consultas else None,
+            'duplicados_evitados': origens['duplicados_evitados']
+        }
+
+    def registrar_servidores(self, situacao):
+        """Timeout, limite de conexões e circuito de cada servidor ao final dos downloads"""
+        self.servidores = dict(situacao)
+
+    def registrar_memoria(self, tabela, tamanho):
+        """Memória ocupada por uma tabela do processamento, em bytes"""
+        with self._lock:
+            self.memoria[tabela] = int(tamanho)
+
+    def para_dict(self):
+        with self._lock:
+            return {
+                'etapas': dict(self.etapas),
+                'downloads': [
+                    {'host': host, 'status': status, 'latencia': h['latencia'].para_dict(), 'bytes': h['bytes'].para_dict()}
+                    for (host, status), h in sorted(self.downloads.items())
+                ],
+                'downloads_mais_lentos': _ordenar_mais_lentos(self.downloads_mais_lentos),
+                'unificacoes': self.unificacoes.para_dict(),
+                'unificacoes_mais_lentas': _ordenar_mais_lentos(self.unificacoes_mais_lentas),
+                'pdfs': dict(self.pdfs),
+                'cache': dict(self.cache),
+                'servidores': dict(self.servidores),
+                'memoria': dict(self.memoria)
+            }
+
+    def para_prometheus(self):
+        """Métricas no formato de texto do Prometheus"""
+        linhas = [
+            '# HELP cobranca_etapa_segundos Duracao de cada etapa do processamento.',
+            '# TYPE cobranca_etapa_segundos gauge'
+        ]
+        dados = self.para_dict()
+        linhas += [
+            f"cobranca_etapa_segundos{_formatar_rotulos({'etapa': nome})} {segundos}"
+            for nome, segundos in dados['etapas'].items()
+        ]
+        linhas += [
+            '# HELP cobranca_download_latencia_segundos Latencia de cada download de PDF.',
+            '# TYPE cobranca_download_latencia_segundos histogram'
+        ]
+        for item in dados['downloads']:
+            rotulos = {'host': item['host'], 'status': item['status']}
+            linhas += _linhas_histograma('cobranca_download_latencia_segundos',
+                                         Histograma.de_dict(item['latencia']), rotulos)
+        linhas += [
+            '# HELP cobranca_download_bytes Tamanho de cada PDF baixado.',
+            '# TYPE cobranca_download_bytes histogram'
+        ]
+        for item in dados['downloads']:
+            rotulos = {'host': item['host'], 'status': item['status']}
+            linhas += _linhas_histograma('cobranca_download_bytes', Histograma.de_dict(item['bytes']), rotulos)
+        linhas += [
+            '# HELP cobranca_unificacao_segundos Duracao da unificacao dos PDFs de cada grupo.',
+            '# TYPE cobranca_unificacao_segundos histogram'
+        ]
+        linhas += _linhas_histograma('cobranca_unificacao_segundos', Histograma.de_dict(dados['unificacoes']))
+        linhas += [
+            '# HELP cobranca_pdf_bytes_total Bytes dos PDFs de entrada e dos PDFs unificados.',
+            '# TYPE cobranca_pdf_bytes_total counter',
+            f"cobranca_pdf_bytes_total{_formatar_rotulos({'tipo': 'entrada'})} {dados['pdfs']['bytes_entrada']}",
+            f"cobranca_pdf_bytes_total{_formatar_rotulos({'tipo': 'saida'})} {dados['pdfs']['bytes_saida']}",
+            '# HELP cobranca_pdf_duplicados_total PDFs identicos ignorados na unificacao.',
+            '# TYPE cobranca_pdf_duplicados_total counter',
+            f"cobranca_pdf_duplicados_total {dados['pdfs']['duplicados']}",
+            '# HELP cobranca_pdf_otimizacao_segundos_total Tempo gasto otimizando os PDFs unificados.',
+            '# TYPE cobranca_pdf_otimizacao_segundos_total counter',
+            f"cobranca_pdf_otimizacao_segundos_total {dados['pdfs']['segundos_otimizacao']}"
+        ]
+        if dados['servidores']:
+            linhas += [
+                '# HELP cobranca_download_timeout_segundos Timeout adaptativo de cada servidor ao final dos downloads.',
+                '# TYPE cobranca_download_timeout_segundos gauge'
+            ]
+            linhas += [
+                f"cobranca_download_timeout_segundos{_formatar_rotulos({'host': host})} {situacao['timeout']}"
+                for host, situacao in dados['servidores'].items()
+            ]
+            linhas += [
+                '# HELP cobranca_download_circuito_aberto Servidor suspenso pelo circuito ao final dos downloads.',
+                '# TYPE cobranca_download_circuito_aberto gauge'
+            ]
+            linhas += [
+                f"cobranca_download_circuito_aberto{_formatar_rotulos({'host': host})} {int(situacao['circuito_aberto'])}"
+                for host, situacao in dados['servidores'].items()
+            ]
+        if dados['memoria']:
+            linhas += [
+                '# HELP cobranca_memoria_bytes Memoria ocupada por cada tabela do processamento.',
+                '# TYPE cobranca_memoria_bytes gauge'
+            ]
+            linhas += [
+                f"cobranca_memoria_bytes{_formatar_rotulos({'tabela': tabela})} {tamanho}"
+                for tabela, tamanho in dados['memoria'].items()
+            ]
+        if dados['cache']:
+            linhas += [
+                '# HELP cobranca_cache_pdfs_total Consultas ao cache de PDFs por resultado.',
+                '# TYPE cobranca_cache_pdfs_total counter'
+            ]
+            linhas += [
+                f"cobranca_cache_pdfs_total{_formatar_rotulos({'resultado': resultado})} {dados['cache'][chave]}"
+                for resultado, chave in (('acerto', 'acertos'), ('revalidado', 'revalidados'), ('falta', 'faltas'))
+            ]
+        return '\n'.join(linhas) + '\n'
+
+    def gravar(self, diretorio):
+        """Grava ``metricas.json`` e ``metricas.prom`` no diretório e retorna os caminhos"""
+        caminhos = []
+        for nome, conteudo in (
+            (ARQUIVO_JSON, json.dumps(self.para_dict(), ensure_ascii=False, indent=1)),
+            (ARQUIVO_PROMETHEUS, self.para_prometheus())
+        ):
+            with tempfile.NamedTemporaryFile('w', dir=diretorio, suffix='.tmp', delete=False, encoding='utf-8') as tmp:
+                tmp.write(conteudo)
+            caminhos.append(os.path.join(diretorio, nome))
+            os.replace(tmp.name, caminhos[-1])
+        return caminhos
+
+
+def _guardar_mais_lento(heap, segundos, info):
+    item = (segundos, id(info), info)
+    if len(heap) < MAIS_LENTOS:
+        heapq.heappush(heap, item)
+    elif segundos > heap[0][0]:
+        heapq.heapreplace(heap, item)
+
+
+def _ordenar_mais_lentos(heap):
+    return [{**info, 'segundos': segundos} for segundos, _, info in sorted(heap, key=lambda item: -item[0])]
+
+
+def carregar_metricas(diretorio):
+    """Métricas gravadas no diretório da execução (dicionário do JSON), ou None"""
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_JSON), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,573 @@
+"""Pipeline de unificação das contas a receber, sem dependência do Streamlit
+
+Lê a planilha, agrupa as contas por cliente ou holding, baixa e unifica os
+PDFs e gera os arquivos de saída. É usado pela interface Streamlit
+(``app.py``) e pela linha de comando (``python -m cobranca``).
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from cobranca.downloads import AgendadorDownloads, RelatorioFalhas, baixar_pdfs_concorrente, link_valido
+from cobranca.metricas import Metricas
+from cobranca.holdings import identificar_holdings
+from cobranca.leitura import COLUNAS_RENOMEAR, TIPOS_COLUNAS, compactar_textos, expandir_textos
+from cobranca.unificacao import unificar_grupos
+from cobranca.valores import converter_valores_brl, formatar_valores_brl
+
+COLUNAS_PDF = ['Link_Boleto', 'Link_NFSe', 'Link_Faturamento', 'Link_Funcionarios']
+
+# Colunas de texto da planilha, já renomeadas
+COLUNAS_TEXTO = [COLUNAS_RENOMEAR[nome] for nome in TIPOS_COLUNAS]
+
+# Colunas que definem o resultado de um grupo: a linha agregada e o PDF unificado
+COLUNAS_ASSINATURA = [
+    'ID_Cliente', 'Razao_Social', 'CNPJ', 'Telefone_Contato', 'Data_Vencimento', 'Valor_Atualizado', *COLUNAS_PDF
+]
+
+# Moeda em reais; os separadores seguem a localidade do Excel de quem abre
+FORMATO_MOEDA_BRL = '[$R$-416] #,##0.00'
+
+COLUNAS_PLANILHA = [
+    'ID_Cliente',
+    'Razao_Social',
+    'CNPJ',
+    'Telefone_Contato',
+    'Data_Vencimento',
+    'Valor_Total',
+    'Quantidade_Contas',
+    'PDF_Disponivel'
+]
+
+
+class ProcessamentoCancelado(Exception):
+    """O processamento foi interrompido por ``Andamento.cancelar()``"""
+
+
+class Andamento:
+    """Contadores do processamento em andamento e pedido de cancelamento
+
+    Atualizado por ``processar_dados`` e lido por outra thread (a interface
+    acompanha uma execução em segundo plano). Os downloads contam URLs
+    distintas; os grupos contam os PDFs unificados, inclusive os
+    reaproveitados de um checkpoint.
+    """
+    
+    def __init__(self):
+        self.percentual = 0
+        self.mensagem = ''
+        self.downloads_total = 0
+        self.downloads_concluidos = 0
+        self.bytes_baixados = 0
+        self.grupos_total = 0
+        self.grupos_concluidos = 0
+        self.grupos_reaproveitados = 0
+        self.inicio = time.monotonic()
+        self.cancelamento = threading.Event()
+    
+    def cancelar(self):
+        self.cancelamento.set()
+    
+    @property
+    def cancelado(self):
+        return self.cancelamento.is_set()
+    
+    def verificar_cancelamento(self):
+        """Interrompe o processamento com ``ProcessamentoCancelado`` se foi pedido"""
+        if self.cancelado:
+            raise ProcessamentoCancelado('Processamento cancelado')
+    
+    def segundos_restantes(self):
+        """Estimativa do tempo restante pelos downloads e unificações já feitos, ou None"""
+        total = self.downloads_total + self.grupos_total - self.grupos_reaproveitados
+        feitos = self.downloads_concluidos + self.grupos_concluidos - self.grupos_reaproveitados
+        if feitos <= 0 or total <= 0:
+            return None
+        decorrido = time.monotonic() - self.inicio
+        return decorrido * max(total - feitos, 0) / feitos
+
+
+def agregar_grupos(df, grupo_cols, id_como_texto=False):
+    """Monta a tabela de resultados com um único groupby, sem laço por grupo
+
+    As linhas saem na ordem das chaves do groupby, a mesma usada por
+    ``links_dos_grupos``. A coluna PDF_Disponivel é preenchida depois da
+    etapa de PDFs.
+    """
+    grupos = df.groupby(grupo_cols, sort=True, observed=True)
+    numero_grupo = grupos.ngroup().to_numpy()
+    
+    # Primeira linha de cada grupo (inclusive valores vazios), na ordem das chaves
+    numeros, primeira_linha = np.unique(numero_grupo, return_index=True)
+    primeira_linha = primeira_linha[numeros >= 0]
+    primeiros = df.iloc[primeira_linha]
+    
+    # Vencimento único no grupo (comparando apenas o dia) ou "datas variadas";
+    # cada dia distinto é formatado uma única vez
+    datas = df['Data_Vencimento'].dt.normalize().groupby(numero_grupo).agg(['nunique', 'first'])
+    datas = datas[datas.index >= 0]
+    codigos, dias = pd.factorize(datas['first'])
+    dias_formatados = np.append(dias.strftime('%d/%m/%Y').to_numpy(dtype=object), None)
+    data_vencimento = np.where(datas['nunique'] == 1, dias_formatados[codigos], 'datas variadas')
+    
+    telefones = primeiros[grupo_cols[0]].reset_index(drop=True)
+    cnpjs = primeiros[grupo_cols[1]].reset_index(drop=True)
+    resultado = pd.DataFrame({
+        'ID_Cliente': (primeiros['ID_Cliente'].astype(str) if id_como_texto else primeiros['ID_Cliente']).to_numpy(),
+        'Razao_Social': primeiros['Razao_Social'].to_numpy(),
+        'CNPJ': cnpjs.to_numpy(),
+        'Telefone_Contato': telefones.to_numpy(),
+        'Data_Vencimento': data_vencimento,
+        'Valor_Total': grupos['Valor_Atualizado'].sum().round(2).to_numpy(),
+        'Quantidade_Contas': grupos.size().to_numpy(),
+        'PDF_Disponivel': 'Não',
+        'Grupo_ID': (telefones.astype(str) + '_' + cnpjs.astype(str)).to_numpy()
+    })
+    if 'Holding_ID' in primeiros:
+        resultado['Holding_ID'] = primeiros['Holding_ID'].to_numpy()
+    return resultado
+
+
+def links_dos_grupos(df, grupo_cols):
+    """Lista os links de PDF de cada grupo, na ordem das chaves do groupby
+
+    Dentro do grupo os links seguem a ordem linha a linha e coluna a coluna,
+    a mesma em que os PDFs são unificados.
+    """
+    numero_grupo = df.groupby(grupo_cols, sort=True, observed=True).ngroup().to_numpy()
+    validos = numero_grupo >= 0
+    ordem = np.argsort(numero_grupo[validos], kind='stable')
+    links = df[COLUNAS_PDF].to_numpy(dtype=object)[validos][ordem].ravel().tolist()
+    
+    tamanhos = np.bincount(numero_grupo[validos]) * len(COLUNAS_PDF)
+    fins = np.cumsum(tamanhos)
+    return [links[fim - tamanho:fim] for fim, tamanho in zip(fins, tamanhos)]
+
+
+def _misturar(valores):
+    """Finalizador do splitmix64: espalha os bits de cada hash de 64 bits"""
+    valores = (valores ^ (valores >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    valores = (valores ^ (valores >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return valores ^ (valores >> np.uint64(31))
+
+
+def assinaturas_dos_grupos(df, grupo_cols):
+    """Impressão digital (uint64) de cada grupo, na ordem das chaves do groupby
+
+    Cada linha é resumida pelo hash de ``COLUNAS_ASSINATURA``, combinado com a
+    posição dela no grupo (a ordem define a ordem das páginas do PDF). Grupos
+    com a mesma assinatura em duas execuções têm a mesma linha agregada e o
+    mesmo PDF unificado, desde que os links sirvam o mesmo conteúdo.
+    """
+    numero_grupo = df.groupby(grupo_cols, sort=True, observed=True).ngroup().to_numpy()
+    validos = numero_grupo >= 0
+    if not validos.any():
+        return np.zeros(0, dtype=np.uint64)
+    hashes = pd.util.hash_pandas_object(df[COLUNAS_ASSINATURA], index=False).to_numpy()[validos]
+    ordem = np.argsort(numero_grupo[validos], kind='stable')
+    numeros, hashes = numero_grupo[validos][ordem], hashes[ordem]
+    
+    inicios = np.flatnonzero(np.r_[True, numeros[1:] != numeros[:-1]])
+    posicoes = np.arange(len(numeros)) - np.repeat(inicios, np.diff(np.r_[inicios, len(numeros)]))
+    misturados = _misturar(hashes ^ _misturar(posicoes.astype(np.uint64)))
+    return np.add.reduceat(misturados, inicios)
+
+
+def comparar_assinaturas(assinaturas, assinaturas_anteriores):
+    """Grupos inalterados e resumo das diferenças entre duas execuções
+
+    Recebe Series grupo_id -> assinatura e retorna (grupos inalterados,
+    {'adicionados', 'alterados', 'removidos', 'reaproveitados'}).
+    """
+    comuns = assinaturas.index.intersection(assinaturas_anteriores.index)
+    iguais = assinaturas[comuns].to_numpy() == assinaturas_anteriores[comuns].to_numpy()
+    inalterados = comuns[iguais]
+    return inalterados, {
+        'adicionados': len(assinaturas.index.difference(assinaturas_anteriores.index)),
+        'alterados': int((~iguais).sum()),
+        'removidos': len(assinaturas_anteriores.index.difference(assinaturas.index)),
+        'reaproveitados': len(inalterados)
+    }
+
+
+def _reaproveitar_pdf(origem, diretorio):
+    """Traz para o diretório o PDF de outra execução (link físico ou cópia), ou None"""
+    destino = os.path.join(diretorio or tempfile.gettempdir(), os.path.basename(origem))
+    try:
+        try:
+            os.link(origem, destino)
+        except OSError:
+            shutil.copyfile(origem, destino)
+    except OSError:
+        return None
+    return destino
+
+
+def processar_dados(df, baixar_pdfs_option=True, agrupar_holdings_option=True, max_workers_download=8,
+                    cache_pdfs=None, downloads_em_andamento=None, memoria_max_mb=None, processos_unificacao=1,
+                    callback_progresso=None, callback_aviso=None, diretorio_pdfs=None,
+                    andamento=None, pdfs_reaproveitados=None, callback_grupo_concluido=None,
+                    execucao_anterior=None, metricas=None, max_downloads_por_host=None, tentativas_download=4,
+                    otimizar_pdfs=False):
+    """Processa os dados conforme configurações
+
+    ``callback_progresso(percentual, mensagem)`` recebe o andamento de 0 a 100
+    e ``callback_aviso(mensagem)`` os erros não fatais (downloads e PDFs
+    inválidos). Os PDFs unificados são gravados em ``diretorio_pdfs`` (por
+    padrão, o diretório temporário do sistema); removê-los cabe a quem chama.
+    
+    ``andamento`` (``Andamento``) recebe os contadores detalhados e permite
+    cancelar o processamento, que termina com ``ProcessamentoCancelado``.
+    ``pdfs_reaproveitados`` ({grupo_id: {'caminho', 'nome'}}) traz PDFs já
+    unificados, como os de um checkpoint: esses grupos não são baixados nem
+    unificados de novo. ``callback_grupo_concluido(grupo_id, info)`` é
+    chamado a cada PDF unificado, para que quem chama grave o checkpoint.
+    
+    ``execucao_anterior`` ({'assinaturas': Series grupo_id -> assinatura,
+    'pdfs': {grupo_id: {'caminho', 'nome'}}}) permite o reprocessamento
+    incremental: grupos com a mesma assinatura reaproveitam o PDF unificado
+    da execução anterior, e ``stats['reprocessamento']`` resume as diferenças.
+    As assinaturas desta execução vão em ``stats['assinaturas']``, exceto as
+    dos grupos incompletos (algum link não baixado ou erro na unificação):
+    esses grupos não entram no checkpoint e são refeitos na próxima execução.
+    
+    ``metricas`` (``Metricas``) recebe a duração de cada etapa, cada download,
+    cada unificação, o uso do cache e a memória das tabelas de entrada, de
+    trabalho e de resultados; gravá-las cabe a quem chama.
+    
+    Cada servidor de PDFs recebe até ``max_downloads_por_host`` conexões (por
+    padrão, ``max_workers_download``) e falhas transitórias são repetidas até
+    ``tentativas_download`` vezes (``AgendadorDownloads``). Os downloads que
+    falharam são resumidos por servidor e motivo em ``stats['falhas_download']``.
+    
+    Com ``otimizar_pdfs`` os PDFs idênticos de um grupo entram uma única vez
+    no unificado, os recursos idênticos entre os documentos são gravados uma
+    única vez e os streams são comprimidos (``unificar_pdfs``); os bytes de
+    entrada e de saída vão para ``metricas``.
+    Retorna (df_resultado, pdfs_para_download, stats).
+    """
+    andamento = andamento or Andamento()
+    metricas = metricas or Metricas()
+    avisar = callback_aviso or (lambda mensagem: None)
+    
+    def progresso(percentual, mensagem):
+        andamento.percentual = percentual
+        andamento.mensagem = mensagem
+        if callback_progresso:
+            callback_progresso(percentual, mensagem)
+    
+    # Etapa 1: Preparação dos dados
+    metricas.iniciar_etapa('preparacao')
+    progresso(10, "📋 Preparando dados...")
+    
+    # Renomear colunas, mantendo só as usadas, com os textos repetidos como
+    # categóricos (a planilha lida por ``ler_planilha`` já vem assim)
+    metricas.registrar_memoria('entrada', df.memory_usage(deep=True).sum())
+    df = df.rename(columns=COLUNAS_RENOMEAR)[list(COLUNAS_RENOMEAR.values())]
+    df = compactar_textos(df, COLUNAS_TEXTO)
+    
+    # Converter datas e valores
+    df['Data_Vencimento'] = pd.to_datetime(df['Data_Vencimento'], errors='coerce')
+    
+    df['Valor_Liquido'] = df['Valor_Liquido'].fillna(df['Valor_Bruto'])
+    df['Valor_Atualizado'], valores_invalidos = converter_valores_brl(df['Valor_Liquido'])
+    linhas_invalidas = None
+    if valores_invalidos.any():
+        linhas_invalidas = expandir_textos(
+            df.loc[valores_invalidos, ['ID_Cliente', 'Razao_Social', 'CNPJ', 'Valor_Liquido']]
+        )
+    
+    # Os textos dos valores não são mais usados. O valor fica em float64: é
+    # exato até o centavo nas somas e entra nas assinaturas dos grupos
+    df = df.drop(columns=['Valor_Bruto', 'Valor_Liquido'])
+    
+    # Etapa 2: Agrupamento por telefone (holdings)
+    if agrupar_holdings_option:
+        metricas.iniciar_etapa('holdings')
+        progresso(30, "🏢 Agrupando holdings...")
+        
+        # CNPJs ligados por telefones em comum, inclusive em cadeia, formam uma holding
+        holdings = identificar_holdings(df['CNPJ'], df['Telefone_Contato'])
+        
+        df['Telefone_Agrupado'] = df['CNPJ'].map(holdings['Telefone_Principal']).fillna(df['Telefone_Contato'])
+        df['Holding_ID'] = df['CNPJ'].map(holdings['Holding_ID'])
+        df = compactar_textos(df, ['Telefone_Agrupado', 'Holding_ID'])
+        grupo_cols = ['Telefone_Agrupado', 'CNPJ']
+    else:
+        df['Telefone_Agrupado'] = df['Telefone_Contato']
+        grupo_cols = ['ID_Cliente', 'CNPJ']
+    
+    # Etapa 3: Agregação por grupo, em uma única passada
+    metricas.iniciar_etapa('agregacao')
+    progresso(50, "📊 Processando grupos...")
+    metricas.registrar_memoria('trabalho', df.memory_usage(deep=True).sum())
+    
+    df_resultado = agregar_grupos(df, grupo_cols, id_como_texto=agrupar_holdings_option)
+    pdfs_para_download = {}
+    
+    # Comparação com a execução anterior: a agregação é uma única passada
+    # vetorizada, então só os PDFs dos grupos inalterados são reaproveitados
+    assinaturas = pd.Series(assinaturas_dos_grupos(df, grupo_cols), index=df_resultado['Grupo_ID'].to_numpy())
+    inalterados = []
+    reprocessamento = None
+    incompletos = set()
+    if execucao_anterior is not None:
+        inalterados, reprocessamento = comparar_assinaturas(assinaturas, execucao_anterior['assinaturas'])
+    
+    # Etapa 4: Download dos PDFs de todos os grupos
+    origens_download = None
+    relatorio_falhas = RelatorioFalhas()
+    diretorio_spool = None
+    if baixar_pdfs_option:
+        andamento.verificar_cancelamento()
+        if memoria_max_mb or processos_unificacao > 1:
+            diretorio_spool = tempfile.mkdtemp(prefix='spool_pdfs_')
+        
+        try:
+            metricas.iniciar_etapa('download')
+            progresso(55, "📥 Baixando PDFs...")
+            
+            # Grupos reaproveitados (PDF ainda em disco) não têm links a baixar
+            reaproveitados = {
+                grupo_id: info for grupo_id, info in (pdfs_reaproveitados or {}).items()
+                if os.path.exists(info['caminho'])
+            }
+            for grupo_id in inalterados:
+                anterior = execucao_anterior['pdfs'].get(grupo_id)
+                if anterior is None or grupo_id in reaproveitados:
+                    continue
+                caminho = _reaproveitar_pdf(anterior['caminho'], diretorio_pdfs)
+                if caminho is not None:
+                    reaproveitados[grupo_id] = {'caminho': caminho, 'nome': anterior['nome']}
+                    if callback_grupo_concluido:
+                        callback_grupo_concluido(grupo_id, reaproveitados[grupo_id])
+            links_por_grupo = [
+                [] if grupo_id in reaproveitados else links
+                for grupo_id, links in zip(df_resultado['Grupo_ID'], links_dos_grupos(df, grupo_cols))
+            ]
+            todos_links = [url for links in links_por_grupo for url in links]
+            
+            def atualizar_download(concluidos, total, bytes_recebidos):
+                andamento.downloads_total = total
+                andamento.downloads_concluidos = concluidos
+                andamento.bytes_baixados = bytes_recebidos
+                progresso(55 + int(concluidos / total * 25), f"📥 Baixando PDFs... {concluidos} de {total}")
+            
+            agendador = AgendadorDownloads(
+                max_por_host=max_downloads_por_host or max_workers_download,
+                tentativas=tentativas_download,
+                cancelamento=andamento.cancelamento
+            )
+            pdfs_baixados, origens_download = baixar_pdfs_concorrente(
+                todos_links,
+                max_workers=max_workers_download,
+                callback_progresso=atualizar_download,
+                cache=cache_pdfs,
+                em_andamento=downloads_em_andamento,
+                diretorio_spool=diretorio_spool,
+                callback_aviso=avisar,
+                cancelamento=andamento.cancelamento,
+                metricas=metricas,
+                agendador=agendador,
+                relatorio_falhas=relatorio_falhas
+            )
+            metricas.registrar_cache(origens_download)
+            metricas.registrar_servidores(agendador.situacao())
+            andamento.verificar_cancelamento()
+            
+            # Etapa 5: Unificação dos PDFs, em paralelo entre os grupos
+            metricas.iniciar_etapa('unificacao')
+            progresso(80, "📄 Unificando PDFs...")
+            
+            tarefas_unificacao = []
+            nomes_pdf = {}
+            memoria_max_bytes = memoria_max_mb * 1024 * 1024 if memoria_max_mb else None
+            inicio = 0
+            for grupo, links in zip(df_resultado.itertuples(index=False), links_por_grupo):
+                pdfs_grupo = [pdf for pdf in pdfs_baixados[inicio:inicio + len(links)] if pdf]
+                inicio += len(links)
+                if len(pdfs_grupo) < sum(map(link_valido, links)):
+                    incompletos.add(grupo.Grupo_ID)
+                if not pdfs_grupo:
+                    continue
+            
+                # Criar arquivo temporário para o PDF unificado
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=diretorio_pdfs,
+                                                 prefix=f"{grupo.ID_Cliente}_") as tmp_file:
+                    tmp_path = tmp_file.name
+                tarefas_unificacao.append((grupo.Grupo_ID, pdfs_grupo, tmp_path, memoria_max_bytes, otimizar_pdfs))
+                nomes_pdf[grupo.Grupo_ID] = f"{grupo.ID_Cliente}_{grupo.Razao_Social[:30]}.pdf".replace('/', '_')
+            
+            caminhos_pdf = {grupo_id: tmp_path for grupo_id, _, tmp_path, _, _ in tarefas_unificacao}
+            andamento.grupos_total = len(tarefas_unificacao) + len(reaproveitados)
+            andamento.grupos_concluidos = andamento.grupos_reaproveitados = len(reaproveitados)
+            
+            def concluir_grupo(grupo_id, sucesso, erros):
+                for erro in erros:
+                    avisar(erro)
+                if not sucesso or erros:
+                    incompletos.add(grupo_id)
+                if sucesso:
+                    andamento.grupos_concluidos += 1
+                    if callback_grupo_concluido and grupo_id not in incompletos:
+                        callback_grupo_concluido(
+                            grupo_id, {'caminho': caminhos_pdf[grupo_id], 'nome': nomes_pdf[grupo_id]}
+                        )
+            
+            def atualizar_unificacao(concluidos, total):
+                progresso(80 + int(concluidos / total * 15), f"📄 Unificando PDFs... {concluidos} de {total}")
+            
+            unificacoes = unificar_grupos(
+                tarefas_unificacao,
+                processos=processos_unificacao,
+                callback_progresso=atualizar_unificacao,
+                callback_grupo=concluir_grupo,
+                cancelamento=andamento.cancelamento,
+                metricas=metricas
+            )
+            andamento.verificar_cancelamento()
+        finally:
+            if diretorio_spool:
+                shutil.rmtree(diretorio_spool, ignore_errors=True)
+        
+        # PDFs na ordem dos grupos, reaproveitados ou unificados agora
+        for grupo_id in df_resultado['Grupo_ID']:
+            if grupo_id in reaproveitados:
+                pdfs_para_download[grupo_id] = reaproveitados[grupo_id]
+            elif unificacoes.get(grupo_id, (False,))[0]:
+                pdfs_para_download[grupo_id] = {'caminho': caminhos_pdf[grupo_id], 'nome': nomes_pdf[grupo_id]}
+    
+    df_resultado['PDF_Disponivel'] = np.where(df_resultado['Grupo_ID'].isin(pdfs_para_download), 'Sim', 'Não')
+    
+    # Etapa 6: Finalizar
+    metricas.iniciar_etapa('finalizacao')
+    progresso(100, "✅ Processamento concluído!")
+    
+    # Ordenar por valor total
+    df_resultado = df_resultado.sort_values('Valor_Total', ascending=False)
+    
+    # Formatar valor para exibição
+    df_resultado['Valor_Total_Formatado'] = formatar_valores_brl(df_resultado['Valor_Total'])
+    metricas.registrar_memoria('resultados', df_resultado.memory_usage(deep=True).sum())
+    
+    # Calcular estatísticas
+    stats = {
+        'total_clientes': len(df_resultado),
+        'valor_total': df_resultado['Valor_Total'].sum(),
+        'media_cliente': df_resultado['Valor_Total'].mean(),
+        'clientes_com_pdf': df_resultado['PDF_Disponivel'].eq('Sim').sum(),
+        'assinaturas': assinaturas[~assinaturas.index.isin(list(incompletos))]
+    }
+    if reprocessamento is not None:
+        stats['reprocessamento'] = reprocessamento
+    if linhas_invalidas is not None:
+        stats['valores_invalidos'] = linhas_invalidas
+    if origens_download is not None:
+        stats['downloads_duplicados_evitados'] = origens_download['duplicados_evitados']
+        stats['downloads_novas_tentativas'] = origens_download['novas_tentativas']
+    if relatorio_falhas.total:
+        stats['falhas_download'] = relatorio_falhas.resumo()
+    if cache_pdfs is not None and origens_download is not None:
+        stats['cache_pdfs'] = {
+            'acertos': origens_download['cache'] + origens_download['revalidado'],
+            'revalidados': origens_download['revalidado'],
+            'faltas': origens_download['rede']
+        }
+    metricas.encerrar_etapa()
+    
+    return df_resultado, pdfs_para_download, stats
+
+
+def criar_arquivo_zip(pdfs_dict, destino=None, compactar=False):
+    """Cria um arquivo ZIP com todos os PDFs
+
+    ``destino`` pode ser um caminho ou um arquivo aberto; sem ele o ZIP é
+    montado em memória. Os PDFs já são comprimidos, então por padrão são
+    apenas armazenados (ZIP_STORED); ``compactar`` aplica ZIP_DEFLATED. Os
+    PDFs de origem são mantidos.
+    """
+    zip_buffer = destino if destino is not None else BytesIO()
+    metodo = zipfile.ZIP_DEFLATED if compactar else zipfile.ZIP_STORED
+    with zipfile.ZipFile(zip_buffer, 'w', metodo) as zip_file:
+        for grupo_id, info in pdfs_dict.items():
+            if os.path.exists(info['caminho']):
+                zip_file.write(info['caminho'], info['nome'])
+    
+    if destino is None:
+        zip_buffer.seek(0)
+    return zip_buffer
+
+
+def obter_arquivo_zip(execucao, pdfs_dict, compactar=False):
+    """Caminho do ZIP da execução, criado em disco apenas na primeira chamada
+
+    O arquivo fica no diretório da execução e é removido junto com ela.
+    """
+    nome = 'PDFs_Unificados_compactado.zip' if compactar else 'PDFs_Unificados.zip'
+    return execucao.obter_arquivo(nome, lambda arquivo: criar_arquivo_zip(pdfs_dict, arquivo, compactar))
+
+
+def _valores_para_planilha(coluna):
+    """Valores da coluna como tipos nativos do Python, com vazios como None"""
+    valores = coluna.astype(object).where(coluna.notna(), None)
+    return valores.tolist()
+
+
+def criar_planilha_excel(df_resultados, destino=None):
+    """Gera a planilha de resultados com as abas de clientes e de estatísticas
+
+    ``destino`` pode ser um caminho ou um arquivo aberto; sem ele a planilha
+    é montada em memória e o ``BytesIO`` é retornado. As linhas são gravadas
+    em sequência pelo xlsxwriter em modo ``constant_memory`` (cada linha vai
+    para o disco assim que a seguinte começa) e os valores ficam numéricos,
+    com formato de moeda em reais, para que possam ser somados no Excel.
+    """
+    excel_buffer = destino if destino is not None else BytesIO()
+    livro = xlsxwriter.Workbook(excel_buffer, {'constant_memory': True})
+    cabecalho = livro.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    moeda = livro.add_format({'num_format': FORMATO_MOEDA_BRL})
+    
+    # Planilha principal
+    aba = livro.add_worksheet('Clientes_Unificados')
+    aba.set_column(0, len(COLUNAS_PLANILHA) - 1, 18)
+    aba.set_column(COLUNAS_PLANILHA.index('Razao_Social'), COLUNAS_PLANILHA.index('Razao_Social'), 40)
+    aba.write_row(0, 0, COLUNAS_PLANILHA, cabecalho)
+    
+    # O formato é gravado em cada célula de valor: o formato da coluna só vale
+    # para células novas digitadas no Excel
+    divisao = COLUNAS_PLANILHA.index('Valor_Total')
+    colunas = [_valores_para_planilha(df_resultados[coluna]) for coluna in COLUNAS_PLANILHA]
+    for linha, valores in enumerate(zip(*colunas), start=1):
+        aba.write_row(linha, 0, valores[:divisao])
+        aba.write(linha, divisao, valores[divisao], moeda)
+        aba.write_row(linha, divisao + 1, valores[divisao + 1:])
+    
+    # Planilha de estatísticas
+    aba = livro.add_worksheet('Estatisticas')
+    aba.set_column(0, 1, 20)
+    aba.write_row(0, 0, ['Métrica', 'Valor'], cabecalho)
+    aba.write_row(1, 0, ['Total de Clientes', len(df_resultados)])
+    aba.write_row(2, 0, ['Valor Total', float(df_resultados['Valor_Total'].sum())], moeda)
+    aba.write_row(3, 0, ['Média por Cliente', float(df_resultados['Valor_Total'].mean())], moeda)
+    aba.write_row(4, 0, ['Clientes com PDF', int(df_resultados['PDF_Disponivel'].eq('Sim').sum())])
+    livro.close()
+    
+    if destino is None:
+        excel_buffer.seek(0)
+    return excel_buffer
+
+
+def obter_planilha_excel(execucao, df_resultados):
+    """Caminho da planilha da execução, criada em disco apenas na primeira chamada"""
+    return execucao.obter_arquivo(
+        'Clientes_Unificados.xlsx',
+        lambda arquivo: criar_planilha_excel(df_resultados, arquivo)
+    )
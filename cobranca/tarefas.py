@@ -0,0 +1,184 @@
+"""Processamento em segundo plano, com progresso, cancelamento e retomada
+
+A interface submete o processamento como uma tarefa e apenas consulta o
+andamento a cada rerun, sem bloquear a página. O id da tarefa é o id da
+execução no ``ArmazemExecucoes``: fechar a aba não interrompe a tarefa, e
+uma execução cancelada ou interrompida (servidor reiniciado) é retomada a
+partir do checkpoint gravado a cada grupo unificado. Cada nova tarefa é
+comparada com a última execução concluída com as mesmas opções de
+agrupamento, reaproveitando os PDFs dos grupos inalterados.
+"""
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from cobranca.armazem import CANCELADA, COM_ERRO, CONCLUIDA, EM_ANDAMENTO
+from cobranca.metricas import Metricas
+from cobranca.pipeline import Andamento, ProcessamentoCancelado, processar_dados
+
+# Avisos mantidos por tarefa; os mais antigos são descartados
+MAX_AVISOS = 200
+
+# Tempo que uma tarefa terminada continua consultável no gerenciador
+RETENCAO_TAREFAS_SEGUNDOS = 3600
+
+
+class TarefaProcessamento:
+    """Processamento de uma execução do armazém em uma thread de fundo
+
+    ``opcoes`` são os argumentos simples de ``processar_dados`` (gravados
+    para a retomada) e ``recursos`` os objetos compartilhados, como o cache
+    de PDFs. ``andamento`` traz o progresso e os contadores, ``avisos`` os
+    últimos erros não fatais e ``status`` a situação, com os valores do
+    armazém. ``id_anterior`` é a execução usada no reprocessamento incremental.
+    As ``metricas`` são gravadas no diretório da execução ao final, qualquer
+    que seja o resultado.
+    """
+
+    def __init__(self, armazem, execucao, df_entrada, opcoes, pdfs_reaproveitados=None, recursos=None,
+                 id_anterior=None, metricas=None):
+        self.id = execucao.id
+        self.id_anterior = id_anterior
+        self.armazem = armazem
+        self.execucao = execucao
+        self.andamento = Andamento()
+        self.metricas = metricas or Metricas()
+        self.avisos = deque(maxlen=MAX_AVISOS)
+        self.total_avisos = 0
+        self.status = EM_ANDAMENTO
+        self.erro = None
+        self.terminada_em = None
+        self._argumentos = (df_entrada, opcoes, pdfs_reaproveitados or {}, recursos or {})
+        self._thread = threading.Thread(target=self._executar, name=f'processamento-{self.id}', daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def cancelar(self):
+        """Pede o cancelamento; a tarefa para após os downloads e grupos em andamento"""
+        self.andamento.cancelar()
+
+    @property
+    def ativa(self):
+        return self._thread.is_alive()
+
+    def aguardar(self, timeout=None):
+        self._thread.join(timeout)
+        return not self.ativa
+
+    def _avisar(self, mensagem):
+        self.avisos.append(mensagem)
+        self.total_avisos += 1
+
+    def _carregar_anterior(self):
+        """Assinaturas e PDFs da execução anterior, ou None se ela não está mais disponível"""
+        anterior = self.armazem.abrir(self.id_anterior) if self.id_anterior else None
+        if anterior is None:
+            return None
+        assinaturas = self.armazem.carregar_assinaturas(anterior)
+        if assinaturas is None:
+            return None
+        return {'assinaturas': assinaturas, 'pdfs': self.armazem.carregar_pdfs(anterior)}
+
+    def _executar(self):
+        df_entrada, opcoes, pdfs_reaproveitados, recursos = self._argumentos
+        # A planilha de entrada só fica em memória durante o processamento
+        self._argumentos = None
+        try:
+            execucao_anterior = self._carregar_anterior()
+            resultados, pdfs, stats = processar_dados(
+                df_entrada,
+                **opcoes,
+                **recursos,
+                callback_aviso=self._avisar,
+                diretorio_pdfs=self.execucao.diretorio,
+                andamento=self.andamento,
+                pdfs_reaproveitados=pdfs_reaproveitados,
+                callback_grupo_concluido=partial(self.armazem.registrar_grupo_concluido, self.execucao),
+                execucao_anterior=execucao_anterior,
+                metricas=self.metricas
+            )
+            self.armazem.salvar_resultados(self.execucao, resultados, pdfs, stats)
+            status = CONCLUIDA
+        except ProcessamentoCancelado:
+            self.armazem.marcar(self.id, CANCELADA)
+            status = CANCELADA
+        except Exception as e:
+            self.erro = str(e)
+            self.armazem.marcar(self.id, COM_ERRO, self.erro)
+            status = COM_ERRO
+        self.metricas.encerrar_etapa()
+        try:
+            self.metricas.gravar(self.execucao.diretorio)
+        except OSError:
+            pass
+        # A situação só muda depois de gravada no armazém
+        self.terminada_em = time.monotonic()
+        self.status = status
+
+
+class GerenciadorTarefas:
+    """Tarefas deste processo, por id de execução
+
+    Tarefas terminadas continuam consultáveis por ``RETENCAO_TAREFAS_SEGUNDOS``;
+    depois disso a situação da execução é lida do armazém.
+    """
+
+    def __init__(self, armazem):
+        self.armazem = armazem
+        self._tarefas = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, df_entrada, opcoes, recursos=None, incremental=True, metricas=None):
+        """Registra uma nova execução e inicia o processamento em segundo plano
+
+        Com ``incremental`` a execução é comparada com a última concluída com
+        as mesmas opções de holdings e de otimização dos PDFs. ``metricas`` pode trazer etapas medidas
+        antes do processamento, como a leitura da planilha.
+        """
+        anterior = None
+        if incremental:
+            anterior = self.armazem.ultima_concluida(
+                agrupar_holdings_option=opcoes.get('agrupar_holdings_option'),
+                otimizar_pdfs=bool(opcoes.get('otimizar_pdfs'))
+            )
+        id_anterior = anterior.id if anterior is not None else None
+        execucao = self.armazem.criar(df_entrada, opcoes, id_anterior)
+        with self._lock:
+            return self._registrar(TarefaProcessamento(self.armazem, execucao, df_entrada, opcoes,
+                                                       recursos=recursos, id_anterior=id_anterior, metricas=metricas))
+
+    def retomar(self, id_execucao, recursos=None):
+        """Retoma uma execução não concluída a partir do checkpoint
+
+        Os grupos já unificados são reaproveitados. Retorna a tarefa (a já
+        ativa, se houver) ou None se a execução não pode ser retomada.
+        """
+        with self._lock:
+            tarefa = self._tarefas.get(id_execucao)
+            if tarefa is not None and tarefa.ativa:
+                return tarefa
+            execucao = self.armazem.abrir(id_execucao, apenas_concluida=False)
+            if execucao is None or self.armazem.situacao(id_execucao)[0] == CONCLUIDA:
+                return None
+            df_entrada, opcoes, pdfs_reaproveitados, id_anterior = self.armazem.carregar_checkpoint(execucao)
+            if df_entrada is None:
+                return None
+            self.armazem.marcar(id_execucao, EM_ANDAMENTO)
+            return self._registrar(TarefaProcessamento(self.armazem, execucao, df_entrada, opcoes,
+                                                       pdfs_reaproveitados, recursos, id_anterior))
+
+    def obter(self, id_execucao):
+        """Tarefa deste processo com o id, ou None"""
+        return self._tarefas.get(id_execucao)
+
+    def _registrar(self, tarefa):
+        limite = time.monotonic() - RETENCAO_TAREFAS_SEGUNDOS
+        self._tarefas = {
+            id_tarefa: anterior for id_tarefa, anterior in self._tarefas.items()
+            if anterior.terminada_em is None or anterior.terminada_em > limite
+        }
+        self._tarefas[tarefa.id] = tarefa
+        return tarefa.iniciar()
@@ -0,0 +1,371 @@
+"""Unificação dos PDFs de cada grupo, em série ou em processos paralelos
+
+As funções deste módulo não dependem do Streamlit: erros são retornados em
+listas para que a interface decida como exibi-los. ``unificar_grupo`` fica
+no nível do módulo para poder ser enviada aos processos do pool.
+
+Com ``otimizar`` a unificação ignora as entradas idênticas byte a byte (pelo
+sha256), grava uma única vez os recursos idênticos entre os documentos do
+grupo (fontes e imagens embutidas em cada um) e comprime com Flate os
+streams gravados sem compressão.
+"""
+import hashlib
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject, NullObject, NumberObject, StreamObject
+)
+
+# Tamanho dos blocos lidos ao calcular o hash de um arquivo
+BLOCO_HASH = 1024 * 1024
+
+
+class EscritorPDFIncremental:
+    """Escreve um PDF objeto a objeto, à medida que os documentos são copiados
+
+    Diferente do ``PdfMerger``, que mantém todas as páginas até o ``write``,
+    cada objeto copiado é gravado imediatamente no arquivo de saída. Em
+    memória ficam apenas os offsets da tabela xref e a lista de páginas.
+    Só as páginas (e o que elas referenciam) são copiadas: marcadores
+    (outlines), formulários (AcroForm) e demais entradas do catálogo dos
+    documentos não entram no PDF unificado. Entradas criptografadas são
+    gravadas já decifradas.
+    
+    Com ``otimizar``, streams idênticos (mesmo dicionário, sem referências,
+    e mesmos bytes) são gravados uma única vez e referenciados pelos demais
+    documentos, e os streams sem filtro são comprimidos com Flate. O tempo
+    gasto nisso fica em ``segundos_otimizacao``.
+    """
+    
+    NUM_CATALOGO = 1
+    NUM_PAGINAS = 2
+    
+    def __init__(self, arquivo, otimizar=False):
+        self.arquivo = arquivo
+        self.otimizar = otimizar
+        self.offsets = [None, None, None]
+        self.paginas = []
+        self.recursos = {}
+        self.segundos_otimizacao = 0.0
+        arquivo.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    
+    def _reservar(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+    
+    def _gravar(self, num, objeto):
+        self.offsets[num] = self.arquivo.tell()
+        self.arquivo.write(f"{num} 0 obj\n".encode())
+        objeto.write_to_stream(self.arquivo, None)
+        self.arquivo.write(b"\nendobj\n")
+    
+    def _chave_recurso(self, objeto):
+        """sha256 de um stream sem referências a outros objetos, ou None"""
+        if not isinstance(objeto, StreamObject) or not _sem_referencias(objeto):
+            return None
+        dicionario = BytesIO()
+        DictionaryObject(objeto).write_to_stream(dicionario, None)
+        return hashlib.sha256(dicionario.getvalue() + b'stream' + objeto._data).digest()
+    
+    def _comprimir(self, objeto, copia):
+        """Cópia do stream comprimida com Flate, quando ele não tem filtro e fica menor"""
+        if '/Filter' in objeto or objeto.get('/Type') == '/Metadata':
+            return copia
+        dados = zlib.compress(objeto._data)
+        if len(dados) >= len(objeto._data):
+            return copia
+        comprimido = EncodedStreamObject()
+        comprimido._data = dados
+        comprimido.update(copia)
+        comprimido[NameObject('/Filter')] = NameObject('/FlateDecode')
+        return comprimido
+    
+    def adicionar_documento(self, leitor):
+        """Copia todas as páginas do leitor, gravando os objetos no arquivo"""
+        mapa = {}
+        pendentes = []
+        
+        def referencia(ref):
+            chave = (ref.idnum, ref.generation)
+            if chave not in mapa:
+                recurso = None
+                if self.otimizar:
+                    inicio = time.perf_counter()
+                    recurso = self._chave_recurso(ref.get_object())
+                    self.segundos_otimizacao += time.perf_counter() - inicio
+                if recurso in self.recursos:
+                    # Recurso idêntico já gravado por outro documento
+                    mapa[chave] = self.recursos[recurso]
+                else:
+                    mapa[chave] = self._reservar()
+                    pendentes.append((mapa[chave], ref))
+                    if recurso is not None:
+                        self.recursos[recurso] = mapa[chave]
+            return IndirectObject(mapa[chave], 0, None)
+        
+        def copiar(objeto):
+            if isinstance(objeto, IndirectObject):
+                return referencia(objeto)
+            if isinstance(objeto, StreamObject):
+                copia = objeto.__class__()
+                copia._data = objeto._data
+                copia.update({k: copiar(v) for k, v in objeto.items()})
+                if self.otimizar:
+                    inicio = time.perf_counter()
+                    copia = self._comprimir(objeto, copia)
+                    self.segundos_otimizacao += time.perf_counter() - inicio
+                return copia
+            if isinstance(objeto, DictionaryObject):
+                copia = DictionaryObject()
+                copia.update({k: copiar(v) for k, v in objeto.items()})
+                return copia
+            if isinstance(objeto, ArrayObject):
+                return ArrayObject(copiar(v) for v in objeto)
+            return objeto
+        
+        # Páginas primeiro, para que referências entre páginas apontem para as cópias
+        paginas = leitor.pages
+        nums_paginas = []
+        for pagina in paginas:
+            ref = pagina.indirect_ref
+            num = self._reservar()
+            if ref is not None:
+                mapa[(ref.idnum, ref.generation)] = num
+            nums_paginas.append(num)
+        
+        for num, pagina in zip(nums_paginas, paginas):
+            copia = copiar(DictionaryObject({k: v for k, v in pagina.items() if k != '/Parent'}))
+            copia[NameObject('/Parent')] = IndirectObject(self.NUM_PAGINAS, 0, None)
+            self._gravar(num, copia)
+            while pendentes:
+                num_objeto, ref = pendentes.pop()
+                objeto = ref.get_object()
+                self._gravar(num_objeto, NullObject() if objeto is None else copiar(objeto))
+        
+        self.paginas.extend(nums_paginas)
+    
+    def finalizar(self):
+        """Grava a árvore de páginas, o catálogo e a tabela xref"""
+        arvore = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(IndirectObject(n, 0, None) for n in self.paginas),
+            NameObject('/Count'): NumberObject(len(self.paginas))
+        })
+        self._gravar(self.NUM_PAGINAS, arvore)
+        catalogo = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self.NUM_PAGINAS, 0, None)
+        })
+        self._gravar(self.NUM_CATALOGO, catalogo)
+        
+        inicio_xref = self.arquivo.tell()
+        self.arquivo.write(f"xref\n0 {len(self.offsets)}\n".encode())
+        self.arquivo.write(b"0000000000 65535 f \n")
+        for offset in self.offsets[1:]:
+            if offset is None:
+                self.arquivo.write(b"0000000000 00000 f \n")
+            else:
+                self.arquivo.write(f"{offset:010d} 00000 n \n".encode())
+        self.arquivo.write(
+            f"trailer\n<< /Size {len(self.offsets)} /Root {self.NUM_CATALOGO} 0 R >>\n"
+            f"startxref\n{inicio_xref}\n%%EOF\n".encode()
+        )
+
+
+def _sem_referencias(objeto):
+    if isinstance(objeto, IndirectObject):
+        return False
+    if isinstance(objeto, DictionaryObject):
+        return all(_sem_referencias(valor) for valor in objeto.values())
+    if isinstance(objeto, ArrayObject):
+        return all(_sem_referencias(valor) for valor in objeto)
+    return True
+
+
+def _eh_caminho(fonte):
+    return isinstance(fonte, (str, os.PathLike))
+
+
+def _tamanho(fonte):
+    if _eh_caminho(fonte):
+        return os.path.getsize(fonte)
+    with fonte.getbuffer() as dados:
+        return dados.nbytes
+
+
+def _hash_conteudo(fonte):
+    """sha256 do conteúdo de um caminho de arquivo ou ``BytesIO``"""
+    resumo = hashlib.sha256()
+    if _eh_caminho(fonte):
+        with open(fonte, 'rb') as f:
+            for bloco in iter(lambda: f.read(BLOCO_HASH), b''):
+                resumo.update(bloco)
+    else:
+        with fonte.getbuffer() as dados:
+            resumo.update(dados)
+    return resumo.digest()
+
+
+def remover_duplicados(fontes):
+    """Fontes sem as repetições idênticas byte a byte (fica a primeira de cada)"""
+    vistos = set()
+    unicas = []
+    for fonte in fontes:
+        chave = _hash_conteudo(fonte)
+        if chave not in vistos:
+            vistos.add(chave)
+            unicas.append(fonte)
+    return unicas
+
+
+def _unificar_pdfmerger(fontes, output_path):
+    """Unifica com o PdfMerger, que mantém o grupo inteiro em memória"""
+    merger = PyPDF2.PdfMerger()
+    pdfs_adicionados = 0
+    erros = []
+    
+    for fonte in fontes:
+        try:
+            merger.append(fonte)
+            pdfs_adicionados += 1
+        except Exception as e:
+            erros.append(f"Erro ao processar PDF: {e}")
+            continue
+    
+    if pdfs_adicionados > 0:
+        with open(output_path, 'wb') as output_file:
+            merger.write(output_file)
+    merger.close()
+    return pdfs_adicionados > 0, erros
+
+
+def _unificar_incremental(fontes, output_path, memoria_max_bytes=None, otimizar=False):
+    """Unifica PDFs com uso de memória limitado
+
+    Os documentos são copiados um a um pelo ``EscritorPDFIncremental`` e
+    descartados antes do próximo, então o pico de memória depende do maior
+    documento e não da quantidade. Arquivos até ``memoria_max_bytes`` (ou
+    todos, sem limite) são lidos de uma vez para a memória (análise mais
+    rápida); os maiores são analisados diretamente a partir do arquivo em
+    disco. Retorna (sucesso, erros, segundos de otimização).
+    """
+    pdfs_adicionados = 0
+    erros = []
+    with open(output_path, 'wb') as output_file:
+        escritor = EscritorPDFIncremental(output_file, otimizar)
+        for fonte in fontes:
+            try:
+                if not _eh_caminho(fonte):
+                    escritor.adicionar_documento(PyPDF2.PdfReader(fonte))
+                else:
+                    with open(fonte, 'rb') as f:
+                        if memoria_max_bytes is None or os.path.getsize(fonte) <= memoria_max_bytes:
+                            leitor = PyPDF2.PdfReader(BytesIO(f.read()))
+                        else:
+                            leitor = PyPDF2.PdfReader(f)
+                        escritor.adicionar_documento(leitor)
+                pdfs_adicionados += 1
+            except Exception as e:
+                erros.append(f"Erro ao processar PDF: {e}")
+                continue
+        if pdfs_adicionados > 0:
+            escritor.finalizar()
+    
+    if pdfs_adicionados == 0:
+        os.remove(output_path)
+    return pdfs_adicionados > 0, erros, escritor.segundos_otimizacao
+
+
+def unificar_pdfs(fontes, output_path, memoria_max_bytes=None, otimizar=False):
+    """Unifica múltiplos PDFs em um único arquivo
+
+    ``fontes`` pode conter ``BytesIO`` ou caminhos de arquivo. Com
+    ``memoria_max_bytes`` a unificação é incremental e as fontes devem ser
+    caminhos. Com ``otimizar`` as entradas duplicadas são ignoradas e a
+    unificação é incremental, compartilhando os recursos idênticos.
+    
+    Retorna (sucesso, erros, relatorio), com 'bytes_entrada', 'bytes_saida',
+    'duplicados' (entradas ignoradas) e 'segundos_otimizacao' no relatório.
+    """
+    relatorio = {'bytes_entrada': sum(_tamanho(fonte) for fonte in fontes), 'bytes_saida': 0,
+                 'duplicados': 0, 'segundos_otimizacao': 0.0}
+    if not fontes:
+        return False, [], relatorio
+    if otimizar:
+        inicio = time.perf_counter()
+        unicas = remover_duplicados(fontes)
+        relatorio['duplicados'] = len(fontes) - len(unicas)
+        relatorio['segundos_otimizacao'] = time.perf_counter() - inicio
+        sucesso, erros, segundos = _unificar_incremental(unicas, output_path, memoria_max_bytes, otimizar=True)
+        relatorio['segundos_otimizacao'] += segundos
+    elif memoria_max_bytes:
+        sucesso, erros, _ = _unificar_incremental(fontes, output_path, memoria_max_bytes)
+    else:
+        sucesso, erros = _unificar_pdfmerger(fontes, output_path)
+    if sucesso:
+        relatorio['bytes_saida'] = os.path.getsize(output_path)
+    return sucesso, erros, relatorio
+
+
+def unificar_grupo(tarefa):
+    """Unifica um grupo a partir de (grupo_id, caminhos, output_path, memoria_max_bytes, otimizar)
+
+    Retorna (grupo_id, sucesso, erros, segundos, relatorio), com o relatório
+    de ``unificar_pdfs``. Recebe apenas caminhos de arquivo, para que nada
+    além de texto seja serializado entre processos.
+    """
+    grupo_id, caminhos, output_path, memoria_max_bytes, otimizar = tarefa
+    inicio = time.perf_counter()
+    sucesso, erros, relatorio = unificar_pdfs(caminhos, output_path, memoria_max_bytes, otimizar)
+    return grupo_id, sucesso, erros, time.perf_counter() - inicio, relatorio
+
+
+def unificar_grupos(tarefas, processos=1, callback_progresso=None, callback_grupo=None, cancelamento=None,
+                    metricas=None):
+    """Unifica os PDFs de vários grupos, em paralelo quando ``processos`` > 1
+
+    As tarefas seguem o formato de ``unificar_grupo``. Retorna um dicionário
+    grupo_id -> (sucesso, erros). ``callback_grupo(grupo_id, sucesso, erros)``
+    é chamado assim que cada grupo termina. Quando o evento ``cancelamento``
+    é acionado, os grupos ainda não iniciados são descartados e ficam fora
+    do resultado. ``metricas`` (``Metricas``) recebe a duração, os bytes de
+    entrada e de saída e o tempo de otimização de cada grupo.
+    O pool usa o método 'spawn', pois fazer fork do servidor do Streamlit
+    (com várias threads) não é seguro.
+    """
+    resultados = {}
+    if not tarefas:
+        return resultados
+    
+    def concluir(grupo_id, sucesso, erros, segundos, relatorio):
+        resultados[grupo_id] = (sucesso, erros)
+        if metricas is not None:
+            metricas.registrar_unificacao(grupo_id, segundos, relatorio)
+        if callback_grupo:
+            callback_grupo(grupo_id, sucesso, erros)
+        if callback_progresso:
+            callback_progresso(len(resultados), len(tarefas))
+    
+    if processos <= 1 or len(tarefas) == 1:
+        for tarefa in tarefas:
+            if cancelamento is not None and cancelamento.is_set():
+                break
+            concluir(*unificar_grupo(tarefa))
+        return resultados
+    
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processos, len(tarefas)), mp_context=contexto) as executor:
+        futuros = [executor.submit(unificar_grupo, tarefa) for tarefa in tarefas]
+        for futuro in as_completed(futuros):
+            concluir(*futuro.result())
+            if cancelamento is not None and cancelamento.is_set():
+                for pendente in futuros:
+                    pendente.cancel()
+                break
+    return resultados
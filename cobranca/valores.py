@@ -0,0 +1,120 @@
+"""Conversão de valores monetários no formato brasileiro"""
+import numpy as np
+import pandas as pd
+
+# Troca os separadores do formato americano pelos do brasileiro
+_TROCA_SEPARADORES = str.maketrans({',': '.', '.': ','})
+# Caracteres aceitos antes ou depois do número: prefixo, sinal, parênteses e espaços
+_BORDAS = 'R$-+() \t\xa0'
+
+
+def _matriz_codigos(textos):
+    """Matriz de code points (uma linha por texto, completada com zeros)"""
+    textos = np.ascontiguousarray(textos)
+    largura = max(textos.dtype.itemsize // 4, 1)
+    if not len(textos):
+        return np.zeros((0, largura), dtype=np.uint32)
+    return textos.view(np.uint32).reshape(len(textos), largura)
+
+
+def _inteiro_valido(inteiro):
+    """Valida a parte inteira: só dígitos, ou pontos de milhar nas posições certas
+
+    Trabalha sobre a matriz de code points (uma linha por texto), então a
+    verificação é feita por operações do numpy, sem laço em Python.
+    """
+    codigos = _matriz_codigos(inteiro)
+    comprimento = np.strings.str_len(inteiro)[:, None]
+    posicao = np.arange(codigos.shape[1])[None, :]
+    
+    dentro = posicao < comprimento
+    ponto = codigos == ord('.')
+    digito = (codigos >= ord('0')) & (codigos <= ord('9'))
+    tem_ponto = ponto.any(axis=1)
+    
+    # "1.234.567": pontos a cada 4 posições contadas a partir do fim
+    ponto_esperado = tem_ponto[:, None] & (posicao > 0) & ((comprimento - posicao) % 4 == 0)
+    correto = np.where(ponto_esperado, ponto, digito) | ~dentro
+    return correto.all(axis=1) & (comprimento[:, 0] > 0) & ~(tem_ponto & (comprimento[:, 0] % 4 == 0))
+
+
+def _converter_textos(textos):
+    """Converte um array de textos distintos, retornando floats (NaN se inválido)"""
+    textos = np.strings.strip(np.asarray(textos, dtype=str))
+    corpo = np.strings.strip(textos, _BORDAS)
+    
+    # Negativo com "-" antes ou depois do número, ou entre parênteses
+    menos = np.strings.count(textos, '-')
+    parenteses = np.strings.startswith(textos, '(') & np.strings.endswith(textos, ')')
+    negativo = (menos == 1) | parenteses
+    bordas_ok = (
+        (menos <= 1) &
+        (np.strings.count(textos, '(') == parenteses) &
+        (np.strings.count(textos, ')') == parenteses) &
+        (np.strings.count(textos, 'R$') <= 1)
+    )
+    
+    inteiro, virgula, fracao = np.strings.partition(corpo, ',')
+    tem_virgula = virgula != ''
+    fracao_ok = ~tem_virgula | ((np.strings.str_len(fracao) > 0) & np.strings.isdigit(fracao))
+    formato_brl = bordas_ok & fracao_ok & _inteiro_valido(inteiro)
+    
+    # Sem vírgula e fora do formato de milhar: ponto como decimal ("1.5")
+    antes, ponto, depois = np.strings.partition(corpo, '.')
+    ponto_decimal = (
+        bordas_ok & ~tem_virgula & ~formato_brl & (ponto != '') &
+        np.strings.isdigit(antes) & np.strings.isdigit(depois)
+    )
+    
+    numeros = np.full(len(textos), np.nan)
+    digitos = np.strings.add(np.strings.add(np.strings.replace(inteiro, '.', ''), '.'), fracao)
+    numeros[formato_brl] = digitos[formato_brl].astype(float)
+    numeros[ponto_decimal] = corpo[ponto_decimal].astype(float)
+    return np.where(negativo, -numeros, numeros)
+
+
+def converter_valores_brl(valores):
+    """Converte uma coluna de valores em reais para float, de forma vetorizada
+
+    Aceita células já numéricas e textos como "R$ 1.234,56", "1234,56",
+    "-R$ 10,00", "R$ -10,00", "(10,00)", "10,00-" e "1.234". Pontos são
+    de milhar ("1.234" -> 1234), exceto quando não seguem esse formato e o
+    texto não tem vírgula ("1.5" -> 1.5). Cada valor distinto é convertido
+    uma única vez.
+
+    Retorna (valores, invalidos): a série convertida (NaN onde não foi
+    possível converter) e uma máscara com as células preenchidas que não
+    puderam ser convertidas.
+    """
+    valores = pd.Series(valores)
+    if pd.api.types.is_numeric_dtype(valores):
+        return valores.astype(float), pd.Series(False, index=valores.index)
+    
+    codigos, distintos = pd.factorize(valores)
+    distintos = np.asarray(distintos, dtype=object)
+    if pd.api.types.infer_dtype(distintos, skipna=True) == 'string':
+        eh_texto = np.ones(len(distintos), dtype=bool)
+    else:
+        eh_texto = (pd.Series(distintos, dtype=object).map(type) == str).to_numpy()
+    
+    convertidos = np.full(len(distintos), np.nan)
+    convertidos[~eh_texto] = pd.to_numeric(pd.Series(distintos[~eh_texto], dtype=object), errors='coerce')
+    em_branco = np.zeros(len(distintos), dtype=bool)
+    if eh_texto.any():
+        textos = distintos[eh_texto].astype(str)
+        convertidos[eh_texto] = _converter_textos(textos)
+        em_branco[eh_texto] = np.strings.strip(textos) == ''
+    
+    # Código -1 indica célula vazia (NaN/None)
+    convertidos = np.append(convertidos, np.nan)
+    invalidos = np.append(np.isnan(convertidos[:-1]) & ~em_branco, False)
+    return (
+        pd.Series(convertidos[codigos], index=valores.index, name=valores.name),
+        pd.Series(invalidos[codigos], index=valores.index, name=valores.name)
+    )
+
+
+def formatar_valores_brl(valores):
+    """Formata valores como texto em reais ("R$ 1.234,56")"""
+    texto = pd.Series(valores).map('{:,.2f}'.format)
+    return 'R$ ' + texto.str.translate(_TROCA_SEPARADORES)
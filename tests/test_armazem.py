@@ -0,0 +1,18 @@
+"""Testes do armazém de execuções"""
+
+import os
+import tempfile
+
+import pandas as pd
+
+from cobranca.armazem import _gravar_parquet
+
+
+def test_parquet_mantem_vazios_como_nulos():
+    df = pd.DataFrame({'Misto': pd.Series(['texto', None, 3], dtype=object), 'Numero': [1, 2, 3]})
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'resultados.parquet')
+        _gravar_parquet(df, caminho)
+        lido = pd.read_parquet(caminho)
+    assert lido['Misto'].isna().tolist() == [False, True, False]
+    assert lido['Misto'].dropna().tolist() == ['texto', '3']
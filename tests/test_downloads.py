@@ -0,0 +1,204 @@
+"""Testes dos downloads concorrentes compartilhados entre execuções"""
+
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from cobranca.downloads import (
+    AgendadorDownloads, CachePDF, DownloadsEmAndamento, RelatorioFalhas, baixar_pdfs_concorrente
+)
+from cobranca.metricas import Metricas
+
+PDF = b'%PDF-1.4\n% teste\n%%EOF\n'
+
+
+class _TratadorLento(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requisicoes += 1
+            status = self.server.status.pop(0) if self.server.status else 200
+        time.sleep(self.server.latencia)
+        if status != 200:
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+def _servidor(latencia, status=()):
+    """Servidor local que responde com ``status`` (em ordem) e depois sempre com o PDF"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _TratadorLento)
+    servidor.daemon_threads = True
+    servidor.latencia = latencia
+    servidor.requisicoes = 0
+    servidor.status = list(status)
+    servidor.lock = threading.Lock()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _em_paralelo(*execucoes, intervalo=0):
+    """Executa as funções ao mesmo tempo e retorna os resultados (ou exceções)
+
+    Com ``intervalo`` cada função começa esse tanto de segundos depois da anterior.
+    """
+    resultados = [None] * len(execucoes)
+    inicio = threading.Barrier(len(execucoes))
+
+    def rodar(i, funcao):
+        inicio.wait()
+        time.sleep(i * intervalo)
+        try:
+            resultados[i] = funcao()
+        except Exception as e:
+            resultados[i] = e
+
+    threads = [threading.Thread(target=rodar, args=(i, f)) for i, f in enumerate(execucoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def test_spool_e_memoria_simultaneos_na_mesma_url():
+    servidor = _servidor(latencia=0.5)
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/boleto.pdf'
+    em_andamento = DownloadsEmAndamento()
+    try:
+        with tempfile.TemporaryDirectory() as spool:
+            em_spool, em_memoria = _em_paralelo(
+                lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento, diretorio_spool=spool),
+                lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento),
+            )
+            assert not isinstance(em_spool, Exception), em_spool
+            assert not isinstance(em_memoria, Exception), em_memoria
+            (caminho,), _ = em_spool
+            (arquivo,), _ = em_memoria
+            assert os.path.dirname(caminho) == spool
+            with open(caminho, 'rb') as f:
+                assert f.read() == PDF
+            assert isinstance(arquivo, BytesIO)
+            assert arquivo.getvalue() == PDF
+        assert servidor.requisicoes == 1
+    finally:
+        servidor.shutdown()
+
+
+def test_spool_proprio_de_cada_execucao():
+    servidor = _servidor(latencia=0.5)
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/boleto.pdf'
+    em_andamento = DownloadsEmAndamento()
+    try:
+        with tempfile.TemporaryDirectory() as spool_a, tempfile.TemporaryDirectory() as spool_b:
+            resultado_a, resultado_b = _em_paralelo(
+                lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento, diretorio_spool=spool_a),
+                lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento, diretorio_spool=spool_b),
+            )
+            (caminho_a,), _ = resultado_a
+            (caminho_b,), _ = resultado_b
+            assert os.path.dirname(caminho_a) == spool_a
+            assert os.path.dirname(caminho_b) == spool_b
+            assert os.path.exists(caminho_a) and os.path.exists(caminho_b)
+    finally:
+        servidor.shutdown()
+
+
+def test_falha_de_outra_execucao_nao_afeta_quem_aguardava():
+    servidor = _servidor(latencia=0.5, status=[503])
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/boleto.pdf'
+    em_andamento = DownloadsEmAndamento()
+    falhas_a, falhas_b = RelatorioFalhas(), RelatorioFalhas()
+    metricas_b = Metricas()
+    try:
+        resultado_a, resultado_b = _em_paralelo(
+            lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento, relatorio_falhas=falhas_a,
+                                            agendador=AgendadorDownloads(tentativas=1)),
+            lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento, relatorio_falhas=falhas_b,
+                                            metricas=metricas_b),
+            intervalo=0.1,
+        )
+        (arquivo_a,), _ = resultado_a
+        (arquivo_b,), _ = resultado_b
+        assert arquivo_a is None and falhas_a.total == 1
+        assert arquivo_b.getvalue() == PDF and falhas_b.total == 0
+        assert metricas_b.downloads
+    finally:
+        servidor.shutdown()
+
+
+def test_cancelamento_de_quem_aguardava_nao_afeta_a_outra_execucao():
+    servidor = _servidor(latencia=1.5)
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/boleto.pdf'
+    em_andamento = DownloadsEmAndamento()
+    cancelamento = threading.Event()
+    threading.Timer(0.4, cancelamento.set).start()
+    inicio = time.perf_counter()
+    try:
+        resultado_a, (resultado_b, segundos_b) = _em_paralelo(
+            lambda: baixar_pdfs_concorrente([url], em_andamento=em_andamento),
+            lambda: (baixar_pdfs_concorrente([url], em_andamento=em_andamento, cancelamento=cancelamento),
+                     time.perf_counter() - inicio),
+            intervalo=0.1,
+        )
+        (arquivo_a,), _ = resultado_a
+        (arquivo_b,), origens_b = resultado_b
+        assert arquivo_a.getvalue() == PDF
+        assert arquivo_b is None and origens_b['duplicados_evitados'] == 0
+        assert segundos_b < 1.0
+    finally:
+        servidor.shutdown()
+
+
+def _objetos(cache):
+    return sorted(os.listdir(cache.diretorio_objetos))
+
+
+def test_cache_remove_as_menos_usadas_e_mantem_objetos_compartilhados():
+    with tempfile.TemporaryDirectory() as diretorio:
+        cache = CachePDF(diretorio, tamanho_max_bytes=250)
+        cache.guardar('a', b'a' * 100)
+        cache.guardar('b', b'b' * 100)
+        cache.guardar('a2', b'a' * 100)  # mesmo conteúdo de 'a': não conta de novo
+        assert cache._bytes_total == 200
+        assert cache.ler('a') == b'a' * 100  # 'b' passa a ser a menos usada
+        cache.guardar('c', b'c' * 100)
+        assert list(cache.indice) == ['a2', 'a', 'c']
+        assert cache._bytes_total == 200 and len(_objetos(cache)) == 2
+
+
+def test_cache_substitui_conteudo_da_url():
+    with tempfile.TemporaryDirectory() as diretorio:
+        cache = CachePDF(diretorio)
+        cache.guardar('a', b'antigo')
+        cache.guardar('a', b'antigo')
+        assert cache._bytes_total == 6 and len(_objetos(cache)) == 1
+        cache.guardar('a', b'conteudo novo')
+        assert cache.ler('a') == b'conteudo novo'
+        assert cache._bytes_total == 13 and len(_objetos(cache)) == 1
+
+
+def test_cache_recarregado_do_disco_mantem_ordem_e_total():
+    with tempfile.TemporaryDirectory() as diretorio:
+        cache = CachePDF(diretorio)
+        for url in ('a', 'b', 'c'):
+            cache.guardar(url, url.encode() * 10)
+            time.sleep(0.01)
+        cache.ler('a')
+        cache.salvar()
+        recarregado = CachePDF(diretorio, tamanho_max_bytes=20)
+        assert list(recarregado.indice) == ['b', 'c', 'a']
+        assert recarregado._bytes_total == 30
+        recarregado.salvar()
+        assert list(recarregado.indice) == ['c', 'a']
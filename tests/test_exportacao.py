@@ -0,0 +1,17 @@
+"""Testes dos formatos de exportação"""
+
+from io import BytesIO
+
+import pandas as pd
+
+from cobranca.exportacao import exportar
+
+
+def test_parquet_mantem_vazios_como_nulos():
+    df = pd.DataFrame({'Misto': pd.Series(['texto', None, 3], dtype=object), 'Numero': [1, 2, 3]})
+    arquivo = BytesIO()
+    exportar(df, 'parquet', arquivo)
+    arquivo.seek(0)
+    lido = pd.read_parquet(arquivo)
+    assert lido['Misto'].isna().tolist() == [False, True, False]
+    assert lido['Misto'].dropna().tolist() == ['texto', '3']
@@ -0,0 +1,61 @@
+"""Testes da identificação de holdings"""
+
+import numpy as np
+import pandas as pd
+
+from cobranca.holdings import componentes_conexos, identificar_holdings
+
+
+def test_componentes_conexos_em_cadeia_e_isolados():
+    # 0-1, 1-2 e 3-4 ligados; 5 isolado
+    rotulo = componentes_conexos(np.array([0, 2, 4]), np.array([1, 1, 3]), 6)
+    assert rotulo.tolist() == [0, 0, 0, 3, 3, 5]
+
+
+def test_componentes_conexos_sem_arestas():
+    rotulo = componentes_conexos(np.array([], dtype=int), np.array([], dtype=int), 3)
+    assert rotulo.tolist() == [0, 1, 2]
+
+
+def test_componentes_conexos_rotulo_e_o_menor_no():
+    # Caminho longo ligado na ordem inversa: todos convergem para o menor nó
+    origem = np.arange(9, 0, -1)
+    rotulo = componentes_conexos(origem, origem - 1, 10)
+    assert (rotulo == 0).all()
+
+
+def test_holding_transitiva_por_telefone():
+    # A e B dividem tel1, B e C dividem tel2: A, B e C formam uma holding
+    cnpjs = pd.Series(['A', 'B', 'B', 'C', 'D'])
+    telefones = pd.Series(['tel1', 'tel1', 'tel2', 'tel2', 'tel3'])
+    holdings = identificar_holdings(cnpjs, telefones)
+    assert holdings.loc[['A', 'B', 'C'], 'Holding_ID'].tolist() == ['H-A'] * 3
+    assert holdings.loc['D', 'Holding_ID'] == 'H-D'
+
+
+def test_telefone_principal_so_em_holdings_com_varios_cnpjs():
+    cnpjs = pd.Series(['A', 'B', 'C', 'C', 'D', 'D'])
+    telefones = pd.Series(['tel1', 'tel1', 'tel1', 'tel2', 'tel3', 'tel4'])
+    holdings = identificar_holdings(cnpjs, telefones)
+    # tel1 liga três CNPJs: é o principal de toda a holding
+    assert holdings.loc[['A', 'B', 'C'], 'Telefone_Principal'].tolist() == ['tel1'] * 3
+    # D tem dois telefones, mas é um CNPJ só: não é holding
+    assert pd.isna(holdings.loc['D', 'Telefone_Principal'])
+
+
+def test_empate_no_telefone_principal_fica_com_o_menor():
+    holdings = identificar_holdings(pd.Series(['A', 'B', 'A', 'B']), pd.Series(['tel2', 'tel2', 'tel1', 'tel1']))
+    assert holdings['Telefone_Principal'].tolist() == ['tel1', 'tel1']
+
+
+def test_cnpj_isolado_e_telefone_vazio():
+    cnpjs = pd.Series(['A', 'B', 'C'])
+    telefones = pd.Series(['tel1', None, 'tel1'])
+    holdings = identificar_holdings(cnpjs, telefones)
+    assert 'B' not in holdings.index
+    assert holdings.loc[['A', 'C'], 'Holding_ID'].tolist() == ['H-A', 'H-A']
+
+
+def test_telefones_numericos_e_texto_sao_o_mesmo():
+    holdings = identificar_holdings(pd.Series(['A', 'B']), pd.Series([11911110001, '11911110001'], dtype=object))
+    assert holdings['Holding_ID'].tolist() == ['H-A', 'H-A']
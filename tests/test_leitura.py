@@ -0,0 +1,36 @@
+"""Testes da leitura da planilha"""
+
+import os
+import tempfile
+
+import pandas as pd
+import pytest
+
+from cobranca.downloads import link_valido
+from cobranca.leitura import ler_planilha
+
+
+@pytest.mark.parametrize('motor', ['streaming', 'openpyxl'])
+def test_celulas_vazias_continuam_ausentes(motor):
+    df = pd.DataFrame({
+        'ID Emp.': [1, 2],
+        'Razão Social': ['Alfa Ltda', 'Beta SA'],
+        'CPF/CNPJ': ['00000000000101', None],
+        'Vencimento': pd.to_datetime(['2024-01-10', '2024-01-11']),
+        'Valor': ['1,00', '2,00'],
+        'Valor Líquido': [None, None],
+        'Boleto PDF': ['http://exemplo/1.pdf', None],
+        'Nfse PDF': [None, None],
+        'Faturamento PDF': [None, None],
+        'Funcionários PDF': [None, None],
+        'Nosso Núm.': ['011911110001', '011922220002']
+    })
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'contas.xlsx')
+        df.to_excel(caminho, index=False, startrow=1)
+        lido = ler_planilha(caminho, motor=motor)
+    assert lido['Boleto PDF'].isna().tolist() == [False, True]
+    assert lido['Nfse PDF'].isna().all()
+    assert lido['CPF/CNPJ'].isna().tolist() == [False, True]
+    assert [link_valido(url) for url in lido['Boleto PDF']] == [True, False]
+    assert lido['Nosso Núm.'].tolist() == ['011911110001', '011922220002']
@@ -0,0 +1,155 @@
+"""Testes das assinaturas dos grupos e do reaproveitamento de PDFs entre execuções"""
+
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pandas as pd
+import PyPDF2
+
+from cobranca.pipeline import assinaturas_dos_grupos, comparar_assinaturas, processar_dados
+
+
+def _pdf(paginas=1):
+    escritor = PyPDF2.PdfWriter()
+    for _ in range(paginas):
+        escritor.add_blank_page(595, 842)
+    buffer = BytesIO()
+    escritor.write(buffer)
+    return buffer.getvalue()
+
+
+class _TratadorPDFs(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path in self.server.falhar:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(self.server.pdf)))
+        self.end_headers()
+        self.wfile.write(self.server.pdf)
+
+    def log_message(self, *args):
+        pass
+
+
+def _servidor():
+    """Servidor local de PDFs; os caminhos em ``servidor.falhar`` respondem 503"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _TratadorPDFs)
+    servidor.daemon_threads = True
+    servidor.pdf = _pdf()
+    servidor.falhar = set()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _contas(base=None):
+    """Export com três clientes de duas contas cada; cada conta tem um boleto próprio"""
+    linhas = 6
+    return pd.DataFrame({
+        'ID Emp.': [1, 1, 2, 2, 3, 3],
+        'Razão Social': ['Alfa Ltda', 'Alfa Ltda', 'Beta SA', 'Beta SA', 'Gama ME', 'Gama ME'],
+        'CPF/CNPJ': ['00000000000101', '00000000000101', '00000000000202', '00000000000202',
+                     '00000000000303', '00000000000303'],
+        'Vencimento': pd.to_datetime(['2024-01-10'] * linhas),
+        'Valor': ['1.000,00', '250,50', '99,90', '10,00', '5.000,00', '1,00'],
+        'Valor Líquido': [None] * linhas,
+        'Boleto PDF': [f'{base}/boleto/{i}.pdf' for i in range(linhas)] if base else [None] * linhas,
+        'Nfse PDF': [None] * linhas,
+        'Faturamento PDF': [None] * linhas,
+        'Funcionários PDF': [None] * linhas,
+        'Nosso Núm.': ['11911110001', '11911110001', '11922220002', '11922220002', '11933330003', '11933330003']
+    })
+
+
+def _assinaturas(df_export):
+    _, _, stats = processar_dados(df_export, baixar_pdfs_option=False)
+    return stats['assinaturas']
+
+
+def _paginas(caminho):
+    return len(PyPDF2.PdfReader(caminho).pages)
+
+
+def test_grupos_inalterados_e_alterados():
+    anteriores = _assinaturas(_contas())
+    df_export = _contas()
+    df_export.loc[2, 'Valor'] = '100,00'
+    inalterados, resumo = comparar_assinaturas(_assinaturas(df_export), anteriores)
+    assert resumo == {'adicionados': 0, 'alterados': 1, 'removidos': 0, 'reaproveitados': 2}
+    assert len(inalterados) == 2
+
+
+def test_grupo_novo_e_removido():
+    anteriores = _assinaturas(_contas())
+    df_export = _contas()
+    df_export.loc[[4, 5], 'CPF/CNPJ'] = '00000000000404'
+    _, resumo = comparar_assinaturas(_assinaturas(df_export), anteriores)
+    assert resumo == {'adicionados': 1, 'alterados': 0, 'removidos': 1, 'reaproveitados': 2}
+
+
+def test_ordem_das_linhas_muda_a_assinatura():
+    df = pd.DataFrame({
+        'Grupo': ['a', 'a', 'b'],
+        'ID_Cliente': [1, 1, 2],
+        'Razao_Social': ['X', 'X', 'Y'],
+        'CNPJ': ['1', '1', '2'],
+        'Telefone_Contato': ['9', '9', '8'],
+        'Data_Vencimento': pd.to_datetime(['2024-01-01'] * 3),
+        'Valor_Atualizado': [1.0, 2.0, 3.0],
+        'Link_Boleto': ['u1', 'u2', 'u3'],
+        'Link_NFSe': [None] * 3,
+        'Link_Faturamento': [None] * 3,
+        'Link_Funcionarios': [None] * 3
+    })
+    invertido = df.iloc[[1, 0, 2]].reset_index(drop=True)
+    original, trocado = assinaturas_dos_grupos(df, ['Grupo']), assinaturas_dos_grupos(invertido, ['Grupo'])
+    assert original[0] != trocado[0]
+    assert original[1] == trocado[1]
+    # Outra posição no DataFrame, mesma ordem dentro do grupo: mesma assinatura
+    assert (assinaturas_dos_grupos(df.iloc[[2, 0, 1]], ['Grupo']) == original).all()
+
+
+def test_grupo_com_download_falho_e_refeito_na_execucao_seguinte():
+    servidor = _servidor()
+    df_export = _contas(f'http://127.0.0.1:{servidor.server_address[1]}')
+    try:
+        with tempfile.TemporaryDirectory() as diretorio_1, tempfile.TemporaryDirectory() as diretorio_2:
+            servidor.falhar = {'/boleto/2.pdf'}
+            _, pdfs_1, stats_1 = processar_dados(df_export, diretorio_pdfs=diretorio_1, tentativas_download=1)
+            assert stats_1['falhas_download']
+            assert len(stats_1['assinaturas']) == 2
+            assert len(pdfs_1) == 3
+
+            servidor.falhar = set()
+            anterior = {'assinaturas': stats_1['assinaturas'], 'pdfs': pdfs_1}
+            resultados, pdfs_2, stats_2 = processar_dados(
+                df_export, diretorio_pdfs=diretorio_2, execucao_anterior=anterior
+            )
+            assert stats_2['reprocessamento']['reaproveitados'] == 2
+            assert len(stats_2['assinaturas']) == 3
+            assert all(_paginas(info['caminho']) == 2 for info in pdfs_2.values())
+            assert len(pdfs_2) == len(resultados) == 3
+    finally:
+        servidor.shutdown()
+
+
+def test_checkpoint_ignora_grupo_incompleto():
+    servidor = _servidor()
+    df_export = _contas(f'http://127.0.0.1:{servidor.server_address[1]}')
+    servidor.falhar = {'/boleto/0.pdf'}
+    concluidos = {}
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            _, pdfs, _ = processar_dados(
+                df_export, diretorio_pdfs=diretorio, tentativas_download=1,
+                callback_grupo_concluido=concluidos.__setitem__
+            )
+            assert len(pdfs) == 3
+            assert len(concluidos) == 2
+    finally:
+        servidor.shutdown()
@@ -0,0 +1,90 @@
+"""Testes da unificação incremental e otimizada, comparada ao PdfMerger"""
+
+import os
+import tempfile
+from io import BytesIO
+
+import PyPDF2
+import pytest
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from cobranca.unificacao import _unificar_incremental, _unificar_pdfmerger, unificar_pdfs
+
+
+def _pdf(textos, senha=None):
+    """PDF com uma página por texto (Helvetica, sem fonte embutida), opcionalmente criptografado"""
+    escritor = PyPDF2.PdfWriter()
+    fonte = escritor._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica')
+    }))
+    for texto in textos:
+        escritor.add_blank_page(595, 842)
+        pagina = escritor.pages[-1]
+        conteudo = DecodedStreamObject()
+        conteudo._data = f'BT /F1 12 Tf 72 720 Td ({texto}) Tj ET'.encode()
+        pagina[NameObject('/Contents')] = escritor._add_object(conteudo)
+        pagina[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): fonte})
+        })
+    if senha is not None:
+        escritor.encrypt(senha)
+    buffer = BytesIO()
+    escritor.write(buffer)
+    return buffer.getvalue()
+
+
+def _textos(caminho):
+    return [pagina.extract_text() for pagina in PyPDF2.PdfReader(caminho).pages]
+
+
+def _unificar(modo, documentos, diretorio):
+    caminho = os.path.join(diretorio, f'{modo}.pdf')
+    fontes = [BytesIO(documento) for documento in documentos]
+    if modo == 'pdfmerger':
+        sucesso, erros = _unificar_pdfmerger(fontes, caminho)
+    elif modo == 'incremental':
+        sucesso, erros, _ = _unificar_incremental(fontes, caminho)
+    else:
+        sucesso, erros, _ = unificar_pdfs(fontes, caminho, otimizar=True)
+    return sucesso, erros, caminho
+
+
+ENTRADAS = {
+    'simples': [_pdf(['um', 'dois']), _pdf(['tres'])],
+    'criptografado': [_pdf(['um', 'dois']), _pdf(['tres'], senha='')],
+}
+
+
+@pytest.mark.parametrize('entrada', ENTRADAS)
+def test_incremental_igual_ao_pdfmerger(entrada):
+    with tempfile.TemporaryDirectory() as diretorio:
+        sucesso, erros, esperado = _unificar('pdfmerger', ENTRADAS[entrada], diretorio)
+        assert sucesso and not erros
+        for modo in ('incremental', 'otimizado'):
+            sucesso, erros, caminho = _unificar(modo, ENTRADAS[entrada], diretorio)
+            assert sucesso and not erros
+            assert _textos(caminho) == _textos(esperado) == ['um', 'dois', 'tres']
+
+
+def test_duplicados():
+    documento = _pdf(['um', 'dois'])
+    documentos = [documento, _pdf(['tres']), documento]
+    with tempfile.TemporaryDirectory() as diretorio:
+        _, _, esperado = _unificar('pdfmerger', documentos, diretorio)
+        _, _, incremental = _unificar('incremental', documentos, diretorio)
+        _, _, otimizado = _unificar('otimizado', documentos, diretorio)
+        assert _textos(incremental) == _textos(esperado) == ['um', 'dois', 'tres', 'um', 'dois']
+        # A otimização ignora a segunda cópia idêntica
+        assert _textos(otimizado) == ['um', 'dois', 'tres']
+
+
+def test_pdf_com_senha_vira_erro_nos_dois_modos():
+    documentos = [_pdf(['um']), _pdf(['secreto'], senha='abc'), b'nao e um pdf']
+    with tempfile.TemporaryDirectory() as diretorio:
+        for modo in ('pdfmerger', 'incremental'):
+            sucesso, erros, caminho = _unificar(modo, documentos, diretorio)
+            assert sucesso and len(erros) == 2
+            assert _textos(caminho) == ['um']
+
@@ -0,0 +1,64 @@
+"""Testes da conversão de valores em reais"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cobranca.valores import converter_valores_brl, formatar_valores_brl
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('R$ 1.234,56', 1234.56),
+    ('1234,56', 1234.56),
+    ('1.234.567,89', 1234567.89),
+    ('1.234', 1234.0),
+    ('1.5', 1.5),
+    ('1.23', 1.23),
+    ('  R$ 10,00  ', 10.0),
+    ('0,5', 0.5),
+])
+def test_positivos_e_separadores_de_milhar(texto, esperado):
+    valores, invalidos = converter_valores_brl(pd.Series([texto], dtype=object))
+    assert valores[0] == pytest.approx(esperado)
+    assert not invalidos[0]
+
+
+@pytest.mark.parametrize('texto', ['-R$ 10,00', 'R$ -10,00', '(10,00)', '10,00-', '-10,00'])
+def test_negativos(texto):
+    valores, invalidos = converter_valores_brl(pd.Series([texto], dtype=object))
+    assert valores[0] == -10.0
+    assert not invalidos[0]
+
+
+@pytest.mark.parametrize('texto', ['abc', '1,2,3', '12.34,56', '1.2.3', '--10,00', '10,', 'R$ R$ 1,00', '(10,00'])
+def test_textos_invalidos(texto):
+    valores, invalidos = converter_valores_brl(pd.Series([texto], dtype=object))
+    assert np.isnan(valores[0])
+    assert invalidos[0]
+
+
+def test_vazios_nao_sao_invalidos():
+    valores, invalidos = converter_valores_brl(pd.Series(['10,00', None, np.nan, '', '  '], dtype=object))
+    assert valores[0] == 10.0
+    assert valores[1:].isna().all()
+    assert not invalidos.any()
+
+
+def test_celulas_numericas_e_mistas():
+    valores, invalidos = converter_valores_brl(pd.Series([1.5, 2, np.nan]))
+    assert valores.tolist()[:2] == [1.5, 2.0] and np.isnan(valores[2])
+    assert not invalidos.any()
+    valores, invalidos = converter_valores_brl(pd.Series([3, '1.234,50', 'x'], dtype=object))
+    assert valores.tolist()[:2] == [3.0, 1234.5]
+    assert invalidos.tolist() == [False, False, True]
+
+
+def test_mantem_indice_e_categoricas():
+    serie = pd.Series(['1,00', '2,00', '1,00'], index=[10, 20, 30], dtype='category')
+    valores, invalidos = converter_valores_brl(serie)
+    assert valores.to_dict() == {10: 1.0, 20: 2.0, 30: 1.0}
+    assert invalidos.index.tolist() == [10, 20, 30]
+
+
+def test_formatacao():
+    assert formatar_valores_brl(pd.Series([1234.5, -10.0])).tolist() == ['R$ 1.234,50', 'R$ -10,00']